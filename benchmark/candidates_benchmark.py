@@ -0,0 +1,86 @@
+import argparse
+import random
+import time
+
+from context.handle_current_context import get_current_doc_context
+from post_processing.post_process_candidates import post_process_candidates
+from tree_sitter_local.tree_cache import tree_cache
+from benchmark.lsp_lookup_benchmark import PROJECT_ROOT
+from benchmark.tree_cache_benchmark import build_source, make_requests, post_process
+
+
+def make_candidates(completion: str, continuation: str, count: int, rng: random.Random):
+    """Sampled candidates of a request: the completion cut short or run on into the next lines, with repeats."""
+    candidates = []
+    for _ in range(count):
+        choice = rng.random()
+        if choice < 0.3 and candidates:
+            candidates.append(rng.choice(candidates))
+        elif choice < 0.6:
+            candidates.append(completion[:rng.randint(1, len(completion))])
+        else:
+            candidates.append(completion + "\n" + "\n".join(continuation.split("\n")[:rng.randint(1, 6)]))
+    return candidates
+
+
+def make_batches(source: str, requests: int, count: int, seed: int):
+    rng = random.Random(seed)
+    batches = []
+    for document, completion in make_requests(source, requests, 3, seed):
+        continuation = document.suffix[document.suffix.find("\n") + 1:][:2000]
+        batches.append((document, make_candidates(completion, continuation, count, rng)))
+    return batches
+
+
+def run_each(batches):
+    """Every candidate post-processed on its own, as when running the single-candidate pipeline N times."""
+    outputs = []
+    for document, candidates in batches:
+        # A new document for every record, as when post-processing a dataset
+        tree_cache.clear()
+        outputs.append([post_process(document, candidate) for candidate in candidates])
+    return outputs
+
+
+def run_batch(batches):
+    outputs = []
+    for document, candidates in batches:
+        tree_cache.clear()
+        doc_context = get_current_doc_context(document, document.language_id)
+        outputs.append(post_process_candidates(candidates, {'document': document, 'doc_context': doc_context}, True))
+    return outputs
+
+
+def timed(function, batches):
+    start = time.perf_counter()
+    outputs = function(batches)
+    return outputs, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark post-processing several sampled candidates per request')
+    parser.add_argument('--source_dir', type=str, default=PROJECT_ROOT,
+                        help='Directory whose python files make up the benchmark document')
+    parser.add_argument('--lines', type=int, default=5000,
+                        help='Minimum number of lines of the benchmark document')
+    parser.add_argument('--requests', type=int, default=30,
+                        help='Number of requests cut out of the document')
+    parser.add_argument('--candidates', type=int, nargs='*', default=[1, 5, 20],
+                        help='Numbers of candidates per request')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed for picking requests and candidates')
+
+    args = parser.parse_args()
+
+    source = build_source(args.source_dir, args.lines)
+    print(f"{source.count(chr(10)) + 1} lines, {args.requests} requests")
+    # Load the parser and compile what both runs use before timing them
+    run_each(make_batches(source, 1, 1, args.seed))
+
+    for count in args.candidates:
+        batches = make_batches(source, args.requests, count, args.seed)
+        total = sum(len(candidates) for _, candidates in batches)
+        each_outputs, each_time = timed(run_each, batches)
+        batch_outputs, batch_time = timed(run_batch, batches)
+        print(f"N={count}: each {total / each_time:.0f} candidates/s, batch {total / batch_time:.0f} candidates/s "
+              f"({each_time / batch_time:.1f}x), outputs {'match' if each_outputs == batch_outputs else 'differ'}")
@@ -0,0 +1,130 @@
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import random
+import tempfile
+import time
+
+from file_system.virtual_file_system import vfs
+from process_data import convert_dataset_prefix_and_suffix, source_file_index_cache
+from benchmark.lsp_lookup_benchmark import PROJECT_ROOT
+
+
+# The conversion the file indexes replaced, as a reference: every record splits and scans its file twice
+def reference_get_file_line_numbers(base_path, file_path, code_snippet):
+    file_lines = vfs.read_text(f"{base_path}/{file_path}").splitlines()
+    snippet_lines = code_snippet.splitlines()
+    if not snippet_lines:
+        return 0, 0, 0
+    first_line = snippet_lines[0].strip()
+    for i, file_line in enumerate(file_lines):
+        if file_line.strip() == first_line:
+            return i, i + len(snippet_lines) - 1, len(snippet_lines[-1])
+    return 0, 0, 0
+
+
+def reference_get_prefix_suffix(base_path, file_path, code_snippet, ground_truth):
+    file_lines = vfs.read_text(f"{base_path}/{file_path}").splitlines(True)
+    snippet_lines = code_snippet.splitlines()
+    if not snippet_lines:
+        return "", ""
+    first_line = snippet_lines[0].strip()
+    prefix_lines, suffix_lines = [], []
+    for i, file_line in enumerate(file_lines):
+        if file_line.strip() == first_line:
+            prefix_lines = file_lines[:i + len(snippet_lines)]
+            prefix_lines[-1] = prefix_lines[-1].replace(ground_truth, "")
+            suffix_end = i + len(snippet_lines)
+            suffix_lines = file_lines[suffix_end:] if suffix_end < len(file_lines) else []
+            break
+    return ''.join(prefix_lines), ''.join(suffix_lines)
+
+
+def reference_convert(base_path, input_file, output_file):
+    with open(input_file, "r") as infile, open(output_file, "w") as outfile:
+        for idx, line in enumerate(infile):
+            data = json.loads(line)
+            prefix, suffix = reference_get_prefix_suffix(base_path, data["fpath"], data["input"], data["gt"])
+            context_start, completion_line, char_offset = reference_get_file_line_numbers(base_path, data["fpath"], data["input"])
+            list_path = data["fpath"].split("/")
+            outfile.write(json.dumps({
+                **data,
+                "prefix": prefix,
+                "suffix": suffix,
+                "metadata": {
+                    "task_id": f'{list_path[0]}/{idx}',
+                    "fpath_tuple": list_path,
+                    "context_start_lineno": context_start,
+                    "line_no": completion_line,
+                    "context_start_characterno": char_offset
+                }
+            }) + "\n")
+
+
+def make_metadata(source_dir: str, output_file: str, records: int, seed: int):
+    """Records shaped like the ReccEval metadata: a snippet ending inside a line and the rest of that line, grouped by file."""
+    rng = random.Random(seed)
+    files = []
+    for file_path in sorted(glob.glob(os.path.join(source_dir, "**", "*.py"), recursive=True)):
+        with open(file_path, "r", encoding="utf-8") as f:
+            lines = f.read().split("\n")
+        candidates = [index for index, line in enumerate(lines) if len(line.strip()) > 8]
+        if len(candidates) > 10:
+            files.append((os.path.relpath(file_path, source_dir).replace(os.sep, "/"), lines, candidates))
+
+    with open(output_file, "w") as f:
+        for relative_path, lines, candidates in files:
+            for _ in range(max(1, records // len(files))):
+                line_no = rng.choice(candidates)
+                start = max(0, line_no - rng.randint(0, 8))
+                cut = rng.randint(len(lines[line_no]) - len(lines[line_no].lstrip()) + 1, len(lines[line_no]))
+                snippet = "\n".join(lines[start:line_no] + [lines[line_no][:cut]])
+                f.write(json.dumps({"fpath": relative_path, "input": snippet, "gt": lines[line_no][cut:]}) + "\n")
+
+
+def run(function):
+    # Every run starts from cold caches, and the progress messages of records without a match are not timed
+    vfs.clear()
+    source_file_index_cache.clear()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        function()
+    return time.perf_counter() - start
+
+
+def read_file(file_path: str) -> str:
+    with open(file_path, "r") as f:
+        return f.read()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark converting a ReccEval-sized metadata file')
+    parser.add_argument('--source_dir', type=str, default=PROJECT_ROOT,
+                        help='Directory whose python files the records are cut from')
+    parser.add_argument('--records', type=int, default=8000,
+                        help='Approximate number of records of the generated metadata')
+    parser.add_argument('--workers', type=int, nargs='*', default=[1, 2, 4],
+                        help='Worker counts to convert with')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed for generating the records')
+
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        input_file = os.path.join(directory, "metadata.jsonl")
+        make_metadata(args.source_dir, input_file, args.records, args.seed)
+        record_count = len(read_file(input_file).splitlines())
+
+        reference_file = os.path.join(directory, "reference.jsonl")
+        elapsed = run(lambda: reference_convert(args.source_dir, input_file, reference_file))
+        print(f"{record_count} records, reference: {record_count / elapsed:.0f} records/s")
+
+        reference = read_file(reference_file)
+        for workers in args.workers:
+            output_file = os.path.join(directory, f"output_{workers}.jsonl")
+            elapsed = run(lambda: convert_dataset_prefix_and_suffix(args.source_dir, input_file, output_file, workers))
+            print(f"{workers} workers: {record_count / elapsed:.0f} records/s, output "
+                  f"{'matches' if read_file(output_file) == reference else 'differs from'} the reference")
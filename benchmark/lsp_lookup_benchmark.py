@@ -0,0 +1,86 @@
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from schema.common import Document, Position
+from schema.tree_sitter import SymbolRequest
+from graph_retrieval.identifiers import get_last_n_graph_context_identifiers_from_document
+from graph_retrieval.symbol_context_snippets import get_symbol_context_snippets, MAX_CONCURRENT_SYMBOL_REQUESTS
+from graph_retrieval.lsp_cache import response_cache
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def default_request() -> SymbolRequest:
+    return SymbolRequest(
+        symbol_name='another_call',
+        position=Position(line=3, character=4),
+        uri=os.path.join(PROJECT_ROOT, 'test', 'test.py'),
+        node_type='call',
+        language_id='python',
+        capture_name='identifier',
+    )
+
+
+def file_requests(file_path: str, identifiers: int):
+    """The last `identifiers` symbol requests before the end of a file."""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    lines = text.split('\n')
+    document = Document(uri=os.path.abspath(file_path), language_id='python', text=text)
+    position = Position(line=len(lines) - 1, character=len(lines[-1]))
+    return get_last_n_graph_context_identifiers_from_document(document=document, position=position, n=identifiers)
+
+
+def time_lookups(iterations: int, recursion_limit: int, cold_cache: bool = False, requests_factory=None,
+                 max_concurrency: int = MAX_CONCURRENT_SYMBOL_REQUESTS):
+    """Time `iterations` symbol lookups, each run in its own event loop like prompt_builder does."""
+    requests_factory = requests_factory or (lambda: [default_request()])
+    timings = []
+    snippet_counts = []
+    for _ in range(iterations):
+        if cold_cache:
+            response_cache.clear()
+        requests = requests_factory()
+        start = time.perf_counter()
+        snippets = asyncio.run(get_symbol_context_snippets(requests, recursion_limit, max_concurrency))
+        timings.append(time.perf_counter() - start)
+        snippet_counts.append(len(snippets))
+    print(f"snippets per lookup: {statistics.mean(snippet_counts):.1f}")
+    return timings
+
+
+def report(name: str, timings):
+    print(f"{name}: n={len(timings)} "
+          f"first={timings[0] * 1000:.1f}ms "
+          f"mean={statistics.mean(timings) * 1000:.1f}ms "
+          f"p50={statistics.median(timings) * 1000:.1f}ms "
+          f"max={max(timings) * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Measure per-symbol LSP lookup latency')
+    parser.add_argument('--iterations', type=int, default=20,
+                        help='Number of lookups to time')
+    parser.add_argument('--recursion_limit', type=int, default=2,
+                        help='Recursion limit passed to get_symbol_context_snippets')
+    parser.add_argument('--cold_cache', action='store_true',
+                        help='Clear the LSP response cache before every lookup')
+    parser.add_argument('--file', type=str, default=None,
+                        help='Resolve the last symbols of this file instead of the test fixture')
+    parser.add_argument('--identifiers', type=int, default=5,
+                        help='Number of symbols to resolve from --file')
+    parser.add_argument('--max_concurrency', type=int, default=MAX_CONCURRENT_SYMBOL_REQUESTS,
+                        help='Maximum number of symbols resolved concurrently')
+
+    args = parser.parse_args()
+
+    requests_factory = None
+    if args.file:
+        requests_factory = lambda: file_requests(args.file, args.identifiers)
+
+    report("symbol lookup", time_lookups(args.iterations, args.recursion_limit, args.cold_cache,
+                                         requests_factory, args.max_concurrency))
+    print(response_cache.report())
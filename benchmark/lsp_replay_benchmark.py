@@ -0,0 +1,99 @@
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from graph_retrieval.symbol_context_snippets import get_symbol_context_snippets, MAX_CONCURRENT_SYMBOL_REQUESTS
+from graph_retrieval.lsp_cache import response_cache
+from graph_retrieval.lsp_replay import (
+    LspRecording,
+    recording_server_factory,
+    replay_server_factory,
+    use_server_factory,
+)
+from benchmark.lsp_lookup_benchmark import PROJECT_ROOT, default_request, file_requests
+
+DEFAULT_RECORDING = os.path.join(os.path.dirname(__file__), "recordings", "lsp_fixture.json")
+
+
+def lookup_factories(files, identifiers: int):
+    """One lookup per file, resolving its last `identifiers` symbols, or the test fixture lookup."""
+    if not files:
+        return [lambda: [default_request()]]
+    return [lambda file_path=file_path: file_requests(file_path, identifiers) for file_path in files]
+
+
+def run_lookups(factories, recursion_limit: int, max_concurrency: int, cold_cache: bool):
+    timings = []
+    snippets = 0
+    for requests_factory in factories:
+        if cold_cache:
+            response_cache.clear()
+        requests = requests_factory()
+        start = time.perf_counter()
+        snippets += len(asyncio.run(get_symbol_context_snippets(requests, recursion_limit, max_concurrency)))
+        timings.append(time.perf_counter() - start)
+    return timings, snippets
+
+
+def record(path: str, factories, recursion_limit: int):
+    """Run every lookup against the real language server and save its traffic."""
+    recording = LspRecording()
+    with use_server_factory(recording_server_factory(recording)):
+        _, snippets = run_lookups(factories, recursion_limit, MAX_CONCURRENT_SYMBOL_REQUESTS, cold_cache=True)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    recording.save(path)
+    print(f"recorded {len(recording.responses)} responses ({snippets} snippets) to {path}")
+
+
+def replay(path: str, factories, recursion_limit: int, latency: float, jitter: float, rounds: int):
+    """Time the lookups against replayed responses under different concurrency, latency and cache settings."""
+    recording = LspRecording.load(path)
+    scenarios = [
+        ("overhead, no latency", 0.0, False, MAX_CONCURRENT_SYMBOL_REQUESTS, True),
+        ("serial server, sequential", latency, True, 1, True),
+        ("serial server, concurrent", latency, True, MAX_CONCURRENT_SYMBOL_REQUESTS, True),
+        ("parallel server, sequential", latency, False, 1, True),
+        ("parallel server, concurrent", latency, False, MAX_CONCURRENT_SYMBOL_REQUESTS, True),
+        ("parallel server, concurrent, warm cache", latency, False, MAX_CONCURRENT_SYMBOL_REQUESTS, False),
+    ]
+    for name, scenario_latency, serial, max_concurrency, cold_cache in scenarios:
+        factory = replay_server_factory(recording, latency=scenario_latency, jitter=jitter, serial=serial)
+        with use_server_factory(factory):
+            timings, snippets = [], 0
+            for _ in range(rounds):
+                round_timings, snippets = run_lookups(factories, recursion_limit, max_concurrency, cold_cache)
+                timings.extend(round_timings)
+        print(f"{name}: p50={statistics.median(timings) * 1000:.2f}ms "
+              f"mean={statistics.mean(timings) * 1000:.2f}ms snippets={snippets}")
+    print(f"requests missing from the recording: {recording.misses}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark get_symbol_context_snippets against recorded LSP traffic')
+    parser.add_argument('--recording', type=str, default=DEFAULT_RECORDING,
+                        help='Recording to replay, or to write with --record')
+    parser.add_argument('--record', action='store_true',
+                        help='Record the traffic of the real language server instead of replaying it')
+    parser.add_argument('--files', type=str, nargs='*', default=None,
+                        help='Resolve the last symbols of these files instead of the test fixture')
+    parser.add_argument('--identifiers', type=int, default=5,
+                        help='Number of symbols to resolve per file')
+    parser.add_argument('--recursion_limit', type=int, default=2,
+                        help='Recursion limit passed to get_symbol_context_snippets')
+    parser.add_argument('--latency', type=float, default=0.01,
+                        help='Injected latency per request in seconds')
+    parser.add_argument('--jitter', type=float, default=0.0,
+                        help='Random extra latency per request of up to this many seconds')
+    parser.add_argument('--rounds', type=int, default=5,
+                        help='Number of times every lookup is timed')
+
+    args = parser.parse_args()
+
+    files = [os.path.abspath(os.path.join(PROJECT_ROOT, file_path)) for file_path in args.files or []]
+    factories = lookup_factories(files, args.identifiers)
+    if args.record:
+        record(args.recording, factories, args.recursion_limit)
+    else:
+        replay(args.recording, factories, args.recursion_limit, args.latency, args.jitter, args.rounds)
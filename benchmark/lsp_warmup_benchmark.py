@@ -0,0 +1,116 @@
+import argparse
+import asyncio
+import contextlib
+import os
+import statistics
+import time
+from contextlib import contextmanager
+
+from graph_retrieval.symbol_context_snippets import get_symbol_context_snippets
+from graph_retrieval.lsp_cache import response_cache
+from graph_retrieval.lsp_pool import server_pool
+from graph_retrieval.lsp_replay import LspRecording, ReplayLanguageServer, use_server_factory
+from benchmark.lsp_lookup_benchmark import PROJECT_ROOT, default_request, file_requests
+from benchmark.lsp_replay_benchmark import DEFAULT_RECORDING
+
+
+class SlowStartingReplayServer(ReplayLanguageServer):
+    """A replayed server that takes `start_delay` seconds to start, like a real one indexing its workspace."""
+
+    def __init__(self, recording: LspRecording, workspace_root: str, start_delay: float, latency: float):
+        super().__init__(recording, workspace_root, latency=latency)
+        self.start_delay = start_delay
+
+    @contextmanager
+    def start_server(self):
+        time.sleep(self.start_delay)
+        with super().start_server():
+            yield self
+
+
+def slow_starting_replay_factory(recording: LspRecording, start_delay: float, latency: float):
+    """`LanguageServerPool` factory for replayed servers with a simulated start delay."""
+    def create(language: str, workspace_root: str):
+        return SlowStartingReplayServer(recording, workspace_root, start_delay, latency)
+    return create
+
+
+def time_first_lookup(workspace_root: str, requests_factory, recursion_limit: int, warm: bool):
+    """
+    Time the first lookup against a freshly started server of `workspace_root`.
+
+    Returns (warmup seconds, lookup seconds, snippet count). With `warm` the server is started
+    and primed in the background first and the lookup is only timed once it is ready.
+    """
+    server_pool.close_all()
+    response_cache.clear()
+
+    warmup_time = 0.0
+    if warm:
+        start = time.perf_counter()
+        server_pool.warmup("python", workspace_root).result()
+        warmup_time = time.perf_counter() - start
+
+    requests = requests_factory()
+    for request in requests:
+        request.workspace = workspace_root
+
+    start = time.perf_counter()
+    snippets = asyncio.run(get_symbol_context_snippets(requests, recursion_limit))
+    return warmup_time, time.perf_counter() - start, len(snippets)
+
+
+def report(name: str, timings):
+    print(f"{name}: n={len(timings)} "
+          f"mean={statistics.mean(timings) * 1000:.1f}ms "
+          f"p50={statistics.median(timings) * 1000:.1f}ms "
+          f"max={max(timings) * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compare first-lookup latency on a cold and a warmed up language server')
+    parser.add_argument('--workspace', type=str, default=PROJECT_ROOT,
+                        help='Repository the language server is started for')
+    parser.add_argument('--file', type=str, default=None,
+                        help='Resolve the last symbols of this file instead of the test fixture')
+    parser.add_argument('--identifiers', type=int, default=5,
+                        help='Number of symbols to resolve from --file')
+    parser.add_argument('--recursion_limit', type=int, default=2,
+                        help='Recursion limit passed to get_symbol_context_snippets')
+    parser.add_argument('--rounds', type=int, default=3,
+                        help='Number of cold and warm first lookups to time')
+    parser.add_argument('--replay', action='store_true',
+                        help='Replay the recorded responses of --recording instead of running the real language server')
+    parser.add_argument('--recording', type=str, default=DEFAULT_RECORDING,
+                        help='Recording replayed with --replay')
+    parser.add_argument('--start_delay', type=float, default=1.0,
+                        help='Simulated seconds a replayed server takes to start')
+    parser.add_argument('--latency', type=float, default=0.01,
+                        help='Injected latency per replayed request in seconds')
+
+    args = parser.parse_args()
+
+    workspace_root = os.path.abspath(args.workspace)
+    requests_factory = lambda: [default_request()]
+    if args.file:
+        requests_factory = lambda: file_requests(args.file, args.identifiers)
+
+    servers = contextlib.nullcontext()
+    if args.replay:
+        recording = LspRecording.load(args.recording)
+        servers = use_server_factory(slow_starting_replay_factory(recording, args.start_delay, args.latency))
+
+    cold_lookups, warmups, warm_lookups = [], [], []
+    with servers:
+        for _ in range(args.rounds):
+            _, lookup_time, cold_snippets = time_first_lookup(workspace_root, requests_factory, args.recursion_limit, warm=False)
+            cold_lookups.append(lookup_time)
+            warmup_time, lookup_time, warm_snippets = time_first_lookup(workspace_root, requests_factory, args.recursion_limit, warm=True)
+            warmups.append(warmup_time)
+            warm_lookups.append(lookup_time)
+
+    print(f"snippets per lookup: cold={cold_snippets} warm={warm_snippets}")
+    report("cold first lookup (includes server start)", cold_lookups)
+    report("background warmup", warmups)
+    report("warm first lookup", warm_lookups)
+    server_pool.shutdown()
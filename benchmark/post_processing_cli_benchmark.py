@@ -0,0 +1,92 @@
+import argparse
+import glob
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmark.lsp_lookup_benchmark import PROJECT_ROOT
+
+# Runs the CLI in a child process and reports the peak memory of the CLI and its workers
+RUN_AND_MEASURE = (
+    "import resource, subprocess, sys; "
+    "subprocess.run(sys.argv[1:], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL); "
+    "print(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)"
+)
+
+
+def make_dataset(source_dir: str, output_file: str, records: int, seed: int):
+    """Records in the format of the CLI input: a file cut at a random line, with the cut lines as the completion."""
+    rng = random.Random(seed)
+    files = sorted(glob.glob(os.path.join(source_dir, "**", "*.py"), recursive=True))
+    sources = []
+    for file_path in files:
+        with open(file_path, "r", encoding="utf-8") as f:
+            lines = f.read().split("\n")
+        candidates = [index for index, line in enumerate(lines[:-3]) if line.startswith("    ") and line.strip()]
+        if candidates:
+            sources.append((os.path.relpath(file_path, source_dir), lines, candidates))
+
+    with open(output_file, "w", encoding="utf-8") as f:
+        for _ in range(records):
+            relative_path, lines, candidates = rng.choice(sources)
+            line_no = rng.choice(candidates)
+            indent = len(lines[line_no]) - len(lines[line_no].lstrip())
+            prefix = "\n".join(lines[:line_no] + [lines[line_no][:indent]])
+            completion = "\n".join([lines[line_no][indent:]] + lines[line_no + 1:line_no + 3])
+            suffix = "\n" + "\n".join(lines[line_no + 3:])
+            f.write(json.dumps({
+                "prefix": prefix,
+                "suffix": suffix,
+                "metadata": {"fpath_tuple": relative_path.split(os.sep), "line_no": line_no, "context_start_characterno": indent},
+                "choices": [{"text": completion}],
+            }) + "\n")
+
+
+def run_cli(input_file: str, output_file: str, extra_args):
+    command = [sys.executable, os.path.join(PROJECT_ROOT, "post_processing.py"), "--base_dir", "",
+               "--input", input_file, "--output", output_file, *extra_args]
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", RUN_AND_MEASURE, *command], check=True, capture_output=True, text=True, cwd=PROJECT_ROOT)
+    return time.perf_counter() - start, int(result.stdout.strip()) / 1024
+
+
+def read_lines(file_path: str):
+    with open(file_path, "r", encoding="utf-8") as f:
+        return f.read().splitlines()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the post_processing.py CLI on a generated dataset')
+    parser.add_argument('--source_dir', type=str, default=PROJECT_ROOT,
+                        help='Directory whose python files the records are cut from')
+    parser.add_argument('--records', type=int, default=2000,
+                        help='Number of records of the generated dataset')
+    parser.add_argument('--workers', type=int, nargs='*', default=[1, 2, 4],
+                        help='Worker counts to run the CLI with')
+    parser.add_argument('--baseline', action='store_true',
+                        help='Run the CLI without batch options, for versions that do not have them')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed for generating the records')
+
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        input_file = os.path.join(directory, "input.jsonl")
+        make_dataset(args.source_dir, input_file, args.records, args.seed)
+        print(f"{args.records} records, {os.path.getsize(input_file) / 2 ** 20:.1f}MB")
+
+        runs = [("baseline", [])] if args.baseline else [(f"{workers} workers", ["--workers", str(workers)]) for workers in args.workers]
+        reference = None
+        for name, extra_args in runs:
+            output_file = os.path.join(directory, f"output_{len(extra_args) and extra_args[-1]}.jsonl")
+            elapsed, peak_mb = run_cli(input_file, output_file, extra_args)
+            output = read_lines(output_file)
+            reference = reference or output
+            print(f"{name}: {elapsed:.1f}s, {args.records / elapsed:.0f} records/s, peak RSS {peak_mb:.0f}MB, "
+                  f"output {'matches' if output == reference else 'differs from'} the first run")
+            if args.baseline:
+                os.replace(output_file, os.path.join(tempfile.gettempdir(), "post_processing_baseline.jsonl"))
@@ -0,0 +1,110 @@
+import argparse
+import asyncio
+import glob
+import os
+import random
+import time
+
+from schema.common import Document, Position
+from graph_retrieval.lsp import LsptRetriever
+from graph_retrieval.lsp_cache import response_cache
+from graph_retrieval.lsp_replay import LspRecording, recording_server_factory, replay_server_factory, use_server_factory
+from prompt.request_window import map_in_order
+from benchmark.lsp_lookup_benchmark import PROJECT_ROOT
+
+DEFAULT_RECORDING = os.path.join(os.path.dirname(__file__), "recordings", "prompt_builder_fixture.json")
+# Directories of the repository the records are cut from, ones that rarely change so the recording stays valid
+DEFAULT_SOURCE_DIRS = ["context", "inference", "ranking", "text_retrieval"]
+
+
+def make_records(source_dirs, files: int, records_per_file: int, seed: int):
+    """
+    Records grouped by file like the converted ReccEval datasets: the file with the rest of a
+    line cut at the cursor, as prompt_builder builds the document from the prefix and suffix.
+    """
+    rng = random.Random(seed)
+    file_paths = sorted(
+        file_path for source_dir in source_dirs
+        for file_path in glob.glob(os.path.join(PROJECT_ROOT, source_dir, "**", "*.py"), recursive=True)
+    )
+    records = []
+    for file_path in file_paths:
+        with open(file_path, "r", encoding="utf-8") as f:
+            lines = f.read().split("\n")
+        candidates = [index for index, line in enumerate(lines) if "(" in line and line.startswith("    ")]
+        if not candidates:
+            continue
+        for line_no in sorted(rng.sample(candidates, min(records_per_file, len(candidates)))):
+            cut = lines[line_no].index("(")
+            prefix = "\n".join(lines[:line_no] + [lines[line_no][:cut]])
+            suffix = "\n" + "\n".join(lines[line_no + 1:])
+            records.append(Document(uri=os.path.abspath(file_path), language_id="python", text=prefix + suffix,
+                                    prefix=prefix, suffix=suffix, position=Position(line=line_no, character=cut)))
+        if len(records) >= files * records_per_file:
+            break
+    return records
+
+
+def snippet_keys(snippets):
+    return [(snippet.uri, snippet.start_line, snippet.symbol, snippet.content) for snippet in snippets]
+
+
+def run_window(retriever: LsptRetriever, records, repo: str, concurrency: int):
+    """Retrieve the contexts of every record like prompt_builder: one loop, records of a file one at a time."""
+    async def run():
+        outputs = []
+        async for _, task in map_in_order(lambda document: retriever.retrieve(document, document.position, repo),
+                                          records, concurrency, lambda document: document.uri):
+            outputs.append(snippet_keys(task.result()))
+        return outputs
+
+    response_cache.clear()
+    start = time.perf_counter()
+    outputs = asyncio.run(run())
+    return outputs, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark retrieving the LSP contexts of a dataset at different concurrency')
+    parser.add_argument('--recording', type=str, default=DEFAULT_RECORDING,
+                        help='Recording to replay, or to write with --record')
+    parser.add_argument('--record', action='store_true',
+                        help='Record the traffic of the real language server instead of replaying it')
+    parser.add_argument('--source_dirs', type=str, nargs='*', default=DEFAULT_SOURCE_DIRS,
+                        help='Directories of this repository the records are cut from')
+    parser.add_argument('--files', type=int, default=12,
+                        help='Number of files the records are cut from')
+    parser.add_argument('--records_per_file', type=int, default=3,
+                        help='Number of records of each file')
+    parser.add_argument('--latency', type=float, default=0.01,
+                        help='Injected latency per replayed request in seconds')
+    parser.add_argument('--serial', action='store_true',
+                        help='Answer replayed requests one at a time, like Jedi does')
+    parser.add_argument('--concurrency', type=int, nargs='*', default=[1, 8],
+                        help='Numbers of records whose contexts are retrieved at the same time')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed for picking the cursors')
+
+    args = parser.parse_args()
+
+    records = make_records(args.source_dirs, args.files, args.records_per_file, args.seed)
+    # The repository is found under its parent directory, as prompt_builder finds repositories under --base_dir
+    retriever = LsptRetriever(base_dir=os.path.dirname(PROJECT_ROOT))
+    repo = os.path.basename(PROJECT_ROOT)
+
+    if args.record:
+        recording = LspRecording()
+        with use_server_factory(recording_server_factory(recording)):
+            outputs, _ = run_window(retriever, records, repo, 1)
+        recording.save(args.recording)
+        print(f"recorded {len(recording.responses)} responses ({sum(map(len, outputs))} snippets) to {args.recording}")
+    else:
+        recording = LspRecording.load(args.recording)
+        with use_server_factory(replay_server_factory(recording, latency=args.latency, serial=args.serial)):
+            reference = None
+            for concurrency in args.concurrency:
+                outputs, elapsed = run_window(retriever, records, repo, concurrency)
+                reference = reference or outputs
+                print(f"concurrency {concurrency}: {len(records) / elapsed:.1f} records/s, "
+                      f"{sum(map(len, outputs))} snippets, outputs {'match' if outputs == reference else 'differ from'} the first run")
+        print(f"{len(records)} records, requests missing from the recording: {recording.misses}")
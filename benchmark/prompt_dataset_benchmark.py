@@ -0,0 +1,113 @@
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+import jsonlines
+
+from prompt.fim_utils import CodeQwen25PromptExtractor
+from prompt.prompt_dataset import PromptDataset, PromptDatasetWriter, build_jsonl_record
+from schema.jaccard import JaccardMatchWithFilename
+from schema.lsp import LSPSymbolContextSnippet
+from benchmark.lsp_lookup_benchmark import PROJECT_ROOT
+from benchmark.tree_cache_benchmark import build_source, make_requests
+
+prompt_extractor = CodeQwen25PromptExtractor()
+
+
+def make_snippets(source: str, count: int, rng: random.Random):
+    """Retrieved snippets of a repository, Jaccard matches and LSP symbols, which many records share."""
+    lines = source.split("\n")
+    snippets = []
+    for index in range(count):
+        start = rng.randint(0, len(lines) - 60)
+        end = start + rng.randint(5, 60)
+        content = "\n".join(lines[start:end])
+        if index % 3:
+            snippets.append(JaccardMatchWithFilename(score=rng.random(), content=content, start_line=start, end_line=end,
+                                                     uri=f"repo/module_{start // 500}.py"))
+        else:
+            snippets.append(LSPSymbolContextSnippet(identifier=f"symbol_{index}", content=content, symbol=f"symbol_{index}",
+                                                    uri=f"repo/module_{start // 500}.py", start_line=start, end_line=end))
+    return snippets
+
+
+def make_records(source: str, count: int, seed: int):
+    """Prompt builder inputs with the contexts retrieval returned for them."""
+    rng = random.Random(seed)
+    snippets = make_snippets(source, count, rng)
+    records = []
+    for document, _ in make_requests(source, count, 3, seed):
+        data = {
+            "prefix": document.prefix,
+            "suffix": document.suffix,
+            "metadata": {"fpath_tuple": ["repo", "benchmark.py"], "line_no": document.position.line,
+                         "context_start_characterno": document.position.character},
+        }
+        # Neighbouring records retrieve overlapping snippets
+        first = rng.randint(0, len(snippets) - 20)
+        records.append((data, rng.sample(snippets[first:first + 20], rng.randint(3, 10))))
+    return records
+
+
+def get_size(path: str) -> int:
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compare the JSONL and the deduplicated Arrow prompt dataset formats')
+    parser.add_argument('--source_dir', type=str, default=PROJECT_ROOT,
+                        help='Directory whose python files make up the benchmark document and snippets')
+    parser.add_argument('--lines', type=int, default=2000,
+                        help='Minimum number of lines of the benchmark document')
+    parser.add_argument('--records', type=int, default=500,
+                        help='Number of prompt records')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed for picking cursors and snippets')
+
+    args = parser.parse_args()
+
+    records = make_records(build_source(args.source_dir, args.lines), args.records, args.seed)
+    with tempfile.TemporaryDirectory() as directory:
+        jsonl_file = os.path.join(directory, "prompts.jsonl")
+        arrow_dir = os.path.join(directory, "prompts")
+
+        def write_jsonl():
+            with jsonlines.open(jsonl_file, mode='w') as writer:
+                writer.write_all(build_jsonl_record(data, contexts, prompt_extractor) for data, contexts in records)
+
+        def write_arrow():
+            with PromptDatasetWriter(arrow_dir, prompt_extractor) as writer:
+                for data, contexts in records:
+                    writer.write(data, contexts)
+
+        _, jsonl_write = timed(write_jsonl)
+        _, arrow_write = timed(write_arrow)
+
+        def read_jsonl():
+            with open(jsonl_file, "r", encoding="utf-8") as f:
+                return [json.loads(line) for line in f]
+
+        expected, jsonl_load = timed(read_jsonl)
+        dataset, arrow_open = timed(lambda: PromptDataset(arrow_dir))
+        rebuilt, arrow_rebuild = timed(lambda: list(dataset))
+        assert rebuilt == expected
+        print(f"{len(records)} records, rebuilt records match the JSONL records")
+
+        rng = random.Random(args.seed)
+        indexes = [rng.randrange(len(dataset)) for _ in range(100)]
+        _, random_prompts = timed(lambda: [dataset.get_prompt(index) for index in indexes])
+
+        print(f"jsonl: {get_size(jsonl_file) / 2 ** 20:.1f}MB, write {jsonl_write:.2f}s, load all {jsonl_load:.2f}s")
+        print(f"arrow: {get_size(arrow_dir) / 2 ** 20:.1f}MB, write {arrow_write:.2f}s, open {arrow_open * 1e3:.1f}ms, "
+              f"rebuild all {arrow_rebuild:.2f}s, one prompt {random_prompts / len(indexes) * 1e3:.2f}ms")
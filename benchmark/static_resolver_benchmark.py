@@ -0,0 +1,120 @@
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from schema.common import Position
+from schema.tree_sitter import SymbolRequest
+from graph_retrieval.lsp_command import get_definition_locations
+from graph_retrieval.lsp_cache import response_cache
+from graph_retrieval.symbol_context_snippets import get_symbol_context_snippets, is_common_import
+from graph_retrieval.symbol_table import get_symbol_table, IGNORED_DIRECTORIES
+from graph_retrieval.static_resolver import StaticDefinitionResolver
+from tree_sitter_local.tree_sitter_local import TreeSitterAnalyzer
+from file_system.virtual_file_system import vfs
+from benchmark.lsp_lookup_benchmark import PROJECT_ROOT
+
+
+def collect_requests(workspace_root: str, max_files: int, per_file: int):
+    """Up to `per_file` call sites from each of the first `max_files` Python files of a repository."""
+    analyzer = TreeSitterAnalyzer(language_string="python")
+    file_paths = []
+    for directory, directory_names, file_names in os.walk(workspace_root):
+        directory_names[:] = sorted(name for name in directory_names if name not in IGNORED_DIRECTORIES)
+        file_paths.extend(os.path.join(directory, name) for name in sorted(file_names) if name.endswith(".py"))
+
+    requests = []
+    for file_path in file_paths[:max_files]:
+        calls = analyzer.analyze_source(vfs.read_text(file_path))
+        step = max(len(calls) // per_file, 1)
+        for call in calls[::step][:per_file]:
+            requests.append(SymbolRequest(
+                symbol_name=call.name,
+                position=Position(line=call.start_line, character=call.start_char),
+                uri=file_path,
+                node_type="call",
+                language_id="python",
+                capture_name="identifier",
+                workspace=workspace_root,
+            ))
+    return requests
+
+
+def definition_key(locations):
+    """What a definition lookup decides: the first definition inside the repository, if any."""
+    locations = [location for location in locations if not is_common_import(location.uri)]
+    if not locations:
+        return None
+    return locations[0].uri, locations[0].range.start.line, locations[0].range.start.character
+
+
+def compare_definitions(requests):
+    resolver = StaticDefinitionResolver()
+    static_timings, lsp_timings = [], []
+    resolved = agreed = 0
+    for request in requests:
+        start = time.perf_counter()
+        definitions = resolver.get_definitions(request)
+        static_timings.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        lsp_locations = asyncio.run(get_definition_locations(request.uri, request.position, "python", request.workspace))
+        lsp_timings.append(time.perf_counter() - start)
+
+        if definitions is None:
+            continue
+        resolved += 1
+        if definition_key([definition.location for definition in definitions]) == definition_key(lsp_locations):
+            agreed += 1
+
+    print(f"requests: {len(requests)}")
+    print(f"static hit rate: {resolved}/{len(requests)} ({resolved / max(len(requests), 1) * 100:.1f}%)")
+    print(f"agreement with the language server on hits: {agreed}/{resolved} ({agreed / max(resolved, 1) * 100:.1f}%)")
+    print(f"static lookup: p50={statistics.median(static_timings) * 1e6:.1f}us mean={statistics.mean(static_timings) * 1e6:.1f}us")
+    print(f"lsp lookup: p50={statistics.median(lsp_timings) * 1000:.2f}ms mean={statistics.mean(lsp_timings) * 1000:.2f}ms")
+
+
+def snippet_keys(snippets):
+    return {(snippet.uri, snippet.start_line, snippet.symbol, snippet.content) for snippet in snippets}
+
+
+def compare_snippets(requests, recursion_limit: int):
+    """End to end lookups of every request, through the language server only and with the static resolver first."""
+    results = {}
+    for name, resolver in (("lsp only", None), ("static + lsp fallback", StaticDefinitionResolver())):
+        response_cache.clear()
+        timings, keys = [], set()
+        for request in requests:
+            start = time.perf_counter()
+            snippets = asyncio.run(get_symbol_context_snippets([request], recursion_limit, static_resolver=resolver))
+            timings.append(time.perf_counter() - start)
+            keys |= snippet_keys(snippets)
+        results[name] = keys
+        print(f"{name}: p50={statistics.median(timings) * 1000:.2f}ms mean={statistics.mean(timings) * 1000:.2f}ms snippets={len(keys)}")
+
+    lsp_keys, static_keys = results["lsp only"], results["static + lsp fallback"]
+    print(f"identical snippets: {len(lsp_keys & static_keys)}/{len(lsp_keys | static_keys)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compare the static definition resolver with the language server')
+    parser.add_argument('--workspace', type=str, default=PROJECT_ROOT,
+                        help='Repository to resolve symbols in')
+    parser.add_argument('--max_files', type=int, default=50,
+                        help='Number of files to take call sites from')
+    parser.add_argument('--per_file', type=int, default=5,
+                        help='Number of call sites per file')
+    parser.add_argument('--recursion_limit', type=int, default=2,
+                        help='Recursion limit passed to get_symbol_context_snippets')
+
+    args = parser.parse_args()
+    workspace_root = os.path.abspath(args.workspace)
+
+    start = time.perf_counter()
+    indexed = get_symbol_table(workspace_root).index_all()
+    print(f"indexed {indexed} files in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    requests = collect_requests(workspace_root, args.max_files, args.per_file)
+    compare_definitions(requests)
+    compare_snippets(requests, args.recursion_limit)
@@ -0,0 +1,59 @@
+import argparse
+import statistics
+import time
+
+from post_processing.utils import trim_until_suffix
+from post_processing.truncate_parsed_completion import insert_missing_brackets, find_largest_suffix_prefix_overlap
+from benchmark.lsp_lookup_benchmark import PROJECT_ROOT
+from benchmark.tree_cache_benchmark import build_source
+# The implementations the kernels replaced, checked against the kernels by the tests
+from tests.test_text_kernels import (
+    reference_find_largest_suffix_prefix_overlap,
+    reference_insert_missing_brackets,
+    reference_trim_until_suffix,
+)
+
+
+def time_calls(function, iterations: int):
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1e6
+
+
+def compare(name: str, reference, kernel, iterations: int):
+    assert reference() == kernel(), name
+    reference_time, kernel_time = time_calls(reference, iterations), time_calls(kernel, iterations)
+    print(f"{name}: {reference_time:.1f}us -> {kernel_time:.1f}us p50 ({reference_time / kernel_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Time the post-processing text kernels against the code they replaced')
+    parser.add_argument('--source_dir', type=str, default=PROJECT_ROOT,
+                        help='Directory whose python files make up the suffix of the timed calls')
+    parser.add_argument('--iterations', type=int, default=200,
+                        help='Number of timed calls per function')
+
+    args = parser.parse_args()
+
+    # Sizes of a real request: a multi-line completion, a node text, the rest of a 5000-line file as suffix
+    suffix = "\n" + build_source(args.source_dir, 5000)
+    completion = "    value = compute(a, [b, {c: d}])\n    if value:\n        return value\n" * 10
+    node_text = "def f(x):\n" + completion + "    value = compute(a, [b, {c: d}])\n"
+    prefix = "class A:\n    def f(self):\n        "
+
+    compare("insert_missing_brackets", lambda: reference_insert_missing_brackets(completion),
+            lambda: insert_missing_brackets(completion), args.iterations)
+    compare("find_largest_suffix_prefix_overlap", lambda: reference_find_largest_suffix_prefix_overlap(node_text, completion.strip()),
+            lambda: find_largest_suffix_prefix_overlap(node_text, completion.strip()), args.iterations)
+    # A whole class as the node, the reference grows with the square of its size
+    compare("find_largest_suffix_prefix_overlap, 10x", lambda: reference_find_largest_suffix_prefix_overlap(node_text * 10, completion.strip() * 10),
+            lambda: find_largest_suffix_prefix_overlap(node_text * 10, completion.strip() * 10), args.iterations // 10)
+    # The worst case of the kernel: every offset of the tail starts a candidate that mismatches halfway
+    spaces, halted = " " * 2000, " " * 1000 + "x" + " " * 999
+    compare("find_largest_suffix_prefix_overlap, worst case", lambda: reference_find_largest_suffix_prefix_overlap(spaces, halted),
+            lambda: find_largest_suffix_prefix_overlap(spaces, halted), args.iterations // 10)
+    compare("trim_until_suffix", lambda: reference_trim_until_suffix(completion, prefix, suffix, "python"),
+            lambda: trim_until_suffix(completion, prefix, suffix, "python"), args.iterations)
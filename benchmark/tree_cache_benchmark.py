@@ -0,0 +1,114 @@
+import argparse
+import glob
+import os
+import random
+import statistics
+import time
+
+from schema.common import Document, Position
+from context.handle_current_context import get_current_doc_context
+from post_processing.parse_and_truncate_completion import parse_and_truncate_completion
+from post_processing.process_inline_completion import process_completion
+from graph_retrieval.identifiers import get_last_n_graph_context_identifiers_from_document
+from tree_sitter_local.tree_sitter_local import tree_sitter_pool
+from benchmark.lsp_lookup_benchmark import PROJECT_ROOT
+
+
+def build_source(source_dir: str, min_lines: int) -> str:
+    """A large python file made of the modules of a directory."""
+    chunks, line_count = [], 0
+    for file_path in sorted(glob.glob(os.path.join(source_dir, "**", "*.py"), recursive=True)):
+        with open(file_path, "r", encoding="utf-8") as f:
+            text = f.read()
+        chunks.append(text)
+        line_count += text.count("\n")
+        if line_count >= min_lines:
+            break
+    return "\n".join(chunks)
+
+
+def make_requests(source: str, count: int, completion_lines: int, seed: int):
+    """Cut `completion_lines` lines out of the source at random indented lines, like an infilling dataset."""
+    rng = random.Random(seed)
+    lines = source.split("\n")
+    candidates = [index for index, line in enumerate(lines[:-completion_lines]) if line.startswith("    ") and line.strip()]
+    requests = []
+    for line_no in sorted(rng.sample(candidates, min(count, len(candidates)))):
+        indent = len(lines[line_no]) - len(lines[line_no].lstrip())
+        prefix = "\n".join(lines[:line_no] + [lines[line_no][:indent]])
+        middle = "\n".join([lines[line_no][indent:]] + lines[line_no + 1:line_no + completion_lines])
+        suffix = "\n" + "\n".join(lines[line_no + completion_lines:])
+        document = Document(uri="benchmark.py", language_id="python", text=prefix + suffix, prefix=prefix,
+                            suffix=suffix, offset=len(prefix), position=Position(line=line_no, character=indent))
+        requests.append((document, middle))
+    return requests
+
+
+def post_process(document: Document, completion: str) -> str:
+    doc_context = get_current_doc_context(document, document.language_id)
+    parsed = parse_and_truncate_completion(completion, {'document': document, 'doc_context': doc_context}, True)
+    if parsed is None:
+        return completion
+    return process_completion(parsed, {'document': document, 'doc_context': doc_context}, True)['insert_text']
+
+
+def check_trees(requests):
+    """Incrementally parsed trees with the completion must equal a full parse of the same text."""
+    from post_processing.parse_completion import parse_completion
+
+    analyzer = tree_sitter_pool.get_analyzer("python")
+    for document, completion in requests:
+        doc_context = get_current_doc_context(document, document.language_id)
+        parsed = parse_completion({'completion': {'insert_text': completion}, 'document': document, 'doc_context': doc_context})
+        text = document.text[:document.offset] + completion + document.text[document.offset:]
+        if doc_context['current_line_suffix'] == '':
+            assert parsed['tree'].root_node.sexp() == analyzer.parser.parse(bytes(text, "utf8")).root_node.sexp()
+    print(f"incremental trees match full parses for {len(requests)} completions")
+
+
+def time_requests(requests, repeats: int):
+    post_processing, identifiers, outputs = [], [], []
+    for document, completion in requests:
+        for _ in range(repeats):
+            start = time.perf_counter()
+            output = post_process(document, completion)
+            post_processing.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            get_last_n_graph_context_identifiers_from_document(document=document, position=document.position, n=1)
+            identifiers.append(time.perf_counter() - start)
+        outputs.append(output)
+    print(f"post-processing: p50={statistics.median(post_processing) * 1000:.2f}ms "
+          f"mean={statistics.mean(post_processing) * 1000:.2f}ms per request")
+    print(f"identifier extraction: p50={statistics.median(identifiers) * 1000:.2f}ms "
+          f"mean={statistics.mean(identifiers) * 1000:.2f}ms per request")
+    return outputs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark tree-sitter parse time per post-processing request')
+    parser.add_argument('--source_dir', type=str, default=PROJECT_ROOT,
+                        help='Directory whose python files make up the benchmark document')
+    parser.add_argument('--lines', type=int, default=5000,
+                        help='Minimum number of lines of the benchmark document')
+    parser.add_argument('--requests', type=int, default=20,
+                        help='Number of completion requests cut out of the document')
+    parser.add_argument('--completion_lines', type=int, default=3,
+                        help='Number of lines of every completion')
+    parser.add_argument('--repeats', type=int, default=3,
+                        help='Number of times every request is timed, as the same document is post-processed repeatedly')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed for picking completion positions')
+    parser.add_argument('--output', type=str, default=None,
+                        help='Write the post-processed completions here, to compare runs')
+
+    args = parser.parse_args()
+
+    source = build_source(args.source_dir, args.lines)
+    requests = make_requests(source, args.requests, args.completion_lines, args.seed)
+    print(f"{source.count(chr(10)) + 1} lines, {len(requests)} requests")
+    check_trees(requests)
+    outputs = time_requests(requests, args.repeats)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write("\n\0\n".join(outputs))
@@ -0,0 +1,94 @@
+import argparse
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from tree_sitter import Parser
+from tree_sitter_languages import get_language
+
+from schema.common import Document, Position
+from graph_retrieval.identifiers import get_last_n_graph_context_identifiers_from_document
+from tree_sitter_local.tree_sitter_local import tree_sitter_pool
+from benchmark.lsp_lookup_benchmark import PROJECT_ROOT
+
+
+def create_unpooled_analyzer(language_string: str):
+    """What constructing an analyzer used to cost: load the language, build a parser, compile the query twice."""
+    language = get_language(language=language_string)
+    parser = Parser()
+    parser.set_language(language)
+    source = tree_sitter_pool.get_query_source(language_string)
+    language.query(source)
+    return parser, language.query(source)
+
+
+def time_calls(function, iterations: int):
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def report(name: str, timings):
+    print(f"{name}: p50={statistics.median(timings) * 1e6:.1f}us mean={statistics.mean(timings) * 1e6:.1f}us")
+
+
+def time_acquisition(language_string: str, iterations: int):
+    report(f"{language_string} analyzer, unpooled", time_calls(lambda: create_unpooled_analyzer(language_string), iterations))
+    report(f"{language_string} analyzer, pooled", time_calls(lambda: tree_sitter_pool.get_analyzer(language_string), iterations))
+
+
+def time_identifiers(file_path: str, iterations: int):
+    """Identifier extraction for a request at the end of a file, with and without analyzer construction."""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    lines = text.split('\n')
+    document = Document(uri=os.path.abspath(file_path), language_id='python', text=text)
+    position = Position(line=len(lines) - 1, character=len(lines[-1]))
+
+    def with_unpooled_analyzer():
+        create_unpooled_analyzer('python')
+        get_last_n_graph_context_identifiers_from_document(document=document, position=position, n=1)
+
+    report("identifier extraction + unpooled analyzer", time_calls(with_unpooled_analyzer, iterations))
+    report("identifier extraction, pooled", time_calls(
+        lambda: get_last_n_graph_context_identifiers_from_document(document=document, position=position, n=1), iterations))
+
+
+def check_threads(language_string: str, threads: int):
+    """Every thread gets its own analyzer, sharing one compiled query."""
+    barrier = threading.Barrier(threads)
+
+    def acquire(_):
+        # Hold every worker until all of them run, so each request comes from its own thread
+        barrier.wait()
+        return tree_sitter_pool.get_analyzer(language_string)
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        analyzers = list(executor.map(acquire, range(threads)))
+    parsers = {id(analyzer.parser) for analyzer in analyzers}
+    queries = {id(analyzer.FUNCTION_CALL_QUERY) for analyzer in analyzers}
+    print(f"{threads} threads: {len(parsers)} distinct parsers, {len(queries)} shared queries")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the cost of acquiring a tree-sitter analyzer per request')
+    parser.add_argument('--languages', type=str, nargs='*', default=['python', 'java'],
+                        help='Languages to acquire analyzers for')
+    parser.add_argument('--file', type=str, default=os.path.join('graph_retrieval', 'symbol_context_snippets.py'),
+                        help='File to extract identifiers from, relative to the project root')
+    parser.add_argument('--iterations', type=int, default=200,
+                        help='Number of timed acquisitions')
+    parser.add_argument('--threads', type=int, default=4,
+                        help='Number of threads acquiring analyzers concurrently')
+
+    args = parser.parse_args()
+
+    for language_string in args.languages:
+        time_acquisition(language_string, args.iterations)
+    time_identifiers(os.path.join(PROJECT_ROOT, args.file), args.iterations)
+    check_threads(args.languages[0], args.threads)
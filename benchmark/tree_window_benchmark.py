@@ -0,0 +1,77 @@
+import argparse
+import statistics
+import time
+
+from graph_retrieval.identifiers import get_last_n_graph_context_identifiers_from_document, WINDOWED_PARSE_MIN_LINES
+from tree_sitter_local.tree_cache import tree_cache
+from benchmark.lsp_lookup_benchmark import PROJECT_ROOT
+from benchmark.tree_cache_benchmark import build_source, make_requests
+
+# Compare every identifier of the analyzed lines, not only the ones resolved by the pipeline
+COMPARED_IDENTIFIERS = 10000
+
+
+def extract(document, windowed: bool):
+    return get_last_n_graph_context_identifiers_from_document(
+        document=document, position=document.position, n=COMPARED_IDENTIFIERS, windowed=windowed)
+
+
+def compare(requests):
+    """Windowed and full parses must find the same identifiers at the same positions."""
+    matching = 0
+    for document, _ in requests:
+        full = [(request.symbol_name, request.position.line, request.position.character) for request in extract(document, False)]
+        windowed = [(request.symbol_name, request.position.line, request.position.character) for request in extract(document, True)]
+        matching += full == windowed
+    print(f"windowed identifiers match full parses for {matching}/{len(requests)} requests")
+
+
+def time_requests(requests, windowed: bool, cached: bool = False):
+    """
+    Time extracting the identifiers of every request. Without `cached` each one parses its document
+    from scratch, with it the tree of the previous request is edited and parsed incrementally.
+    """
+    tree_cache.clear()
+    timings = []
+    for document, _ in requests:
+        if not cached:
+            tree_cache.clear()
+        start = time.perf_counter()
+        extract(document, windowed)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def make_document_requests(source_dir: str, lines: int, requests: int, seed: int):
+    # Repeat the directory's files until the document is large enough
+    base_source = build_source(source_dir, lines)
+    source = base_source
+    while source.count('\n') < lines:
+        source += "\n" + base_source
+    # Cut at the requested size, so each size measures documents of that many lines
+    source = '\n'.join(source.split('\n')[:lines])
+    return make_requests(source, requests, 3, seed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark windowed against full parsing for identifier extraction')
+    parser.add_argument('--source_dir', type=str, default=PROJECT_ROOT,
+                        help='Directory whose python files make up the benchmark document')
+    parser.add_argument('--lines', type=int, nargs='*', default=[1000, 2500, 5000, 10000, 20000, 40000],
+                        help='Numbers of lines of the benchmark documents')
+    parser.add_argument('--requests', type=int, default=50,
+                        help='Number of completion requests cut out of the document')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed for picking cursor positions')
+
+    args = parser.parse_args()
+
+    print(f"documents of at least {WINDOWED_PARSE_MIN_LINES} lines are parsed in windows")
+    for lines in args.lines:
+        requests = make_document_requests(args.source_dir, lines, args.requests, args.seed)
+        full = statistics.median(time_requests(requests, False)) * 1e3
+        incremental = statistics.median(time_requests(requests, False, cached=True)) * 1e3
+        windowed = statistics.median(time_requests(requests, True)) * 1e3
+        print(f"{lines} lines: full parse p50={full:.2f}ms, incremental parse p50={incremental:.2f}ms, "
+              f"windowed parse p50={windowed:.2f}ms")
+    compare(make_document_requests(args.source_dir, max(args.lines), args.requests, args.seed))
@@ -1,47 +1,25 @@
 import re
 
 from schema.common import Position
-from post_processing.utils import indentation, get_last_line, lines, FUNCTION_KEYWORDS, \
-    FUNCTION_OR_METHOD_INVOCATION_REGEX, OPENING_BRACKET_REGEX
-from programing_language import get_language_config, ProgrammingLanguage
-
-LANGUAGES_WITH_MULTILINE_SUPPORT = [
-    'astro',
-    'c',
-    'cpp',
-    'c_sharp',
-    'css',
-    'dart',
-    'elixir',
-    'go',
-    'html',
-    'java',
-    'javascript',
-    'javascriptreact',
-    'kotlin',
-    'php',
-    'python',
-    'rust',
-    'svelte',
-    'typescript',
-    'typescriptreact',
-    'vue'
-]
+from post_processing.utils import indentation, FUNCTION_KEYWORDS, FUNCTION_OR_METHOD_INVOCATION_REGEX, \
+    OPENING_BRACKET_REGEX
+from post_processing.text_kernels import get_trimmed_end, iter_lines_reversed
+from programing_language import get_language_profile
 
 
 def ends_with_block_start(text, language_id):
-    language_config = get_language_config(language_id)
-    if language_config and language_config.get('block_start'):
-        block_start = language_config['block_start']
-        if text.rstrip().endswith(block_start):
+    profile = get_language_profile(language_id)
+    if profile and profile.block_start:
+        block_start = profile.block_start
+        if text.endswith(block_start, 0, get_trimmed_end(text)):
             return block_start
     return None
 
 
 def start_with_block_end(text, language_id):
-    language_config = get_language_config(language_id)
-    if language_config and language_config.get('block_end'):
-        block_end = language_config['block_end']
+    profile = get_language_profile(language_id)
+    if profile and profile.block_end:
+        block_end = profile.block_end
         if text.lstrip().startswith(block_end):
             return block_end
     return None
@@ -55,7 +33,8 @@ def detect_multiline(params):
     current_line_prefix = doc_context['current_line_prefix']
     current_line_suffix = doc_context['current_line_suffix']
 
-    is_multiline_supported = language_id in LANGUAGES_WITH_MULTILINE_SUPPORT
+    profile = get_language_profile(language_id)
+    is_multiline_supported = bool(profile and profile.multiline_support)
     current_line_text = (
             current_line_suffix.strip() + current_line_prefix) if current_line_suffix.strip() else current_line_prefix
 
@@ -124,7 +103,9 @@ def detect_open_bracket(doc_context, language_id, position):
     current_line_prefix = doc_context['current_line_prefix']
     current_line_suffix = doc_context['current_line_suffix']
 
-    opening_bracket_match = re.search(OPENING_BRACKET_REGEX, get_last_line(prefix.strip()))
+    # Last line of the stripped prefix, the regex only looks at its end so leading whitespace does not matter
+    trimmed_end = get_trimmed_end(prefix)
+    opening_bracket_match = re.search(OPENING_BRACKET_REGEX, prefix[prefix.rfind('\n', 0, trimmed_end) + 1:trimmed_end])
 
     is_same_line_opening_bracket_match = (
             current_line_prefix.strip() and
@@ -166,24 +147,21 @@ def detect_start_non_empty_block(doc_context, language_id, position):
 
 
 def get_prefix_last_non_empty_char_position(prefix: str, cursor_position: Position):
-    trimmed_prefix = prefix.rstrip()
-    diff_length = len(prefix) - len(trimmed_prefix)
+    trimmed_end = get_trimmed_end(prefix)
+    diff_length = len(prefix) - trimmed_end
 
     if diff_length == 0:
         return cursor_position.translate(0, -1)
 
-    prefix_diff = prefix[-diff_length:]
     return Position(
-        cursor_position.line - (len(lines(prefix_diff)) - 1),
-        len(get_last_line(trimmed_prefix)) - 1
+        cursor_position.line - prefix.count('\n', trimmed_end),
+        trimmed_end - (prefix.rfind('\n', 0, trimmed_end) + 1) - 1
     )
 
 
 def find_block_start(language_id, prefix, current_line_prefix, cursor_position):
-    language_config = get_language_config(language_id)
-    block_start = None
-    if language_config and language_config.get('block_start'):
-        block_start = language_config['block_start']
+    profile = get_language_profile(language_id)
+    block_start = profile.block_start if profile else None
 
     if not block_start:
         return {
@@ -192,9 +170,11 @@ def find_block_start(language_id, prefix, current_line_prefix, cursor_position):
             "line": None
         }
 
-    lines_of_prefix = lines(prefix)
-    reverse_lines_of_prefix = lines_of_prefix[::-1]
-    for i, line in enumerate(reverse_lines_of_prefix):
+    # Lines from the cursor back, split like lines(prefix) without splitting the whole prefix
+    for i, (line_start, line_end) in enumerate(iter_lines_reversed(prefix)):
+        if line_end < len(prefix) and prefix[line_end - 1:line_end] == '\r':
+            line_end -= 1
+        line = prefix[line_start:line_end]
         if block_start in line and indentation(line) < indentation(current_line_prefix):
             return {
                 "multiline_trigger": block_start,
@@ -1,3 +1,5 @@
+from functools import cached_property
+
 from .detect_multiline import detect_multiline
 from schema.common import Position, Document
 from post_processing.process_inline_completion import get_matching_suffix_length
@@ -53,26 +55,85 @@ def insert_into_doc_context(params):
     return updated_doc_context
 
 
+class DocContext:
+    """
+    The prefix and suffix around the cursor of a request and the context derived from them.
+
+    Derived fields are computed on first access and only scan the end of the prefix and the
+    start of the suffix up to the lines they need, so building the context of a request does
+    not grow with the size of the document. Fields are attributes and, like the dict this
+    used to be, can be read with doc_context['field'] and doc_context.get('field').
+    """
+
+    FIELDS = ('prefix', 'suffix', 'current_line_prefix', 'current_line_suffix', 'prev_non_empty_line',
+              'next_non_empty_line', 'position', 'multiline_trigger', 'multiline_trigger_position')
+
+    def __init__(self, prefix: str, suffix: str, position: Position, language_id: str):
+        self.prefix = prefix
+        self.suffix = suffix
+        self.language_id = language_id
+        self._position = position
+
+    @cached_property
+    def current_line_prefix(self) -> str:
+        return get_last_line(self.prefix)
+
+    @cached_property
+    def current_line_suffix(self) -> str:
+        return get_first_line(self.suffix)
+
+    @cached_property
+    def prev_non_empty_line(self) -> str:
+        return get_prev_non_empty_line(self.prefix)
+
+    @cached_property
+    def next_non_empty_line(self) -> str:
+        return get_next_non_empty_line(self.suffix)
+
+    @cached_property
+    def multiline_info(self) -> dict:
+        return detect_multiline({
+            'doc_context': self,
+            'language_id': self.language_id,
+            'position': self._position,
+        })
+
+    @property
+    def position(self) -> Position:
+        # Detection moves the cursor position in place when the trigger is right before it,
+        # read it after detection like when the context was built eagerly
+        self.multiline_info
+        return self._position
+
+    @property
+    def multiline_trigger(self):
+        return self.multiline_info.get('multiline_trigger')
+
+    @property
+    def multiline_trigger_position(self):
+        return self.multiline_info.get('multiline_trigger_position')
+
+    def __getitem__(self, key):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key):
+        return key in self.FIELDS
+
+    def get(self, key, default=None):
+        return self[key] if key in self.FIELDS else default
+
+    def __repr__(self):
+        return f"DocContext({', '.join(f'{field}={self[field]!r}' for field in self.FIELDS)})"
+
+
 def get_derived_doc_context(params):
     position = params['position']
     document_dependent_context = params['document_dependent_context']
     language_id = params['language_id']
 
-    lines_context = get_lines_context(document_dependent_context['prefix'], document_dependent_context['suffix'])
-
-    multiline_info = detect_multiline({
-        'doc_context': {**document_dependent_context, **lines_context},
-        'language_id': language_id,
-        'position': position,
-    })
-
-    return {
-        **document_dependent_context,
-        **lines_context,
-        'position': position,
-        'multiline_trigger': multiline_info.get('multiline_trigger'),
-        'multiline_trigger_position': multiline_info.get('multiline_trigger_position'),
-    }
+    return DocContext(document_dependent_context['prefix'], document_dependent_context['suffix'], position, language_id)
 
 
 if __name__ == "__main__":
@@ -19,8 +19,11 @@ class ContextMixer:
     the snippets from each retriever into a single list.
     """
     
-    def __init__(self):
-        self.retrievers = [JaccardSimilarityRetriever(base_dir=BASE_DIR), LsptRetriever()]
+    def __init__(self, base_dir: str = BASE_DIR, static_resolver=None):
+        self.retrievers = [
+            JaccardSimilarityRetriever(base_dir=base_dir),
+            LsptRetriever(base_dir=base_dir, static_resolver=static_resolver),
+        ]
         self.maxChars = 10000  # Default value
     
     async def get_context(self, document: Document, position: Position, repo: Optional[str] = None):
@@ -0,0 +1,37 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterable, Iterator, List, Optional, TypeVar
+
+Item = TypeVar("Item")
+Result = TypeVar("Result")
+
+# Chunks queued per worker, enough to keep workers busy while the output is written
+CHUNKS_IN_FLIGHT_PER_WORKER = 2
+
+
+def map_chunks_in_order(
+    function: Callable[[List[Item]], List[Result]],
+    chunks: Iterable[List[Item]],
+    workers: int,
+    initializer: Optional[Callable[[], None]] = None,
+) -> Iterator[List[Result]]:
+    """
+    Call `function` on every chunk and yield the results in input order.
+
+    Chunks run over a pool of `workers` processes when there is more than one, so `function`
+    must be picklable, and `initializer` runs once in every worker. A bounded window of chunks
+    is in flight, so the input is never read far ahead of the output.
+    """
+    if workers <= 1:
+        for chunk in chunks:
+            yield function(chunk)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer) as executor:
+        in_flight = deque()
+        for chunk in chunks:
+            in_flight.append(executor.submit(function, chunk))
+            if len(in_flight) >= workers * CHUNKS_IN_FLIGHT_PER_WORKER:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
@@ -0,0 +1,113 @@
+import re
+from array import array
+from bisect import bisect_right
+from typing import Tuple
+
+from file_system.text_cache import TextKeyedCache
+
+MAX_CACHED_LINE_INDEXES = 32
+
+NEWLINE_REGEX = re.compile('\n')
+BYTES_NEWLINE_REGEX = re.compile(b'\n')
+
+
+class LineIndex:
+    """
+    Offsets at which each line of a text starts, in characters and in UTF-8 bytes.
+
+    Lines are split on '\\n' like tree-sitter rows: a trailing newline starts one more, empty,
+    line. Conversions between (line, character), character offsets, byte offsets and
+    tree-sitter points are a binary search over the line starts plus, for non-ASCII text,
+    encoding the one line they fall in.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.is_ascii = text.isascii()
+        self.line_offsets = array('q', [0])
+        self.line_offsets.extend(match.end() for match in NEWLINE_REGEX.finditer(text))
+        if self.is_ascii:
+            self.byte_line_offsets = self.line_offsets
+        else:
+            # '\n' is a single byte in UTF-8, so the n-th newline of the bytes is the n-th of the text
+            self.byte_line_offsets = array('q', [0])
+            self.byte_line_offsets.extend(match.end() for match in BYTES_NEWLINE_REGEX.finditer(text.encode('utf-8')))
+
+    @property
+    def line_count(self) -> int:
+        return len(self.line_offsets)
+
+    def get_line_end(self, line: int) -> int:
+        """Offset of the end of `line`, before its newline."""
+        if line + 1 < len(self.line_offsets):
+            return self.line_offsets[line + 1] - 1
+        return len(self.text)
+
+    def position_to_offset(self, line: int, character: int) -> int:
+        """
+        Character offset of a (line, character) position, raises IndexError for lines past the end.
+
+        Characters past the end of the line are clamped to it, like slicing the line.
+        """
+        if not 0 <= line < len(self.line_offsets):
+            raise IndexError("line index out of range")
+        return min(self.line_offsets[line] + max(character, 0), self.get_line_end(line))
+
+    def offset_to_position(self, offset: int) -> Tuple[int, int]:
+        """(line, character) of a character offset."""
+        line = bisect_right(self.line_offsets, offset) - 1
+        return line, offset - self.line_offsets[line]
+
+    def offset_to_byte(self, offset: int) -> int:
+        if self.is_ascii:
+            return offset
+        line, character = self.offset_to_position(offset)
+        return self.byte_line_offsets[line] + self._byte_length(line, character)
+
+    def position_to_byte(self, line: int, character: int) -> int:
+        return self.offset_to_byte(self.position_to_offset(line, character))
+
+    def byte_to_offset(self, byte_offset: int) -> int:
+        """Character offset of a byte offset, bytes inside a character map to its start."""
+        if self.is_ascii:
+            return byte_offset
+        line = bisect_right(self.byte_line_offsets, byte_offset) - 1
+        line_start = self.line_offsets[line]
+        line_bytes = self.text[line_start:self.get_line_end(line)].encode('utf-8')
+        return line_start + len(line_bytes[:byte_offset - self.byte_line_offsets[line]].decode('utf-8', errors='ignore'))
+
+    def offset_to_point(self, offset: int) -> Tuple[int, int]:
+        """Tree-sitter point of a character offset: (row, column in bytes)."""
+        line, character = self.offset_to_position(offset)
+        if self.is_ascii:
+            return line, character
+        return line, self._byte_length(line, character)
+
+    def offset_to_utf16_position(self, offset: int) -> Tuple[int, int]:
+        """(line, character) of a character offset, with the character counted in UTF-16 code units like LSP."""
+        line, character = self.offset_to_position(offset)
+        if self.is_ascii:
+            return line, character
+        line_prefix = self.text[self.line_offsets[line]:offset]
+        return line, len(line_prefix.encode('utf-16-le')) // 2
+
+    def _byte_length(self, line: int, character: int) -> int:
+        line_start = self.line_offsets[line]
+        line_prefix = self.text[line_start:line_start + character]
+        return len(line_prefix) if line_prefix.isascii() else len(line_prefix.encode('utf-8'))
+
+
+def advance_position(position: Tuple[int, int], text: str) -> Tuple[int, int]:
+    """(line, character) at the end of `text` when it is written starting at `position`."""
+    newline_count = text.count('\n')
+    if newline_count == 0:
+        return position[0], position[1] + len(text)
+    return position[0] + newline_count, len(text) - (text.rfind('\n') + 1)
+
+
+# Process-wide line indexes shared by every module doing position math on documents
+line_index_cache: TextKeyedCache[LineIndex] = TextKeyedCache(LineIndex, MAX_CACHED_LINE_INDEXES)
+
+
+def get_line_index(text: str) -> LineIndex:
+    return line_index_cache.get(text)
@@ -0,0 +1,41 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, Generic, TypeVar
+
+Value = TypeVar("Value")
+
+
+class TextKeyedCache(Generic[Value]):
+    """
+    LRU cache of values built from a text, keyed by the text.
+
+    The text is the key, so every caller working on the same text shares one value. Python
+    caches the hash of a string, so repeated lookups with the same text object only cost the
+    dictionary lookup. Values are built outside the lock, two threads missing on the same
+    text may both build it and the last one is kept.
+    """
+
+    def __init__(self, build: Callable[[str], Value], max_entries: int):
+        self.build = build
+        self.max_entries = max_entries
+        self._values: "OrderedDict[str, Value]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, text: str) -> Value:
+        with self._lock:
+            value = self._values.get(text)
+            if value is not None:
+                self._values.move_to_end(text)
+                return value
+
+        value = self.build(text)
+
+        with self._lock:
+            self._values[text] = value
+            while len(self._values) > self.max_entries:
+                self._values.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
@@ -0,0 +1,37 @@
+from typing import Optional, Sequence, Tuple
+
+
+def common_prefix_length(a: Sequence, b: Sequence) -> int:
+    # Binary search over slice comparisons, which run at memcmp speed even for large files
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[low:middle] == b[low:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def common_suffix_length(a: Sequence, b: Sequence, limit: int) -> int:
+    low, high = 0, limit
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[len(a) - middle:len(a) - low] == b[len(b) - middle:len(b) - low]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def get_changed_span(old: Sequence, new: Sequence) -> Optional[Tuple[int, int, int]]:
+    """
+    The span replaced between the common prefix and the common suffix of two texts or sources.
+
+    Returns (start, old end, new end) offsets, None if both are equal. Works on str and bytes alike.
+    """
+    if old == new:
+        return None
+    start = common_prefix_length(old, new)
+    suffix_length = common_suffix_length(old, new, min(len(old), len(new)) - start)
+    return start, len(old) - suffix_length, len(new) - suffix_length
@@ -0,0 +1,219 @@
+import mmap
+import os
+import re
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional
+
+MMAP_THRESHOLD = 8 * 1024 * 1024  # files larger than this are memory-mapped instead of decoded
+MAX_CACHED_BYTES = 256 * 1024 * 1024
+
+NEWLINE_REGEX = re.compile('\n')
+# Line breaks of universal newline mode, matched in the raw bytes of memory-mapped files
+BYTES_LINE_BREAK_REGEX = re.compile(b'\r\n?|\n')
+
+
+class FileSnapshot:
+    """
+    Contents of one version of a file plus the offsets at which each line starts.
+
+    Lines follow `readlines()` semantics of a file opened in text mode: they are split on '\\n'
+    (after universal newline translation) and keep their line ending. Small files are held as
+    decoded text, large files are memory-mapped and only the requested lines are decoded, with
+    the same translation. The whole text of a mapped file is decoded once, on first access.
+    """
+
+    def __init__(self, path: str, version: Hashable, text: Optional[str] = None, mapped: Optional[mmap.mmap] = None):
+        self.path = path
+        self.version = version
+        self._text = text
+        self._mapped = mapped
+        if text is not None:
+            self.line_offsets = array('q', [0])
+            self.line_offsets.extend(match.end() for match in NEWLINE_REGEX.finditer(text))
+            self.length = len(text)
+        else:
+            # Byte offsets of the lines, a line break of any style ends a line
+            self.line_offsets = array('q', [0])
+            self._has_carriage_returns = mapped.find(b'\r') != -1
+            if self._has_carriage_returns:
+                self.line_offsets.extend(match.end() for match in BYTES_LINE_BREAK_REGEX.finditer(mapped))
+            else:
+                index = mapped.find(b'\n')
+                while index != -1:
+                    self.line_offsets.append(index + 1)
+                    index = mapped.find(b'\n', index + 1)
+            self.length = len(mapped)
+
+        # A trailing newline does not start another line
+        self.line_count = len(self.line_offsets) - (1 if self.line_offsets[-1] == self.length else 0)
+
+    @property
+    def is_mapped(self) -> bool:
+        return self._mapped is not None
+
+    @property
+    def memory_size(self) -> int:
+        """Approximate memory held by the snapshot, used for the cache budget."""
+        offsets_size = self.line_offsets.itemsize * len(self.line_offsets)
+        if self._text is None:
+            return offsets_size
+        return len(self._text) + offsets_size
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            # Line offsets stay byte offsets into the mapping, lines are still sliced from it
+            self._text = self._decode(0, self.length)
+        return self._text
+
+    def get_line(self, line: int) -> str:
+        """Line `line` including its line ending, raises IndexError like `readlines()[line]`."""
+        if line < 0:
+            line += self.line_count
+        if not 0 <= line < self.line_count:
+            raise IndexError("line index out of range")
+        return self._slice(self.line_offsets[line], self._line_end(line))
+
+    def get_lines(self, start_line: int, line_count: int) -> str:
+        """Equivalent of `''.join(lines[start_line:start_line + line_count])`."""
+        start_line = max(start_line, 0)
+        end_line = min(start_line + line_count, self.line_count)
+        if start_line >= end_line:
+            return ""
+        return self._slice(self.line_offsets[start_line], self._line_end(end_line - 1))
+
+    def get_range(self, start_line: int, start_char: int, end_line: int, end_char: int) -> str:
+        """
+        Text between two (line, character) positions, with the same clamping as slicing the
+        lines returned by `readlines()`.
+        """
+        if start_line == end_line:
+            line = self.get_line(start_line)
+            return line[start_char:end_char]
+
+        # Touch both boundary lines so out of range positions raise IndexError
+        self.get_line(end_line)
+        start_text = self.get_line(start_line)[start_char:]
+        middle_text = self.get_lines(start_line + 1, end_line - start_line - 1)
+        end_text = self.get_line(end_line)[:end_char]
+        return start_text + middle_text + end_text
+
+    def _line_end(self, line: int) -> int:
+        if line + 1 < len(self.line_offsets):
+            return self.line_offsets[line + 1]
+        return self.length
+
+    def _slice(self, start: int, end: int) -> str:
+        if self.is_mapped:
+            return self._decode(start, end)
+        return self._text[start:end]
+
+    def _decode(self, start: int, end: int) -> str:
+        text = self._mapped[start:end].decode('utf-8')
+        if self._has_carriage_returns:
+            # Universal newline translation, like the text mode reads of small files
+            text = text.replace('\r\n', '\n').replace('\r', '\n')
+        return text
+
+
+class VirtualFileSystem:
+    """
+    Process-wide cache of file snapshots shared by every reader in the pipeline.
+
+    Each access checks the file's mtime and size, so edited files are reloaded. Decoded
+    snapshots are evicted in least recently used order once `max_bytes` is exceeded. A mapped
+    snapshot counts towards the budget once its whole text has been decoded by `read_text`.
+    """
+
+    def __init__(self, max_bytes: int = MAX_CACHED_BYTES, mmap_threshold: int = MMAP_THRESHOLD):
+        self.max_bytes = max_bytes
+        self.mmap_threshold = mmap_threshold
+        self._snapshots: "OrderedDict[str, FileSnapshot]" = OrderedDict()
+        # Memory of each snapshot counted in `_cached_bytes`
+        self._snapshot_sizes: Dict[str, int] = {}
+        self._cached_bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_version(path: str) -> Hashable:
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def get(self, path: str) -> FileSnapshot:
+        """Snapshot of the current contents of `path`, raises OSError if it cannot be read."""
+        path = os.path.abspath(path)
+        version = self.get_version(path)
+        with self._lock:
+            snapshot = self._snapshots.get(path)
+            if snapshot is not None and snapshot.version == version:
+                self._snapshots.move_to_end(path)
+                return snapshot
+
+        snapshot = self._load(path, version)
+
+        with self._lock:
+            self._discard(path)
+            self._snapshots[path] = snapshot
+            self._update_size(path, snapshot)
+        return snapshot
+
+    def read_text(self, path: str) -> str:
+        path = os.path.abspath(path)
+        snapshot = self.get(path)
+        text = snapshot.text
+        if snapshot.is_mapped:
+            with self._lock:
+                # Decoding the text of a mapped file grows the snapshot
+                self._update_size(path, snapshot)
+        return text
+
+    def get_lines(self, path: str, start_line: int, line_count: int) -> str:
+        return self.get(path).get_lines(start_line, line_count)
+
+    def get_range(self, path: str, start_line: int, start_char: int, end_line: int, end_char: int) -> str:
+        return self.get(path).get_range(start_line, start_char, end_line, end_char)
+
+    def invalidate(self, path: str):
+        with self._lock:
+            self._discard(os.path.abspath(path))
+
+    def clear(self):
+        with self._lock:
+            for path in list(self._snapshots):
+                self._discard(path)
+
+    def _load(self, path: str, version: Hashable) -> FileSnapshot:
+        if version[1] >= max(self.mmap_threshold, 1):
+            with open(path, 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            return FileSnapshot(path, version, mapped=mapped)
+
+        with open(path, 'r', encoding='utf-8') as f:
+            return FileSnapshot(path, version, text=f.read())
+
+    def _update_size(self, path: str, snapshot: FileSnapshot):
+        if self._snapshots.get(path) is not snapshot:
+            return
+        size = snapshot.memory_size
+        self._cached_bytes += size - self._snapshot_sizes.get(path, 0)
+        self._snapshot_sizes[path] = size
+        self._evict_overflow(keep=path)
+
+    def _evict_overflow(self, keep: str):
+        while self._cached_bytes > self.max_bytes and len(self._snapshots) > 1:
+            oldest_path = next(iter(self._snapshots))
+            if oldest_path == keep:
+                break
+            self._discard(oldest_path)
+
+    def _discard(self, path: str):
+        snapshot = self._snapshots.pop(path, None)
+        if snapshot is not None:
+            self._cached_bytes -= self._snapshot_sizes.pop(path)
+            # Mapped snapshots may still be referenced by readers, let the GC close them
+
+
+# Process-wide file system cache used for every file read in the pipeline
+vfs = VirtualFileSystem()
@@ -1,25 +1,8 @@
-go_keywords = {
-    "break", "case", "chan", "const", "continue", "default", "defer", "else", "fallthrough", "for",
-    "func", "go", "goto", "if", "import", "interface", "map", "package", "range", "return", "select",
-    "struct", "switch", "type", "var",
-    # Common variables, types we don't need to follow
-    "Context", "ctx", "err", "error", "ok"
-}
-
-typescript_keywords = {
-    "any", "as", "async", "boolean", "break", "case", "catch", "class", "const", "constructor", "continue",
-    "debugger", "declare", "default", "delete", "do", "else", "enum", "export", "extends", "false", "finally",
-    "for", "from", "function", "if", "implements", "import", "in", "instanceof", "interface", "let", "module",
-    "new", "null", "number", "of", "package", "private", "protected", "public", "require", "return", "static",
-    "string", "super", "switch", "symbol", "this", "throw", "true", "try", "type", "typeof", "var", "void",
-    "while", "with", "yield"
-}
+from programing_language import LANGUAGE_KEYWORDS, ProgrammingLanguage
 
-python_keywords = {
-    "and", "as", "assert", "async", "await", "break", "class", "continue", "def", "del", "elif", "else",
-    "except", "False", "finally", "for", "from", "global", "if", "import", "in", "is", "lambda", "None",
-    "nonlocal", "not", "or", "pass", "raise", "return", "True", "try", "while", "with", "yield"
-}
+go_keywords = LANGUAGE_KEYWORDS[ProgrammingLanguage.GO]
+typescript_keywords = LANGUAGE_KEYWORDS[ProgrammingLanguage.TYPESCRIPT]
+python_keywords = LANGUAGE_KEYWORDS[ProgrammingLanguage.PYTHON]
 
 common_keywords = go_keywords | typescript_keywords | python_keywords
 
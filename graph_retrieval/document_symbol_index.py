@@ -0,0 +1,55 @@
+from typing import Dict, List, Optional
+
+from schema.common import Location
+from schema.lsp import DocumentSymbol
+
+CAPTURE_NAME_OBJECT_CREATE = "object_create"
+
+
+class DocumentSymbolIndex:
+    """
+    Document symbols of one file version, indexed by start line and by name.
+
+    `find` returns the same symbol as a linear scan for the first symbol that starts on the
+    definition line or whose name contains the symbol name, but costs dict lookups. Names
+    that only match as a substring are scanned for once and then remembered.
+    """
+
+    def __init__(self, symbols: List[DocumentSymbol]):
+        self.symbols = symbols
+        self.by_start_line: Dict[int, int] = {}
+        self.by_name: Dict[str, int] = {}
+        for position, symbol in enumerate(symbols):
+            self.by_start_line.setdefault(symbol.location.range.start.line, position)
+            self.by_name.setdefault(symbol.name, position)
+        self._containing: Dict[str, Optional[int]] = {}
+
+    def find(self, definition_location: Location, symbol_name: str, capture_name: str) -> Optional[DocumentSymbol]:
+        """
+        The symbol describing a definition. For object creations this is the first symbol matching
+        by name, otherwise the first symbol that starts on the definition line or matches by name.
+        """
+        candidates = [self._first_containing(symbol_name)]
+        if capture_name != CAPTURE_NAME_OBJECT_CREATE:
+            candidates.append(self.by_start_line.get(definition_location.range.start.line))
+
+        candidates = [position for position in candidates if position is not None]
+        if not candidates:
+            return None
+        return self.symbols[min(candidates)]
+
+    def _first_containing(self, symbol_name: str) -> Optional[int]:
+        """Position of the first symbol whose name equals or contains `symbol_name`."""
+        if symbol_name in self._containing:
+            return self._containing[symbol_name]
+
+        position = self.by_name.get(symbol_name)
+        # A symbol that only contains the name may still come before the exact match
+        limit = position if position is not None else len(self.symbols)
+        for candidate in range(limit):
+            if symbol_name in self.symbols[candidate].name:
+                position = candidate
+                break
+
+        self._containing[symbol_name] = position
+        return position
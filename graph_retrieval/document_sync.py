@@ -0,0 +1,202 @@
+import asyncio
+import pathlib
+import threading
+import weakref
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from pathlib import PurePath
+from typing import Any, Dict, Optional, Set, Tuple
+
+from multilspy import SyncLanguageServer
+from multilspy.language_server import LSPFileBuffer
+
+from file_system.line_index import get_line_index
+from file_system.text_diff import get_changed_span
+from graph_retrieval import lsp_command
+from graph_retrieval.lsp_cache import response_cache
+from graph_retrieval.synced_buffers import synced_buffers
+from schema.common import Document
+
+# Buffers kept open after their requests are done, so the next sync of a document sends a small edit
+MAX_SYNCED_DOCUMENTS = 16
+
+
+def get_incremental_change(old_text: str, new_text: str) -> Optional[Dict[str, Any]]:
+    """
+    A single didChange content change that turns `old_text` into `new_text`.
+
+    The change replaces the span between the common prefix and the common suffix of both
+    texts, so typing at the cursor sends only the typed characters. Returns None when the
+    texts are equal.
+    """
+    span = get_changed_span(old_text, new_text)
+    if span is None:
+        return None
+    start, old_end, new_end = span
+    return {
+        "range": {
+            "start": offset_to_lsp_position(old_text, start),
+            "end": offset_to_lsp_position(old_text, old_end),
+        },
+        "text": new_text[start:new_end],
+    }
+
+
+def offset_to_lsp_position(text: str, offset: int) -> Dict[str, int]:
+    """LSP position of a string offset, with the character counted in UTF-16 code units."""
+    line, character = get_line_index(text).offset_to_utf16_position(offset)
+    return {"line": line, "character": character}
+
+
+class DocumentSync:
+    """
+    Keeps the documents being completed open in the language servers with their live text.
+
+    The first sync of a document sends didOpen with its text, later syncs send didChange
+    with one incremental edit. The buffers are registered in multilspy's `open_file_buffers`
+    and hold a reference, so requests against the document use the synced text instead of
+    re-reading the file from disk, and snippets at locations in the document are sliced from
+    the synced text. Documents synced through `synced` stay open until they are among the least
+    recently synced ones beyond `max_documents`.
+    """
+
+    def __init__(self, max_documents: int = MAX_SYNCED_DOCUMENTS):
+        self.max_documents = max_documents
+        # Document uris opened by this object, per language server instance
+        self._synced: "weakref.WeakKeyDictionary[Any, Set[str]]" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        # Documents synced through `synced` in least recently synced order, with the number of blocks using them
+        self._open_documents: "OrderedDict[Tuple[SyncLanguageServer, str], int]" = OrderedDict()
+
+    async def sync(self, document: Document, workspace: Optional[str] = None) -> bool:
+        """Sync `document` to its language server, returns False if the server has no document buffers."""
+        _, _, supported = await self._sync(document, workspace)
+        return supported
+
+    @asynccontextmanager
+    async def synced(self, document: Document, workspace: Optional[str] = None):
+        """
+        Sync `document` for the requests made in the block.
+
+        The buffer is not closed while a block uses it. Once the block exits, the least recently
+        synced buffers no block uses are closed down to `max_documents` open ones.
+        """
+        server, file_path, supported = await self._sync(document, workspace)
+        if not supported:
+            yield False
+            return
+
+        key = (server, file_path)
+        with self._lock:
+            self._open_documents[key] = self._open_documents.pop(key, 0) + 1
+        try:
+            yield True
+        finally:
+            with self._lock:
+                self._open_documents[key] -= 1
+                unused = [open_key for open_key, users in self._open_documents.items() if users == 0]
+                to_close = unused[:max(0, len(self._open_documents) - self.max_documents)]
+                for open_key in to_close:
+                    del self._open_documents[open_key]
+            for server, file_path in to_close:
+                await self._close_if_running(server, file_path)
+
+    async def _sync(self, document: Document, workspace: Optional[str]):
+        file_path = lsp_command._uri_to_file_path(document.uri)
+        async with lsp_command.leased_lsp_server(document.language_id or lsp_command.DEFAULT_LANGUAGE, workspace) as server:
+            changed = await self._run_on_server_loop(server, self._sync_buffer, server.language_server, file_path, document.text)
+        if changed:
+            # Responses cached for the file on disk do not describe the live buffer
+            response_cache.invalidate(file_path)
+        return server, file_path, changed is not None
+
+    async def _close_if_running(self, server: SyncLanguageServer, file_path: str):
+        try:
+            if not server.loop.is_running():
+                raise RuntimeError("language server loop is not running")
+            await self._run_on_server_loop(server, self._close_buffer, server.language_server, file_path)
+        except RuntimeError:
+            # The pool shut the server down, the buffer went with it
+            synced_buffers.discard(self._get_path(server.language_server, file_path), server.language_server)
+        response_cache.invalidate(file_path)
+
+    async def close(self, document: Document, workspace: Optional[str] = None):
+        """Release the buffer of `document`, the server falls back to the file on disk."""
+        file_path = lsp_command._uri_to_file_path(document.uri)
+        async with lsp_command.leased_lsp_server(document.language_id or lsp_command.DEFAULT_LANGUAGE, workspace) as server:
+            await self._run_on_server_loop(server, self._close_buffer, server.language_server, file_path)
+        response_cache.invalidate(file_path)
+
+    @staticmethod
+    async def _run_on_server_loop(server: SyncLanguageServer, function, *args):
+        """Run `function` on the server's event loop, where multilspy reads and writes its buffers."""
+        async def call():
+            return function(*args)
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(call(), server.loop))
+
+    def _sync_buffer(self, language_server, file_path: str, text: str) -> Optional[bool]:
+        """Open or update the buffer of a file, returns whether the text changed or None if unsupported."""
+        open_file_buffers = getattr(language_server, "open_file_buffers", None)
+        if open_file_buffers is None:
+            return None
+
+        uri = self._get_uri(language_server, file_path)
+        with self._lock:
+            synced_uris = self._synced.setdefault(language_server, set())
+            buffer = open_file_buffers.get(uri)
+            if buffer is None:
+                open_file_buffers[uri] = LSPFileBuffer(uri, text, 0, language_server.language_id, 1)
+                synced_uris.add(uri)
+                synced_buffers.put(self._get_path(language_server, file_path), text, language_server)
+                language_server.server.notify.did_open_text_document({
+                    "textDocument": {"uri": uri, "languageId": language_server.language_id, "version": 0, "text": text}
+                })
+                return True
+
+            if uri not in synced_uris:
+                # Opened from disk by a request in flight, keep it open once that request is done
+                buffer.ref_count += 1
+                synced_uris.add(uri)
+
+            change = get_incremental_change(buffer.contents, text)
+            if change is None:
+                return False
+            buffer.version += 1
+            buffer.contents = text
+            synced_buffers.put(self._get_path(language_server, file_path), text, language_server)
+            language_server.server.notify.did_change_text_document({
+                "textDocument": {"uri": uri, "version": buffer.version},
+                "contentChanges": [change],
+            })
+            return True
+
+    def _close_buffer(self, language_server, file_path: str):
+        open_file_buffers = getattr(language_server, "open_file_buffers", None)
+        if open_file_buffers is None:
+            return
+
+        uri = self._get_uri(language_server, file_path)
+        with self._lock:
+            synced_uris = self._synced.get(language_server, set())
+            if uri not in synced_uris:
+                return
+            synced_uris.discard(uri)
+            buffer = open_file_buffers[uri]
+            buffer.ref_count -= 1
+            synced_buffers.discard(self._get_path(language_server, file_path), language_server)
+            if buffer.ref_count == 0:
+                language_server.server.notify.did_close_text_document({"textDocument": {"uri": uri}})
+                del open_file_buffers[uri]
+
+    @staticmethod
+    def _get_path(language_server, file_path: str) -> str:
+        return str(pathlib.Path(str(PurePath(language_server.repository_root_path, file_path))))
+
+    @classmethod
+    def _get_uri(cls, language_server, file_path: str) -> str:
+        # Built exactly like multilspy's `open_file`, so requests find the synced buffer
+        return pathlib.Path(cls._get_path(language_server, file_path)).as_uri()
+
+
+# Process-wide document sync shared by all retrievers
+document_sync = DocumentSync()
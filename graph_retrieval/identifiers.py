@@ -1,22 +1,49 @@
 from typing import List, Optional
 
-from tree_sitter_local.tree_sitter_local import TreeSitterAnalyzer
+from tree_sitter_local.tree_sitter_local import tree_sitter_pool
+from tree_sitter_local.tree_cache import tree_cache
+from tree_sitter_local.tree_window import parse_window
+from file_system.line_index import get_line_index
 from schema.common import Position, Document
 from schema.tree_sitter import SymbolRequest
 
+# Documents with at least this many lines are parsed in a window around the cursor. Below it an
+# incremental reparse of the cached tree stays around 10ms, from 10000 lines on it costs 30ms and
+# more against 12ms for a window (benchmark/tree_window_benchmark.py)
+WINDOWED_PARSE_MIN_LINES = 10000
 
-def get_last_n_graph_context_identifiers_from_document(document: Document, position: Position, n: int) -> List[SymbolRequest]:
+def get_last_n_graph_context_identifiers_from_document(document: Document, position: Position, n: int, windowed: Optional[bool] = None) -> List[SymbolRequest]:
+    """
+    `windowed` parses only the top-level definitions around the lines analyzed instead of the
+    whole document. It defaults to documents of at least WINDOWED_PARSE_MIN_LINES lines.
+    """
     # Define start and end positions for analysis
     start_pos = (max(position.line - 100, 0), 0)
     end_pos = (position.line, position.character + 1)
 
-    current_analyzer = TreeSitterAnalyzer(language_string=document.language_id) 
+    current_analyzer = tree_sitter_pool.get_analyzer(document.language_id)
 
-    function_calls = current_analyzer.analyze_source(
-        source_code=document.text,
-        start_pos=start_pos,
-        end_pos=end_pos
-    )
+    if windowed is None:
+        windowed = document.text.count('\n') + 1 >= WINDOWED_PARSE_MIN_LINES
+    window = parse_window(current_analyzer, document.text, start_pos[0], end_pos[0]) if windowed else None
+
+    if window is not None:
+        call_nodes = current_analyzer.iter_call_nodes(
+            source_code=window.text,
+            start_pos=window.to_window_position(start_pos),
+            end_pos=window.to_window_position(end_pos),
+            tree=window.tree
+        )
+        to_document_point = window.to_document_point
+    else:
+        tree = tree_cache.get_tree(current_analyzer, document.uri, document.text, document.version)
+        call_nodes = current_analyzer.iter_call_nodes(
+            source_code=document.text,
+            start_pos=start_pos,
+            end_pos=end_pos,
+            tree=tree
+        )
+        to_document_point = lambda point: point
 
     # Convert the function calls to symbol requests
     symbol_requests = [
@@ -24,14 +51,14 @@ def get_last_n_graph_context_identifiers_from_document(document: Document, posit
             uri=document.uri,
             language_id=document.language_id,
             node_type="call",  # Function calls are of type "call"
-            symbol_name=call.name,
+            symbol_name=node.text.decode('utf8'),
             position=Position(
-                line=call.start_line,
-                character=call.start_char,
+                line=point[0],
+                character=point[1],
             ),
             capture_name="identifier",  # This was the capture name in the TreeSitter query
         )
-        for call in function_calls
+        for node, point in ((node, to_document_point(node.start_point)) for node in call_nodes)
     ]
 
     # Sort the symbol requests to match TypeScript logic
@@ -59,19 +86,13 @@ def get_last_n_graph_context_identifiers_from_string(n: int, uri: str, language_
     # For string analysis, we start from the beginning
     start_pos = (0, 0)
     
-    # Calculate the end position based on the number of lines in the source
-    lines = source.splitlines()
-    end_pos = (len(lines) - 1, len(lines[-1]) if lines else 0)
-
-    # Use the TreeSitterAnalyzer.analyze_source method
-    # Make sure we're using the right language analyzer
-    if language_id != analyzer.language_string:
-        # If a different language is needed, create a new analyzer instance
-        current_analyzer = TreeSitterAnalyzer(language_string=language_id)
-    else:
-        current_analyzer = analyzer
+    # The end position is the end of the source
+    end_pos = get_line_index(source).offset_to_position(len(source))
+
+    # Use the TreeSitterAnalyzer.iter_call_nodes method of the pooled analyzer for the language
+    current_analyzer = tree_sitter_pool.get_analyzer(language_id)
 
-    function_calls = current_analyzer.analyze_source(
+    call_nodes = current_analyzer.iter_call_nodes(
         source_code=source,
         start_pos=start_pos,
         end_pos=end_pos
@@ -83,14 +104,14 @@ def get_last_n_graph_context_identifiers_from_string(n: int, uri: str, language_
             uri=uri,
             language_id=language_id,
             node_type="call",  # Function calls are of type "call"
-            symbol_name=call.name,
+            symbol_name=node.text.decode('utf8'),
             position=Position(
-                line=call.start_line,
-                character=call.start_char,
+                line=node.start_point[0],
+                character=node.start_point[1],
             ),
             capture_name="identifier",  # This was the capture name in the TreeSitter query
         )
-        for call in function_calls
+        for node in call_nodes
     ]
 
     # Sort the symbol requests to match TypeScript logic
@@ -1,7 +1,12 @@
+import os
+from concurrent.futures import Future
 from typing import List, Dict, Any, Optional
 from .identifiers import get_last_n_graph_context_identifiers_from_document
 from schema.common import Document, Position
-from .symbol_context_snippets import get_symbol_context_snippets
+from .symbol_context_snippets import get_symbol_context_snippets, MAX_CONCURRENT_SYMBOL_REQUESTS
+from .lsp_command import DEFAULT_LANGUAGE
+from .lsp_pool import server_pool
+from .document_sync import document_sync
 
 SUPPORTED_LANGUAGES = {
     "python", "go", "javascript", "javascriptreact", "typescript", "typescriptreact", "java", "kotlin"
@@ -11,8 +16,12 @@ RECURSION_LIMIT = 3
 IDENTIFIERS_TO_RESOLVE = 1
 
 class LsptRetriever:
-    def __init__(self, window=None, workspace=None):
+    def __init__(self, window=None, workspace=None, max_concurrency=MAX_CONCURRENT_SYMBOL_REQUESTS, base_dir=None, static_resolver=None):
         self.identifier = "LSPRetriever"
+        self.max_concurrency = max_concurrency
+        self.base_dir = base_dir
+        # Optional `StaticDefinitionResolver`, answers the symbols it can resolve without the language server
+        self.static_resolver = static_resolver
         self.disposables = []
         self.abort_last_request = lambda: None
         
@@ -20,10 +29,44 @@ class LsptRetriever:
         self.workspace = workspace if workspace else {}  # Simulate VSCode API
 
 
+    def get_workspace_root(self, repo: Optional[str]) -> Optional[str]:
+        """Root of a repository under `base_dir`, None if it is unknown or does not exist."""
+        if not self.base_dir or not repo:
+            return None
+        workspace_root = os.path.join(self.base_dir, repo)
+        if not os.path.isdir(workspace_root):
+            return None
+        return workspace_root
+
+    def warmup(self, repo: Optional[str], language_id: str = DEFAULT_LANGUAGE) -> Optional[Future]:
+        """
+        Start and prime the language server of a repository in the background.
+
+        Warming up is idempotent, so it can be called for every request of a repository and
+        ahead of time for repositories that are about to be processed.
+        """
+        workspace_root = self.get_workspace_root(repo)
+        if workspace_root is None or language_id not in SUPPORTED_LANGUAGES:
+            return None
+        return server_pool.warmup(language_id, workspace_root)
+
     async def retrieve(self, document: Document, position: Optional[Position] = None, repo: Optional[str] = None) -> List[Dict[str, Any]]:
+        # Lookups share the repository's pooled server, which keeps warming up in the background
+        # while the first requests are served
+        self.warmup(repo, document.language_id)
+        workspace_root = self.get_workspace_root(repo)
+        if document.language_id in SUPPORTED_LANGUAGES:
+            # The server answers for the text being completed, not for the file saved on disk
+            async with document_sync.synced(document, workspace_root):
+                return await self._resolve(document, position, workspace_root)
+        return await self._resolve(document, position, workspace_root)
+
+    async def _resolve(self, document: Document, position: Optional[Position], workspace_root: Optional[str]) -> List[Dict[str, Any]]:
         symbol_requests = get_last_n_graph_context_identifiers_from_document(document=document, position=position, n=IDENTIFIERS_TO_RESOLVE)
+        for symbol_request in symbol_requests:
+            symbol_request.workspace = workspace_root
 
-        result = await get_symbol_context_snippets(symbol_requests, 2)
+        result = await get_symbol_context_snippets(symbol_requests, 2, self.max_concurrency, self.static_resolver)
         return result
 
 
@@ -0,0 +1,115 @@
+import os
+import threading
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, Hashable, Optional, Set, Tuple
+
+MAX_CACHED_RESPONSES = 10000
+
+CacheKey = Tuple[str, str, Hashable, Optional[int], Optional[int]]
+
+
+def get_file_version(file_path: str) -> Hashable:
+    """Version of a file on disk, cheap enough to check on every lookup."""
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class LspResponseCache:
+    """
+    LRU cache for LSP responses keyed by (kind, file path, file version, line, column).
+
+    A lookup with a newer file version drops every entry of the older version of that file,
+    so stale responses are never served and do not linger until they are evicted.
+    """
+
+    def __init__(self, max_entries: int = MAX_CACHED_RESPONSES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[CacheKey, Any]" = OrderedDict()
+        self._keys_by_file: Dict[str, Set[CacheKey]] = defaultdict(set)
+        self._versions: Dict[str, Hashable] = {}
+        self._lock = threading.Lock()
+        self.hits: Dict[str, int] = defaultdict(int)
+        self.misses: Dict[str, int] = defaultdict(int)
+
+    def make_key(self, kind: str, file_path: str, version: Hashable, line: Optional[int] = None, col: Optional[int] = None) -> CacheKey:
+        return kind, file_path, version, line, col
+
+    def get(self, key: CacheKey) -> Tuple[bool, Any]:
+        kind, file_path, version = key[0], key[1], key[2]
+        with self._lock:
+            if self._versions.get(file_path, version) != version:
+                self._invalidate_locked(file_path)
+            self._versions[file_path] = version
+
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits[kind] += 1
+                return True, self._entries[key]
+
+            self.misses[kind] += 1
+            return False, None
+
+    def put(self, key: CacheKey, value: Any):
+        file_path = key[1]
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            self._keys_by_file[file_path].add(key)
+
+            while len(self._entries) > self.max_entries:
+                evicted_key, _ = self._entries.popitem(last=False)
+                self._discard_file_key(evicted_key)
+
+    def invalidate(self, file_path: str):
+        """Drop every cached response for a file."""
+        with self._lock:
+            self._invalidate_locked(file_path)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_file.clear()
+            self._versions.clear()
+            self.hits.clear()
+            self.misses.clear()
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Hits, misses and hit rate per response kind, plus the overall totals."""
+        with self._lock:
+            kinds = set(self.hits) | set(self.misses)
+            result = {}
+            for kind in sorted(kinds):
+                result[kind] = self._kind_stats(self.hits[kind], self.misses[kind])
+            result["total"] = self._kind_stats(sum(self.hits.values()), sum(self.misses.values()))
+            return result
+
+    def report(self) -> str:
+        """One line per response kind, e.g. `definition: 12/20 hits (60.0%)`."""
+        return "\n".join(
+            f"{kind}: {int(values['hits'])}/{int(values['hits'] + values['misses'])} hits ({values['hit_rate'] * 100:.1f}%)"
+            for kind, values in self.stats().items()
+        )
+
+    @staticmethod
+    def _kind_stats(hits: int, misses: int) -> Dict[str, float]:
+        total = hits + misses
+        return {"hits": hits, "misses": misses, "hit_rate": hits / total if total else 0.0}
+
+    def _invalidate_locked(self, file_path: str):
+        for key in self._keys_by_file.pop(file_path, set()):
+            self._entries.pop(key, None)
+        self._versions.pop(file_path, None)
+
+    def _discard_file_key(self, key: CacheKey):
+        file_keys = self._keys_by_file.get(key[1])
+        if file_keys is not None:
+            file_keys.discard(key)
+            if not file_keys:
+                del self._keys_by_file[key[1]]
+
+
+# Process-wide cache shared by all LSP commands
+response_cache = LspResponseCache()
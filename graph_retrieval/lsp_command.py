@@ -1,32 +1,94 @@
-from typing import List, Optional, Any
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional, Any
 from multilspy import SyncLanguageServer
-from multilspy.multilspy_config import MultilspyConfig
-from multilspy.multilspy_logger import MultilspyLogger
 import os
 from schema.common import Position, Location, Range
 from schema.lsp import DocumentSymbol, ParsedHover
 from graph_retrieval.hover import extract_hover_content
+from graph_retrieval.lsp_pool import server_pool
+from graph_retrieval.lsp_cache import response_cache, get_file_version
+from graph_retrieval.document_symbol_index import DocumentSymbolIndex
+from graph_retrieval.synced_buffers import synced_buffers
 
-# Initialize logger and workspace
-logger = MultilspyLogger()
+# Workspace used when a request does not name the repository it belongs to
 workspace_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+DEFAULT_LANGUAGE = "python"
 
 # Create LSP handler function
-def get_lsp_server(language: str = "python") -> SyncLanguageServer:
+def get_lsp_server(language: str = DEFAULT_LANGUAGE, workspace: Optional[str] = None) -> SyncLanguageServer:
     """
-    Get a language server instance for the specified programming language.
-    
+    Get a warm language server instance for the specified programming language.
+
+    Servers are shared through `server_pool`, so repeated lookups reuse the same
+    running process instead of starting a new one per request.
+
     Args:
         language: The programming language to initialize the LSP for (default: "python")
-        
+        workspace: Root of the repository to analyze (default: `workspace_root`)
+
     Returns:
-        SyncLanguageServer: An initialized language server
+        SyncLanguageServer: A started language server
+    """
+    return server_pool.get(language or DEFAULT_LANGUAGE, workspace or workspace_root)
+
+async def get_lsp_server_async(language: str = DEFAULT_LANGUAGE, workspace: Optional[str] = None) -> SyncLanguageServer:
+    """
+    `get_lsp_server` for coroutines.
+
+    A server that is not running yet is started, or waited for while another thread starts
+    it, on a worker thread, so the caller's event loop keeps serving other requests.
+    """
+    language = language or DEFAULT_LANGUAGE
+    workspace = workspace or workspace_root
+    server = server_pool.get_started(language, workspace)
+    if server is not None:
+        return server
+    return await asyncio.get_running_loop().run_in_executor(None, server_pool.get, language, workspace)
+
+@asynccontextmanager
+async def leased_lsp_server(language: str = DEFAULT_LANGUAGE, workspace: Optional[str] = None) -> AsyncIterator[SyncLanguageServer]:
+    """
+    `get_lsp_server_async` for the requests made in the block.
+
+    The pool does not shut the server down while the block runs, a server it drops meanwhile
+    is shut down on a worker thread once its last lease is released.
+    """
+    language = language or DEFAULT_LANGUAGE
+    workspace = workspace or workspace_root
+    loop = asyncio.get_running_loop()
+    entry = server_pool.acquire_started(language, workspace)
+    if entry is None:
+        entry = await loop.run_in_executor(None, server_pool.acquire, language, workspace)
+    try:
+        yield entry.server
+    finally:
+        if server_pool.release(entry, close=False):
+            await loop.run_in_executor(None, entry.close)
+
+async def _call_on_server_loop(server: SyncLanguageServer, method_name: str, *args):
+    """
+    Run a request of the async `LanguageServer` API on the server's own event loop.
+
+    The pooled server keeps running on its background loop, so any number of callers can
+    have requests in flight over the same connection at once.
     """
-    config = MultilspyConfig.from_dict({"code_language": language})
-    return SyncLanguageServer.create(config, logger, workspace_root)
+    coroutine = getattr(server.language_server, method_name)(*args)
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coroutine, server.loop))
 
-# Default LSP instance
-lsp = get_lsp_server("python")
+async def _send_request(language: Optional[str], workspace: Optional[str], method_name: str, *args):
+    """Send a request to the pooled server, restarting it once if its process has died."""
+    language = language or DEFAULT_LANGUAGE
+    workspace = workspace or workspace_root
+    async with leased_lsp_server(language, workspace) as current_lsp:
+        try:
+            return await _call_on_server_loop(current_lsp, method_name, *args)
+        except Exception:
+            if server_pool.is_alive(language, workspace):
+                raise
+    await asyncio.get_running_loop().run_in_executor(None, server_pool.restart, language, workspace)
+    async with leased_lsp_server(language, workspace) as current_lsp:
+        return await _call_on_server_loop(current_lsp, method_name, *args)
 
 def _uri_to_file_path(uri: str) -> str:
     """Convert URI to file path."""
@@ -39,16 +101,21 @@ def _position_to_line_col(position: Position) -> tuple:
     """Convert Position to line, column tuple."""
     return position.line, position.character
 
-async def get_definition_locations(uri: str, position: Position, language: str = None) -> List[Location]:
+def _cache_key(kind: str, file_path: str, line: Optional[int] = None, col: Optional[int] = None):
+    """Cache key for a response, tied to the current version of the file on disk."""
+    return response_cache.make_key(kind, file_path, get_file_version(file_path), line, col)
+
+async def get_definition_locations(uri: str, position: Position, language: str = None, workspace: Optional[str] = None) -> List[Location]:
     file_path = _uri_to_file_path(uri)
     line, col = _position_to_line_col(position)
 
+    cache_key = _cache_key("definition", file_path, line, col)
+    found, cached_locations = response_cache.get(cache_key)
+    if found:
+        return list(cached_locations)
+
     try:
-        # Use language-specific LSP if provided
-        current_lsp = get_lsp_server(language) if language else lsp
-    
-        with current_lsp.start_server():
-            definitions = current_lsp.request_definition(file_path, line, col)
+        definitions = await _send_request(language, workspace, "request_definition", file_path, line, col)
         
         # Convert results to Location objects
         locations = []
@@ -65,21 +132,18 @@ async def get_definition_locations(uri: str, position: Position, language: str =
             )
             locations.append(loc)
         
-        return locations
+        response_cache.put(cache_key, locations)
+        return list(locations)
     except Exception as e:
         print(f"Error getting definition locations: {e}")
         return []
 
 
-async def get_implementation_locations(uri: str, position: Position, language: str = None) -> List[Location]:
+async def get_implementation_locations(uri: str, position: Position, language: str = None, workspace: Optional[str] = None) -> List[Location]:
     file_path = _uri_to_file_path(uri)
     line, col = _position_to_line_col(position)
     
-    # Use language-specific LSP if provided
-    current_lsp = get_lsp_server(language) if language else lsp
-    
-    with current_lsp.start_server():
-        implementations = current_lsp.request_implementations(file_path, line, col)
+    implementations = await _send_request(language, workspace, "request_implementations", file_path, line, col)
     
     # Convert results to Location objects
     locations = []
@@ -97,15 +161,11 @@ async def get_implementation_locations(uri: str, position: Position, language: s
     
     return locations
 
-async def get_type_definition_locations(uri: str, position: Position, language: str = None) -> List[Location]:
+async def get_type_definition_locations(uri: str, position: Position, language: str = None, workspace: Optional[str] = None) -> List[Location]:
     file_path = _uri_to_file_path(uri)
     line, col = _position_to_line_col(position)
     
-    # Use language-specific LSP if provided
-    current_lsp = get_lsp_server(language) if language else lsp
-    
-    with current_lsp.start_server():
-        type_definitions = current_lsp.request_type_definition(file_path, line, col)
+    type_definitions = await _send_request(language, workspace, "request_type_definition", file_path, line, col)
     
     # Convert results to Location objects
     locations = []
@@ -123,14 +183,15 @@ async def get_type_definition_locations(uri: str, position: Position, language:
     
     return locations
 
-async def get_document_symbol(uri: str, language: str = None):
+async def get_document_symbol(uri: str, language: str = None, workspace: Optional[str] = None):
     file_path = _uri_to_file_path(uri)
+
+    cache_key = _cache_key("document_symbol", file_path)
+    found, cached_symbols = response_cache.get(cache_key)
+    if found:
+        return list(cached_symbols)
     
-    # Use language-specific LSP if provided
-    current_lsp = get_lsp_server(language) if language else lsp
-    
-    with current_lsp.start_server():
-        symbols = current_lsp.request_document_symbols(file_path)
+    symbols = await _send_request(language, workspace, "request_document_symbols", file_path)
     
     # Convert to a more usable format that includes location
     document_symbols = []
@@ -157,30 +218,34 @@ async def get_document_symbol(uri: str, language: str = None):
             )
             document_symbols.append(symbol_obj)
     
-    return document_symbols
+    response_cache.put(cache_key, document_symbols)
+    return list(document_symbols)
+
+async def get_document_symbol_index(uri: str, language: str = None, workspace: Optional[str] = None) -> DocumentSymbolIndex:
+    """Document symbols of a file indexed by name and start line, built once per file version."""
+    file_path = _uri_to_file_path(uri)
+
+    cache_key = _cache_key("document_symbol_index", file_path)
+    found, cached_index = response_cache.get(cache_key)
+    if found:
+        return cached_index
+
+    document_symbol_index = DocumentSymbolIndex(await get_document_symbol(uri, language=language, workspace=workspace))
+    response_cache.put(cache_key, document_symbol_index)
+    return document_symbol_index
 
 async def get_text_from_location(location: Location) -> str:
     """Fetch text from a given location."""
     file_path = _uri_to_file_path(location.uri)
     
-    # Read the file and extract the relevant text
+    # Slice the relevant text out of the synced buffer, or the cached snapshot of the file on disk
     try:
-        with open(file_path, 'r') as file:
-            lines = file.readlines()
-            
-        start_line = location.range.start.line
-        start_char = location.range.start.character
-        end_line = location.range.end.line
-        end_char = location.range.end.character
-        
-        if start_line == end_line:
-            return lines[start_line][start_char:end_char]
-        else:
-            text = lines[start_line][start_char:]
-            for line_num in range(start_line + 1, end_line):
-                text += lines[line_num]
-            text += lines[end_line][:end_char]
-            return text
+        return synced_buffers.get_snapshot(file_path).get_range(
+            location.range.start.line,
+            location.range.start.character,
+            location.range.end.line,
+            location.range.end.character,
+        )
     except Exception as e:
         print(f"Error reading file {file_path}: {e}")
         return ""
@@ -190,27 +255,24 @@ async def get_lines_from_location(location: Location, line_count: int) -> str:
     file_path = _uri_to_file_path(location.uri)
     
     try:
-        with open(file_path, 'r') as file:
-            lines = file.readlines()
-            
-        start_line = location.range.start.line
-        end_line = min(start_line + line_count, len(lines))
-        
-        return ''.join(lines[start_line:end_line])
+        return synced_buffers.get_snapshot(file_path).get_lines(location.range.start.line, line_count)
     except Exception as e:
         print(f"Error reading file {file_path}: {e}")
         return ""
 
 
-async def get_parsed_hovers(uri: str, position: Position, symbol_name: Optional[str] = None, language: str = None) -> List[ParsedHover]:
+async def get_parsed_hovers(uri: str, position: Position, symbol_name: Optional[str] = None, language: str = None, workspace: Optional[str] = None) -> List[ParsedHover]:
     """Get parsed hover information for a position."""
     file_path = _uri_to_file_path(uri)
     line, col = _position_to_line_col(position)
+
+    cache_key = _cache_key("hover", file_path, line, col)
+    found, cached_hovers = response_cache.get(cache_key)
+    if found:
+        return list(cached_hovers)
     
-    # Use language-specific LSP if provided
-    current_lsp = get_lsp_server(language) if language else lsp
-    
-    with current_lsp.start_server():
-        hover_response = current_lsp.request_hover(file_path, line, col)
+    hover_response = await _send_request(language, workspace, "request_hover", file_path, line, col)
     # Process and return the hover response
-    return extract_hover_content(hover_response)
+    parsed_hovers = extract_hover_content(hover_response)
+    response_cache.put(cache_key, parsed_hovers)
+    return list(parsed_hovers)
@@ -0,0 +1,354 @@
+import atexit
+import glob
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from multilspy import SyncLanguageServer
+from multilspy.multilspy_config import MultilspyConfig
+from multilspy.multilspy_logger import MultilspyLogger
+
+MAX_POOLED_SERVERS = 4
+SERVER_IDLE_TIMEOUT = 600  # seconds
+MAX_WARMUP_WORKERS = 2
+WARMUP_FILES = 20
+WARMUP_FILE_PATTERNS = {
+    "python": "*.py",
+    "java": "*.java",
+    "go": "*.go",
+    "kotlin": "*.kt",
+    "javascript": "*.js",
+    "typescript": "*.ts",
+}
+
+logger = MultilspyLogger()
+
+ServerKey = Tuple[str, str]
+
+
+def create_language_server(language: str, workspace_root: str) -> SyncLanguageServer:
+    """Create a (not yet started) language server for a language and workspace root."""
+    config = MultilspyConfig.from_dict({"code_language": language})
+    return SyncLanguageServer.create(config, logger, workspace_root)
+
+
+def get_warmup_files(language: str, workspace_root: str, limit: int = WARMUP_FILES) -> List[str]:
+    """Files opened to prime the server's index: package entry points first, then the shallowest files."""
+    pattern = WARMUP_FILE_PATTERNS.get(language)
+    if not pattern:
+        return []
+
+    # Empty files have no symbols to index
+    files = [
+        path for path in glob.glob(os.path.join(workspace_root, "**", pattern), recursive=True)
+        if os.path.getsize(path) > 0
+    ]
+    files.sort(key=lambda path: (os.path.basename(path) != "__init__.py", path.count(os.sep), path))
+    return files[:limit]
+
+
+class PooledServer:
+    """
+    A started language server and the exit stack that shuts it down.
+
+    `leases` counts the callers with requests in flight on the server. A server the pool drops
+    while it is leased is `retired` and shut down when its last lease is released.
+    """
+
+    def __init__(self, key: ServerKey, server: SyncLanguageServer, exit_stack: ExitStack):
+        self.key = key
+        self.server = server
+        self.exit_stack = exit_stack
+        self.started_at = time.monotonic()
+        self.last_used = self.started_at
+        self.leases = 0
+        self.retired = False
+
+    def is_alive(self) -> bool:
+        """Health check: the event loop thread and the server process must both be running."""
+        loop_thread = getattr(self.server, "loop_thread", None)
+        if loop_thread is not None and not loop_thread.is_alive():
+            return False
+
+        language_server = getattr(self.server, "language_server", None)
+        handler = getattr(language_server, "server", None)
+        if handler is None:
+            return True
+        process = getattr(handler, "process", None)
+        return process is not None and process.returncode is None
+
+    def close(self):
+        try:
+            self.exit_stack.close()
+        except Exception as e:
+            print(f"Error shutting down language server {self.key}: {e}")
+
+
+class LanguageServerPool:
+    """
+    Keeps started language servers warm between requests.
+
+    Servers are keyed by (language, workspace root). The pool holds at most `max_size`
+    servers and drops the least recently used one when it is full. Servers that have
+    not been used for `idle_timeout` seconds are dropped on the next access, and a server
+    whose process died is restarted transparently. A dropped server is shut down once no
+    lease taken with `acquire` or `lease` is left on it, so requests in flight finish first.
+    Servers are shut down outside the pool lock.
+    """
+
+    def __init__(
+        self,
+        max_size: int = MAX_POOLED_SERVERS,
+        idle_timeout: float = SERVER_IDLE_TIMEOUT,
+        server_factory: Callable[[str, str], SyncLanguageServer] = create_language_server,
+    ):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.server_factory = server_factory
+        self._entries: "OrderedDict[ServerKey, PooledServer]" = OrderedDict()
+        # Servers dropped from the pool while leased, until their last lease is released
+        self._retired: List[PooledServer] = []
+        self._lock = threading.RLock()
+        self._start_locks: Dict[ServerKey, threading.Lock] = {}
+        self._warmups: Dict[ServerKey, Future] = {}
+        self._warmup_executor = ThreadPoolExecutor(max_workers=MAX_WARMUP_WORKERS, thread_name_prefix="lsp-warmup")
+        self.stats: Dict[str, int] = {"started": 0, "reused": 0, "restarted": 0, "evicted": 0}
+
+    @staticmethod
+    def make_key(language: str, workspace_root: str) -> ServerKey:
+        return language, os.path.abspath(workspace_root)
+
+    def get(self, language: str, workspace_root: str) -> SyncLanguageServer:
+        """Return a started server for (language, workspace_root), starting one if needed."""
+        return self._get_entry(self.make_key(language, workspace_root), lease=False).server
+
+    def get_started(self, language: str, workspace_root: str) -> Optional[SyncLanguageServer]:
+        """The running server for (language, workspace_root), None if it still has to be started."""
+        entry = self._get_started_entry(self.make_key(language, workspace_root), lease=False)
+        return entry.server if entry is not None else None
+
+    def acquire(self, language: str, workspace_root: str) -> PooledServer:
+        """
+        Lease the server for (language, workspace_root), starting one if needed.
+
+        The server is not shut down before the lease is given back with `release`, even if the
+        pool drops it meanwhile.
+        """
+        return self._get_entry(self.make_key(language, workspace_root), lease=True)
+
+    def acquire_started(self, language: str, workspace_root: str) -> Optional[PooledServer]:
+        """`acquire` for a server that is already running, None if it still has to be started."""
+        return self._get_started_entry(self.make_key(language, workspace_root), lease=True)
+
+    def release(self, entry: PooledServer, close: bool = True) -> bool:
+        """
+        Give back a lease taken with `acquire`.
+
+        Returns True when it was the last lease on a server the pool dropped meanwhile. That
+        server is shut down here, or by the caller when `close` is False, so a caller on an
+        event loop can shut it down on a worker thread.
+        """
+        with self._lock:
+            entry.leases -= 1
+            # Not in `_retired` once `shutdown` closed it
+            idle_retired = entry.retired and entry.leases == 0 and entry in self._retired
+            if idle_retired:
+                self._retired.remove(entry)
+        if idle_retired and close:
+            entry.close()
+        return idle_retired
+
+    @contextmanager
+    def lease(self, language: str, workspace_root: str) -> Iterator[SyncLanguageServer]:
+        """The server for (language, workspace_root), leased for the block."""
+        entry = self.acquire(language, workspace_root)
+        try:
+            yield entry.server
+        finally:
+            self.release(entry)
+
+    def warmup(self, language: str, workspace_root: str, warmup_files: Optional[List[str]] = None) -> Future:
+        """
+        Start the server for (language, workspace_root) in the background and prime its index.
+
+        Priming requests the document symbols of a few key files, so that the first real
+        lookup does not pay for indexing them. Returns a future that completes once the
+        server is warm; calling it again for the same key returns the same future unless
+        the server has been shut down since.
+        """
+        key = self.make_key(language, workspace_root)
+        with self._lock:
+            warmup = self._warmups.get(key)
+            if warmup is not None and (not warmup.done() or key in self._entries):
+                return warmup
+
+            warmup = self._warmup_executor.submit(self._warm, key, warmup_files)
+            self._warmups[key] = warmup
+            return warmup
+
+    def is_warm(self, language: str, workspace_root: str) -> bool:
+        key = self.make_key(language, workspace_root)
+        with self._lock:
+            warmup = self._warmups.get(key)
+            return (
+                warmup is not None and warmup.done() and warmup.exception() is None
+                and key in self._entries
+            )
+
+    def is_alive(self, language: str, workspace_root: str) -> bool:
+        with self._lock:
+            entry = self._entries.get(self.make_key(language, workspace_root))
+            return entry is not None and entry.is_alive()
+
+    def restart(self, language: str, workspace_root: str) -> SyncLanguageServer:
+        """Shut down the server for (language, workspace_root) and start a fresh one."""
+        key = self.make_key(language, workspace_root)
+        to_close = []
+        # Locks are taken in the order `get` takes them, start lock first, and both are
+        # released before `get` starts the new server
+        with self._start_lock(key):
+            with self._lock:
+                if key in self._entries:
+                    to_close = self._discard(key)
+                    self.stats["restarted"] += 1
+        self._close(to_close)
+        return self.get(language, workspace_root)
+
+    def evict_idle(self):
+        with self._lock:
+            to_close = self._evict_idle()
+        self._close(to_close)
+
+    def close_all(self):
+        """Drop every server, leased ones are shut down when their last lease is released."""
+        with self._lock:
+            to_close = []
+            for key in list(self._entries):
+                to_close += self._discard(key)
+            self._warmups.clear()
+        self._close(to_close)
+
+    def shutdown(self):
+        """Cancel pending warmups and shut down every server, the pool cannot be used afterwards."""
+        self._warmup_executor.shutdown(wait=False, cancel_futures=True)
+        self.close_all()
+        with self._lock:
+            to_close, self._retired = self._retired, []
+        self._close(to_close)
+
+    def _get_entry(self, key: ServerKey, lease: bool) -> PooledServer:
+        to_close = []
+        try:
+            # Servers are started outside the pool lock, so starting a server for one repository
+            # does not block lookups against the servers that are already running
+            with self._start_lock(key):
+                with self._lock:
+                    to_close += self._evict_idle()
+
+                    entry = self._entries.get(key)
+                    if entry is not None and not entry.is_alive():
+                        to_close += self._discard(key)
+                        self.stats["restarted"] += 1
+                        entry = None
+
+                    if entry is not None:
+                        self.stats["reused"] += 1
+                        return self._use(entry, lease)
+
+                entry = self._start(key)
+
+                with self._lock:
+                    self._entries[key] = entry
+                    if lease:
+                        entry.leases += 1
+                    to_close += self._evict_overflow(key)
+                    return entry
+        finally:
+            self._close(to_close)
+
+    def _get_started_entry(self, key: ServerKey, lease: bool) -> Optional[PooledServer]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or not entry.is_alive():
+                return None
+            self.stats["reused"] += 1
+            return self._use(entry, lease)
+
+    def _use(self, entry: PooledServer, lease: bool) -> PooledServer:
+        self._entries.move_to_end(entry.key)
+        entry.last_used = time.monotonic()
+        if lease:
+            entry.leases += 1
+        return entry
+
+    def _start_lock(self, key: ServerKey) -> threading.Lock:
+        with self._lock:
+            return self._start_locks.setdefault(key, threading.Lock())
+
+    def _warm(self, key: ServerKey, warmup_files: Optional[List[str]]):
+        language, workspace_root = key
+        with self.lease(language, workspace_root) as server:
+            if warmup_files is None:
+                warmup_files = get_warmup_files(language, workspace_root)
+
+            for file_path in warmup_files:
+                try:
+                    server.request_document_symbols(file_path)
+                except Exception as e:
+                    print(f"Error warming up {file_path}: {e}")
+
+    def _start(self, key: ServerKey) -> PooledServer:
+        language, workspace_root = key
+        server = self.server_factory(language, workspace_root)
+        exit_stack = ExitStack()
+        exit_stack.enter_context(server.start_server())
+        self.stats["started"] += 1
+        return PooledServer(key, server, exit_stack)
+
+    def _evict_idle(self) -> List[PooledServer]:
+        # A leased server has requests in flight, it is not idle however long ago it was leased
+        now = time.monotonic()
+        to_close = []
+        for key, entry in list(self._entries.items()):
+            if entry.leases == 0 and now - entry.last_used > self.idle_timeout:
+                to_close += self._discard(key)
+                self.stats["evicted"] += 1
+        return to_close
+
+    def _evict_overflow(self, started_key: ServerKey) -> List[PooledServer]:
+        to_close = []
+        while len(self._entries) > self.max_size:
+            # The least recently used server without requests in flight goes first, never the one just started
+            victim_key = next(
+                (key for key, entry in self._entries.items() if entry.leases == 0 and key != started_key),
+                next(iter(self._entries)),
+            )
+            to_close += self._discard(victim_key)
+            self.stats["evicted"] += 1
+        return to_close
+
+    def _discard(self, key: ServerKey) -> List[PooledServer]:
+        """Drop the server from the pool, returns it when it has to be shut down now."""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return []
+        entry.retired = True
+        if entry.leases > 0:
+            # Shut down by `release` once the requests in flight are done
+            self._retired.append(entry)
+            return []
+        return [entry]
+
+    @staticmethod
+    def _close(entries: List[PooledServer]):
+        for entry in entries:
+            entry.close()
+
+
+# Process-wide pool shared by all LSP commands
+server_pool = LanguageServerPool()
+atexit.register(server_pool.shutdown)
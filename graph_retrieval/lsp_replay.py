@@ -0,0 +1,262 @@
+import asyncio
+import copy
+import json
+import random
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Optional, Tuple
+
+from multilspy import SyncLanguageServer
+
+from graph_retrieval.lsp_pool import server_pool, create_language_server
+from graph_retrieval.lsp_cache import response_cache
+
+WORKSPACE_TOKEN = "{workspace}"
+RECORDED_METHODS = ("request_definition", "request_hover", "request_document_symbols")
+# What a server answers when it knows nothing about a position
+EMPTY_RESPONSES = {
+    "request_definition": [],
+    "request_hover": None,
+    "request_document_symbols": ([], None),
+}
+
+
+def _relativize(value: Any, workspace_root: str) -> Any:
+    """Replace the workspace root in every string of a response, so recordings can be replayed elsewhere."""
+    if isinstance(value, str):
+        return value.replace(workspace_root, WORKSPACE_TOKEN)
+    if isinstance(value, (list, tuple)):
+        return [_relativize(item, workspace_root) for item in value]
+    if isinstance(value, dict):
+        return {key: _relativize(item, workspace_root) for key, item in value.items()}
+    return value
+
+
+def _absolutize(value: Any, workspace_root: str) -> Any:
+    if isinstance(value, str):
+        return value.replace(WORKSPACE_TOKEN, workspace_root)
+    if isinstance(value, list):
+        return [_absolutize(item, workspace_root) for item in value]
+    if isinstance(value, dict):
+        return {key: _absolutize(item, workspace_root) for key, item in value.items()}
+    return value
+
+
+class LspRecording:
+    """
+    Responses of a language server keyed by (method, arguments).
+
+    Paths under the workspace root are stored relative to it, so a recording made in one
+    checkout replays in another.
+    """
+
+    def __init__(self, responses: Optional[Dict[str, Any]] = None):
+        self.responses: Dict[str, Any] = responses or {}
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(method_name: str, args: Tuple, workspace_root: str) -> str:
+        return json.dumps([method_name] + _relativize(list(args), workspace_root))
+
+    def add(self, method_name: str, args: Tuple, response: Any, workspace_root: str):
+        with self._lock:
+            self.responses[self.make_key(method_name, args, workspace_root)] = _relativize(response, workspace_root)
+
+    def lookup(self, method_name: str, args: Tuple, workspace_root: str) -> Any:
+        """The recorded response, or an empty one when the request was never recorded."""
+        key = self.make_key(method_name, args, workspace_root)
+        with self._lock:
+            if key not in self.responses:
+                self.misses += 1
+                return copy.deepcopy(EMPTY_RESPONSES[method_name])
+            response = _absolutize(self.responses[key], workspace_root)
+
+        # JSON turns the (symbols, tree) tuple of document symbols into a list
+        if method_name == "request_document_symbols" and isinstance(response, list):
+            response = tuple(response)
+        return response
+
+    def save(self, path: str):
+        with self._lock:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"version": 1, "responses": self.responses}, f, indent=1, sort_keys=True)
+
+    @classmethod
+    def load(cls, path: str) -> "LspRecording":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f)["responses"])
+
+
+class _ServerLoopMixin:
+    """Blocking `SyncLanguageServer`-style requests, run on the server's own event loop."""
+
+    def _run(self, method_name: str, *args):
+        coroutine = getattr(self.language_server, method_name)(*args)
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def request_definition(self, file_path: str, line: int, column: int):
+        return self._run("request_definition", file_path, line, column)
+
+    def request_hover(self, file_path: str, line: int, column: int):
+        return self._run("request_hover", file_path, line, column)
+
+    def request_document_symbols(self, file_path: str):
+        return self._run("request_document_symbols", file_path)
+
+
+class _RecordingProxy:
+    """Forwards requests to a real language server and records each response."""
+
+    def __init__(self, language_server, recording: LspRecording, workspace_root: str):
+        self._language_server = language_server
+        self._recording = recording
+        self._workspace_root = workspace_root
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self._language_server, name)
+        if name not in RECORDED_METHODS:
+            return attribute
+
+        async def record(*args):
+            # Speculative requests are often cancelled by the caller, shield the request so its
+            # response is still recorded for replays that do wait for it
+            request = asyncio.ensure_future(attribute(*args))
+            request.add_done_callback(lambda done: self._record(name, args, done))
+            return await asyncio.shield(request)
+        return record
+
+    def _record(self, name: str, args: Tuple, request: asyncio.Future):
+        if not request.cancelled() and request.exception() is None:
+            self._recording.add(name, args, request.result(), self._workspace_root)
+
+
+class RecordingLanguageServer(_ServerLoopMixin):
+    """A real language server whose definition, hover and document symbol traffic is recorded."""
+
+    def __init__(self, server: SyncLanguageServer, recording: LspRecording, workspace_root: str):
+        self.server = server
+        self.language_server = _RecordingProxy(server.language_server, recording, workspace_root)
+
+    @property
+    def loop(self):
+        return self.server.loop
+
+    @property
+    def loop_thread(self):
+        return self.server.loop_thread
+
+    def start_server(self):
+        return self.server.start_server()
+
+
+class _ReplayProxy:
+    """Async language server API answered from a recording, after an injected delay."""
+
+    def __init__(self, owner: "ReplayLanguageServer"):
+        self._owner = owner
+
+    async def request_definition(self, file_path: str, line: int, column: int):
+        return await self._owner.respond("request_definition", (file_path, line, column))
+
+    async def request_hover(self, file_path: str, line: int, column: int):
+        return await self._owner.respond("request_hover", (file_path, line, column))
+
+    async def request_document_symbols(self, file_path: str):
+        return await self._owner.respond("request_document_symbols", (file_path,))
+
+
+class ReplayLanguageServer(_ServerLoopMixin):
+    """
+    Stand-in for a language server that replays recorded responses.
+
+    Every response is delayed by `latency` seconds plus up to `jitter` seconds. With
+    `serial`, requests are answered one at a time like Jedi does, otherwise they overlap.
+    The server runs its own event loop thread, like `SyncLanguageServer`.
+    """
+
+    def __init__(self, recording: LspRecording, workspace_root: str, latency: float = 0.0,
+                 jitter: float = 0.0, serial: bool = False, seed: Optional[int] = 0):
+        self.recording = recording
+        self.workspace_root = workspace_root
+        self.latency = latency
+        self.jitter = jitter
+        self.serial = serial
+        self.language_server = _ReplayProxy(self)
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.loop_thread: Optional[threading.Thread] = None
+        self.requests = 0
+        self._random = random.Random(seed)
+        self._serial_lock: Optional[asyncio.Lock] = None
+
+    async def respond(self, method_name: str, args: Tuple):
+        self.requests += 1
+        delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if self.serial:
+            async with self._serial_lock:
+                await self._sleep(delay)
+        else:
+            await self._sleep(delay)
+        return self.recording.lookup(method_name, args, self.workspace_root)
+
+    @staticmethod
+    async def _cancel_pending():
+        """Cancel responses nobody waits for anymore, e.g. those of cancelled speculative requests."""
+        current = asyncio.current_task()
+        pending = [task for task in asyncio.all_tasks() if task is not current]
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    @staticmethod
+    async def _sleep(delay: float):
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    @contextmanager
+    def start_server(self):
+        self.loop = asyncio.new_event_loop()
+        self._serial_lock = asyncio.Lock()
+        self.loop_thread = threading.Thread(target=self.loop.run_forever, name="lsp-replay", daemon=True)
+        self.loop_thread.start()
+        try:
+            yield self
+        finally:
+            asyncio.run_coroutine_threadsafe(self._cancel_pending(), self.loop).result()
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.loop_thread.join()
+            self.loop.close()
+
+
+def recording_server_factory(recording: LspRecording):
+    """`LanguageServerPool` factory for real servers whose traffic is added to `recording`."""
+    def create(language: str, workspace_root: str):
+        return RecordingLanguageServer(create_language_server(language, workspace_root), recording, workspace_root)
+    return create
+
+
+def replay_server_factory(recording: LspRecording, latency: float = 0.0, jitter: float = 0.0, serial: bool = False):
+    """`LanguageServerPool` factory for servers that replay `recording`."""
+    def create(language: str, workspace_root: str):
+        return ReplayLanguageServer(recording, workspace_root, latency=latency, jitter=jitter, serial=serial)
+    return create
+
+
+@contextmanager
+def use_server_factory(server_factory):
+    """
+    Route every `lsp_command` request through servers made by `server_factory`.
+
+    Running servers and cached responses are dropped on entry and on exit, so no response
+    of one kind of server is served while the other is in use.
+    """
+    previous_factory = server_pool.server_factory
+    server_pool.close_all()
+    response_cache.clear()
+    server_pool.server_factory = server_factory
+    try:
+        yield
+    finally:
+        server_pool.close_all()
+        response_cache.clear()
+        server_pool.server_factory = previous_factory
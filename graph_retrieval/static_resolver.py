@@ -0,0 +1,108 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+from graph_retrieval import lsp_command
+from graph_retrieval.hover import is_unhelpful_symbol_snippet
+from graph_retrieval.symbol_context_snippets import (
+    CAPTURE_NAME_OBJECT_CREATE,
+    get_nested_symbol_requests,
+    is_common_import,
+)
+from graph_retrieval.symbol_table import get_symbol_table
+from graph_retrieval.synced_buffers import synced_buffers
+from schema.tree_sitter import SymbolRequest
+
+STATIC_LANGUAGES = {"python"}
+
+
+class StaticDefinitionResolver:
+    """
+    Answers symbol requests from the tree-sitter symbol table of a repository.
+
+    Produces the same snippets and nested requests as the language server path for the
+    symbols it can resolve (module-level functions, classes and variables, reached directly
+    or through imports inside the repository). Everything else is left to the language
+    server by reporting the request as not found.
+    """
+
+    def __init__(self, default_workspace: Optional[str] = None):
+        self.default_workspace = default_workspace or lsp_command.workspace_root
+        self.stats: Dict[str, int] = {"resolved": 0, "unresolved": 0}
+
+    def report(self) -> str:
+        """Share of the requests answered without the language server, e.g. `resolved statically: 26/27 (96.3%)`."""
+        resolved = self.stats["resolved"]
+        total = resolved + self.stats["unresolved"]
+        return f"resolved statically: {resolved}/{total} ({resolved / total * 100 if total else 0.0:.1f}%)"
+
+    def get_definitions(self, request: SymbolRequest):
+        """Definitions from the symbol table, None when it cannot resolve the request."""
+        if request.language_id not in STATIC_LANGUAGES:
+            return None
+        symbol_table = get_symbol_table(request.workspace or self.default_workspace)
+        file_path = lsp_command._uri_to_file_path(request.uri)
+        return symbol_table.find_definitions(file_path, request.symbol_name, request.position.line)
+
+    def resolve(self, request: SymbolRequest) -> Tuple[bool, Optional[Tuple[Dict[str, Any], List[SymbolRequest]]]]:
+        """Resolve a request into (found, (snippet, nested requests)) like `resolve_symbol_context_snippet`."""
+        definitions = self.get_definitions(request)
+        if definitions is None:
+            self.stats["unresolved"] += 1
+            return False, None
+        self.stats["resolved"] += 1
+
+        definitions = [definition for definition in definitions if not is_common_import(definition.file_path)]
+        if not definitions:
+            return True, None
+
+        definition = definitions[0]
+        definition_location = definition.location
+        symbol_name = request.symbol_name
+        symbol_context_snippet = {
+            "identifier": "LSPRetriever",
+            "uri": definition.file_path,
+            "start_line": definition.name_range.start.line,
+            "end_line": definition.name_range.end.line,
+            "symbol": symbol_name,
+            "location": definition_location,
+            "content": None,
+        }
+
+        # The signature takes the place of the hover text
+        definition_string = definition.signature
+        if is_unhelpful_symbol_snippet(symbol_name, definition_string):
+            return True, (symbol_context_snippet, [])
+
+        try:
+            # Like `lsp_command.get_lines_from_location`, the document being completed is read from its synced buffer
+            nested_symbols_source = synced_buffers.get_snapshot(definition.file_path).get_lines(definition.name_range.start.line, 10)
+        except OSError:
+            nested_symbols_source = ""
+
+        nested_symbol_requests = get_nested_symbol_requests(
+            symbol_name, request.language_id, request.workspace, definition_location, nested_symbols_source, True
+        )
+
+        if request.capture_name == CAPTURE_NAME_OBJECT_CREATE or "class" in nested_symbols_source:
+            definition_string += "\n" + self.get_text_by_symbols(request, definition_location)
+
+        symbol_context_snippet["content"] = definition_string
+        return True, (symbol_context_snippet, nested_symbol_requests)
+
+    def get_text_by_symbols(self, request: SymbolRequest, definition_location) -> str:
+        """Static equivalent of `symbol_context_snippets.get_text_by_symbols`."""
+        symbol_table = get_symbol_table(request.workspace or self.default_workspace)
+        document_symbol_index = symbol_table.get_document_symbol_index(definition_location.uri)
+        symbol = document_symbol_index.find(definition_location, request.symbol_name, request.capture_name)
+        if not symbol:
+            return ''
+
+        symbol_range = symbol.location.range
+        try:
+            return synced_buffers.get_snapshot(symbol.location.uri).get_range(
+                symbol_range.start.line,
+                symbol_range.start.character,
+                symbol_range.end.line,
+                symbol_range.end.character,
+            ).strip()
+        except (OSError, IndexError):
+            return ''
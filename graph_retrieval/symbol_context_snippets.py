@@ -1,3 +1,5 @@
+import asyncio
+import os
 from typing import List, Dict, Optional, Set, Union, Any, Tuple
 
 # Import LSP commands from our rewritten module
@@ -6,12 +8,15 @@ from graph_retrieval.lsp_command import (
     # get_implementation_locations,
     # get_type_definition_locations,
     get_parsed_hovers,
-    get_document_symbol,
+    get_document_symbol_index,
     get_text_from_location,
     get_lines_from_location,
 )
+from graph_retrieval import lsp_command
 from graph_retrieval.identifiers import get_last_n_graph_context_identifiers_from_string
 from graph_retrieval.hover import is_unhelpful_symbol_snippet
+from graph_retrieval.document_symbol_index import CAPTURE_NAME_OBJECT_CREATE
+from programing_language import get_language_profile
 from schema.common import Position, Location
 from schema.lsp import LSPSymbolContextSnippet
 from schema.tree_sitter import SymbolRequest
@@ -19,7 +24,7 @@ from schema.tree_sitter import SymbolRequest
 # These would normally be imported from other modules
 # For this implementation we'll use placeholders
 NESTED_IDENTIFIERS_TO_RESOLVE = 5
-CAPTURE_NAME_OBJECT_CREATE = "object_create"
+MAX_CONCURRENT_SYMBOL_REQUESTS = 4
 
 # Common keywords and import paths (simplified)
 common_keywords = {"self", "this", "super", "None", "True", "False"}
@@ -34,6 +39,42 @@ common_import_paths = [
 
 
 
+def get_request_path(request: SymbolRequest) -> str:
+    """
+    Normalized file path of a request.
+
+    Top-level requests name their document by a `file://` uri, nested ones by the path of a
+    definition. Relative paths resolve against the workspace, like the language server does.
+    """
+    file_path = lsp_command._uri_to_file_path(request.uri)
+    if not os.path.isabs(file_path):
+        file_path = os.path.join(request.workspace or lsp_command.workspace_root, file_path)
+    return os.path.normpath(file_path)
+
+
+class SymbolResolutionContext:
+    """State shared by one top-level lookup and all of its nested lookups."""
+
+    def __init__(self, max_concurrency: int = MAX_CONCURRENT_SYMBOL_REQUESTS, static_resolver=None):
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.claimed_requests: Set[Tuple[str, int, int]] = set()
+        self.static_resolver = static_resolver
+
+    def claim(self, request: SymbolRequest) -> bool:
+        """Claim a request by (file path, position), returns False if it was already claimed."""
+        key = (get_request_path(request), request.position.line, request.position.character)
+        if key in self.claimed_requests:
+            return False
+        self.claimed_requests.add(key)
+        return True
+
+    def resolve_statically(self, request: SymbolRequest) -> Tuple[bool, Optional[Tuple[Dict[str, Any], List[SymbolRequest]]]]:
+        """Resolve a request without the language server, returns (found, resolved) like a cache lookup."""
+        if self.static_resolver is None:
+            return False, None
+        return self.static_resolver.resolve(request)
+
+
 def is_common_import(uri: str) -> bool:
     """Check if a URI points to a common import path."""
     for import_path in common_import_paths:
@@ -47,26 +88,10 @@ def is_javascript(language_id: str) -> bool:
     return language_id in ["javascript", "typescript", "javascriptreact", "typescriptreact"]
 
 
-async def get_text_by_symbols(definition_location: Location, symbol_name: str, capture_name: str, language_id: str = None) -> str:
+async def get_text_by_symbols(definition_location: Location, symbol_name: str, capture_name: str, language_id: str = None, workspace: Optional[str] = None) -> str:
     """Get text for symbols in a document."""
-    document_symbols = await get_document_symbol(definition_location.uri, language=language_id)
-    
-    symbol = None
-    if capture_name == CAPTURE_NAME_OBJECT_CREATE:
-        for s in document_symbols:
-            if s.name == symbol_name or symbol_name in s.name:
-                symbol = s
-                break
-    else:
-        for s in document_symbols:
-            # Check if symbol is at the same location
-            if hasattr(s, 'location') and s.location.range.start.line == definition_location.range.start.line:
-                symbol = s
-                break
-            elif s.name == symbol_name or symbol_name in s.name:
-                symbol = s
-                break
-    
+    document_symbol_index = await get_document_symbol_index(definition_location.uri, language=language_id, workspace=workspace)
+    symbol = document_symbol_index.find(definition_location, symbol_name, capture_name)
     if not symbol:
         return ''
     
@@ -79,20 +104,118 @@ def is_defined(item: Optional[Any]) -> bool:
     return item is not None
 
 
-async def get_snippet_for_location_getter_with_hover_and_get_symbols(
+async def get_hover_candidate(uri: str, position: Position, symbol_name: Optional[str] = None, language_id: str = None, workspace: Optional[str] = None) -> Tuple[str, Optional[str], bool]:
+    """Hover text at a position as a (definition_string, hover_kind, is_hover) candidate."""
+    parsed_hover = (await get_parsed_hovers(uri, position, symbol_name, language=language_id, workspace=workspace))[0]
+    return parsed_hover.text, parsed_hover.kind, True
+
+
+async def get_text_candidate(location: Location) -> Tuple[str, Optional[str], bool]:
+    """Source text at a location as a (definition_string, hover_kind, is_hover) candidate."""
+    return await get_text_from_location(location), None, False
+
+
+def cancel_pending(tasks: List[asyncio.Future]):
+    """Cancel speculative tasks that are no longer needed."""
+    for task in tasks:
+        if not task.done():
+            task.cancel()
+        elif not task.cancelled():
+            # Mark the exception as retrieved, the result of a losing candidate is not used
+            task.exception()
+
+
+async def get_first_helpful_candidate(symbol_name: str, candidates: List[asyncio.Future]) -> Tuple[str, Optional[str], bool]:
+    """
+    Return the first helpful candidate in priority order.
+
+    All candidates are already running, so waiting on them in order costs roughly the slowest
+    one that has to be inspected instead of the sum of the round trips. The remaining
+    candidates are cancelled once a winner is found. If none is helpful, the last candidate
+    is returned.
+    """
+    try:
+        result = ("", None, False)
+        for candidate in candidates:
+            result = await candidate
+            if not is_unhelpful_symbol_snippet(symbol_name, result[0]):
+                return result
+        return result
+    finally:
+        cancel_pending(candidates)
+
+
+def get_nested_symbol_requests(
+    symbol_name: str,
+    language_id: str,
+    workspace: Optional[str],
+    definition_location: Location,
+    nested_symbols_source: str,
+    is_hover: bool,
+) -> List[SymbolRequest]:
+    """Symbol requests for the identifiers used in the source of a definition, positioned in its file."""
+    definition_range = definition_location.range
+    initial_nested_symbol_requests = get_last_n_graph_context_identifiers_from_string(
+        n=NESTED_IDENTIFIERS_TO_RESOLVE,
+        uri=definition_location.uri,
+        language_id=language_id,
+        source=nested_symbols_source,
+        prioritize="head"
+    )
+
+    # Filter nested symbol requests
+    profile = get_language_profile(language_id)
+    keywords = profile.keywords if profile else frozenset()
+    nested_symbol_requests = []
+    for request in initial_nested_symbol_requests:
+        if (
+            len(request.symbol_name) > 0 and
+            symbol_name != request.symbol_name and
+            request.symbol_name not in common_keywords and
+            request.symbol_name not in keywords
+            # and ("class" in nested_symbols_source or (definition_string and request.symbol_name in definition_string))
+        ):
+            # Nested symbols are resolved against the same repository
+            request.workspace = workspace
+
+            # Adjust position
+            if is_hover:
+                request.position = Position(
+                    line=request.position.line + definition_range.start.line,
+                    character=request.position.character
+                )
+            else:
+                request.position = Position(
+                    line=request.position.line + definition_range.start.line,
+                    character=request.position.character + definition_range.start.character
+                )
+            
+            nested_symbol_requests.append(request)
+
+    return nested_symbol_requests
+
+
+async def resolve_symbol_context_snippet(
     location_getter,
     symbol_snippet_request: SymbolRequest,
-    recursion_limit: int,
-) -> Optional[List[Dict[str, Any]]]:
-    """Get snippet for a location using hover and symbol information."""
+) -> Optional[Tuple[Dict[str, Any], List[SymbolRequest]]]:
+    """Resolve one symbol into its context snippet and the nested symbol requests found in its definition."""
     uri = symbol_snippet_request.uri
     position = symbol_snippet_request.position
     node_type = symbol_snippet_request.node_type
     symbol_name = symbol_snippet_request.symbol_name
     language_id = symbol_snippet_request.language_id
     capture_name = symbol_snippet_request.capture_name
-    
-    definition_locations = await location_getter(uri, position, language=language_id)
+    workspace = symbol_snippet_request.workspace
+
+    # The hover at the symbol does not depend on the definition, send both requests at once
+    hover_task = asyncio.ensure_future(get_hover_candidate(uri, position, symbol_name, language_id, workspace))
+    try:
+        definition_locations = await location_getter(uri, position, language=language_id, workspace=workspace)
+    except BaseException:
+        cancel_pending([hover_task])
+        raise
+
     # Sort for the narrowest definition range
     sorted_definition_locations = sorted(
         [loc for loc in definition_locations if not is_common_import(loc.uri)],
@@ -100,6 +223,7 @@ async def get_snippet_for_location_getter_with_hover_and_get_symbols(
     )
     
     if not sorted_definition_locations:
+        cancel_pending([hover_task])
         return None
     
     definition_location = sorted_definition_locations[0]
@@ -116,43 +240,39 @@ async def get_snippet_for_location_getter_with_hover_and_get_symbols(
         "location": definition_location,
         "content": None,
     }
-    
-    # Get hover information
-    parsed_hover = (await get_parsed_hovers(uri, position, symbol_name, language=language_id))[0]
-    definition_string = parsed_hover.text
-    hover_kind = parsed_hover.kind
-    is_hover = True
-    
-    # Try different approaches to get meaningful definition text
-    if is_unhelpful_symbol_snippet(symbol_name, definition_string):
-        hover_kind = None
-        is_hover = False
-        
-        if node_type == "type_identifier":
-            definition_string = await get_text_from_location(definition_location)
-        
-        if is_unhelpful_symbol_snippet(symbol_name, definition_string):
-            parsed_hover = (await get_parsed_hovers(
-                definition_location.uri,
-                definition_range.start,
-                language=language_id
-            ))[0]
-            
-            definition_string = parsed_hover.text
-            hover_kind = parsed_hover.kind
-            is_hover = True
-
-    if is_unhelpful_symbol_snippet(symbol_name, definition_string):
-        hover_kind = None
-        is_hover = False
-        definition_string = await get_text_from_location(definition_location)
-    
+
+    # Start the whole fallback chain speculatively, together with the reads needed afterwards:
+    # hover at the symbol, then the definition text for type identifiers, then the hover at
+    # the definition, and finally the definition text.
+    text_task = asyncio.ensure_future(get_text_candidate(definition_location))
+    candidates = [hover_task]
+    if node_type == "type_identifier":
+        candidates.append(text_task)
+    candidates.append(asyncio.ensure_future(get_hover_candidate(definition_uri, definition_range.start, language_id=language_id, workspace=workspace)))
+    candidates.append(text_task)
+
+    nested_symbols_source_task = asyncio.ensure_future(get_lines_from_location(definition_location, 10))
+    symbols_text_task = None
+    if capture_name == CAPTURE_NAME_OBJECT_CREATE:
+        symbols_text_task = asyncio.ensure_future(get_text_by_symbols(definition_location, symbol_name, capture_name, language_id, workspace))
+    follow_up_tasks = [task for task in (nested_symbols_source_task, symbols_text_task) if task]
+
+    try:
+        definition_string, hover_kind, is_hover = await get_first_helpful_candidate(symbol_name, candidates)
+    except BaseException:
+        cancel_pending(follow_up_tasks)
+        raise
 
     if not definition_string or is_unhelpful_symbol_snippet(symbol_name, definition_string) or len(definition_string.splitlines()) > 100:
-        return [symbol_context_snippet]
+        cancel_pending(follow_up_tasks)
+        return symbol_context_snippet, []
     
     # Get nested symbols
-    nested_symbols_source = await get_lines_from_location(definition_location, 10)
+    try:
+        nested_symbols_source = await nested_symbols_source_task
+    except BaseException:
+        cancel_pending(follow_up_tasks)
+        raise
     
     if is_javascript(language_id):
         # Modify source for proper parsing
@@ -162,102 +282,145 @@ async def get_snippet_for_location_getter_with_hover_and_get_symbols(
         if nested_symbols_source.strip().startswith("constructor"):
             nested_symbols_source = f"{{{nested_symbols_source}}}"
     
-    # Get nested symbols from the source
-    initial_nested_symbol_requests = get_last_n_graph_context_identifiers_from_string(
-        n=NESTED_IDENTIFIERS_TO_RESOLVE,
-        uri=definition_location.uri,
-        language_id=language_id,
-        source=nested_symbols_source,
-        prioritize="head"
+    nested_symbol_requests = get_nested_symbol_requests(
+        symbol_name, language_id, workspace, definition_location, nested_symbols_source, is_hover
     )
-
-    # Filter nested symbol requests
-    nested_symbol_requests = []
-    for request in initial_nested_symbol_requests:
-        if (
-            len(request.symbol_name) > 0 and
-            symbol_name != request.symbol_name and
-            request.symbol_name not in common_keywords 
-            # and ("class" in nested_symbols_source or (definition_string and request.symbol_name in definition_string))
-        ):
-            # Adjust position
-            if is_hover:
-                request.position = Position(
-                    line=request.position.line + definition_range.start.line,
-                    character=request.position.character
-                )
-            else:
-                request.position = Position(
-                    line=request.position.line + definition_range.start.line,
-                    character=request.position.character + definition_range.start.character
-                )
-            
-            nested_symbol_requests.append(request)
     
     # Get final definition string
-    if "class" in nested_symbols_source or capture_name == CAPTURE_NAME_OBJECT_CREATE:
-        final_definition_string = definition_string + "\n" + await get_text_by_symbols(definition_location, symbol_name, capture_name, language_id)
+    if symbols_text_task:
+        final_definition_string = definition_string + "\n" + await symbols_text_task
+    elif "class" in nested_symbols_source:
+        final_definition_string = definition_string + "\n" + await get_text_by_symbols(definition_location, symbol_name, capture_name, language_id, workspace)
     else:
         final_definition_string = definition_string
     
     symbol_context_snippet["content"] = final_definition_string
-    
+
+    return symbol_context_snippet, nested_symbol_requests
+
+
+async def get_snippet_for_location_getter_with_hover_and_get_symbols(
+    location_getter,
+    symbol_snippet_request: SymbolRequest,
+    recursion_limit: int,
+    resolution_context: Optional[SymbolResolutionContext] = None,
+) -> Optional[List[Dict[str, Any]]]:
+    """Get snippet for a location using hover and symbol information."""
+    if resolution_context is None:
+        resolution_context = SymbolResolutionContext()
+
+    # Only the lookups of this symbol count against the concurrency limit, the slot is
+    # released before recursing so nested requests can never wait on their parent
+    found, resolved = resolution_context.resolve_statically(symbol_snippet_request)
+    if not found:
+        async with resolution_context.semaphore:
+            resolved = await resolve_symbol_context_snippet(location_getter, symbol_snippet_request)
+
+    if resolved is None:
+        return None
+
+    symbol_context_snippet, nested_symbol_requests = resolved
     if not nested_symbol_requests:
         return [symbol_context_snippet]
     
     nested_result = await get_symbol_context_snippets_recursive(
         symbols_snippet_requests=nested_symbol_requests,
         recursion_limit=recursion_limit - 1,
+        resolution_context=resolution_context,
     )
     return [symbol_context_snippet] + nested_result
 
 
+async def get_symbol_context_snippets_for_request(
+    symbol_snippet_request: SymbolRequest,
+    recursion_limit: int,
+    resolution_context: SymbolResolutionContext,
+) -> List[Dict[str, Any]]:
+    """Get symbol context snippets for a single request, trying each location getter in turn."""
+    location_getters = [
+        get_definition_locations,
+        # get_type_definition_locations,
+        # get_implementation_locations,
+    ]
+
+    for location_getter in location_getters:
+        symbol_context_snippets = await get_snippet_for_location_getter_with_hover_and_get_symbols(
+            location_getter,
+            symbol_snippet_request,
+            recursion_limit,
+            resolution_context,
+        )
+
+        # If we found a content, we can stop trying other location getters
+        if symbol_context_snippets is not None:
+            return symbol_context_snippets
+
+    return []
+
+
 async def get_symbol_context_snippets_recursive(
     symbols_snippet_requests: List[SymbolRequest],
     recursion_limit: int,
+    resolution_context: Optional[SymbolResolutionContext] = None,
 ) -> List[Dict[str, Any]]:
-    """Recursively get symbol context snippets."""
+    """
+    Recursively get symbol context snippets.
+
+    Sibling requests are resolved concurrently, and the results are merged in the priority
+    order of the requests.
+    """
     if recursion_limit == 0:
         return []
-    
-    
-    for symbol_snippet_request in symbols_snippet_requests:
-        location_getters = [
-            get_definition_locations,
-            # get_type_definition_locations,
-            # get_implementation_locations,
-        ]
-        
-        for location_getter in location_getters:
-            symbol_context_snippets = await get_snippet_for_location_getter_with_hover_and_get_symbols(
-                location_getter,
-                symbol_snippet_request,
-                recursion_limit,
-            )
-            
-            # If we found a content, we can stop trying other location getters
-            if symbol_context_snippets is not None:
-                break
-        
-        if symbol_context_snippets is None:
-            return []
 
-        return symbol_context_snippets
-    
-    return []
+    if resolution_context is None:
+        resolution_context = SymbolResolutionContext()
+
+    # Skip requests that are already resolved or in flight elsewhere in this lookup
+    symbols_snippet_requests = [
+        request for request in symbols_snippet_requests if resolution_context.claim(request)
+    ]
+
+    # A failed request only loses its own snippets, not those of its siblings
+    results = await asyncio.gather(*[
+        get_symbol_context_snippets_for_request(request, recursion_limit, resolution_context)
+        for request in symbols_snippet_requests
+    ], return_exceptions=True)
+
+    symbol_context_snippets = []
+    for request, result in zip(symbols_snippet_requests, results):
+        if isinstance(result, Exception):
+            print(f"Error resolving symbol {request.symbol_name}: {result}")
+            continue
+        if isinstance(result, BaseException):
+            raise result
+        symbol_context_snippets.extend(result)
+
+    return symbol_context_snippets
 
 
 async def get_symbol_context_snippets(
     symbols_snippet_requests: List[SymbolRequest],
-    recursion_limit: int
+    recursion_limit: int,
+    max_concurrency: int = MAX_CONCURRENT_SYMBOL_REQUESTS,
+    static_resolver=None,
 ) -> List[LSPSymbolContextSnippet]:
-    """Get symbol context snippets from requests."""
+    """
+    Get symbol context snippets from requests.
+
+    With a `static_resolver` (see `graph_retrieval.static_resolver`), requests it can answer
+    skip the language server entirely. Snippets of symbols without helpful content are left
+    out, their nested symbols are kept.
+    """
     result = await get_symbol_context_snippets_recursive(
         symbols_snippet_requests=symbols_snippet_requests,
-        recursion_limit=recursion_limit
+        recursion_limit=recursion_limit,
+        resolution_context=SymbolResolutionContext(max_concurrency, static_resolver),
     )
     context_snippets = []
     for snippet in result:
+        # Unhelpful hovers and signatures leave no content, the snippet adds nothing to a prompt
+        if not snippet["content"]:
+            continue
         context_snippets.append(LSPSymbolContextSnippet(
             identifier=snippet["identifier"],
             content=snippet["content"],
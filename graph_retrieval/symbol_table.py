@@ -0,0 +1,567 @@
+import builtins
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Hashable, List, Optional, Tuple
+
+from tree_sitter_local.tree_sitter_local import TreeSitterAnalyzer
+from file_system.virtual_file_system import vfs
+from graph_retrieval.synced_buffers import synced_buffers
+from schema.common import Location, Position, Range
+from schema.lsp import DocumentSymbol
+from graph_retrieval.document_symbol_index import DocumentSymbolIndex
+
+MAX_IMPORT_DEPTH = 8
+SOURCE_ROOTS = ("", "src")
+IGNORED_DIRECTORIES = {".git", "__pycache__", "node_modules", "venv", ".venv", "site-packages", "build", "dist"}
+BUILTIN_NAMES = frozenset(dir(builtins))
+
+# LSP SymbolKind values, as reported by textDocument/documentSymbol
+SYMBOL_KIND_MODULE = 2
+SYMBOL_KIND_CLASS = 5
+SYMBOL_KIND_METHOD = 6
+SYMBOL_KIND_PROPERTY = 7
+SYMBOL_KIND_FUNCTION = 12
+SYMBOL_KIND_VARIABLE = 13
+
+# Statements whose bodies still bind names in the enclosing scope
+NESTED_STATEMENTS = {
+    "block", "if_statement", "elif_clause", "else_clause", "try_statement", "except_clause",
+    "finally_clause", "with_statement", "for_statement", "while_statement",
+}
+# Nodes whose identifiers are all bound by an assignment to them
+TARGET_PATTERNS = {"pattern_list", "tuple_pattern", "list_pattern", "list_splat_pattern", "tuple", "list", "parenthesized_expression"}
+
+
+@dataclass
+class SymbolDefinition:
+    name: str
+    kind: int
+    file_path: str
+    name_range: Range  # the defining identifier, which is what a language server returns as the definition
+    range: Range  # the whole definition
+    signature: str  # one line summary in the format of a Jedi hover, e.g. `def f(a: int) -> str`
+
+    @property
+    def location(self) -> Location:
+        return Location(uri=self.file_path, range=self.name_range)
+
+
+@dataclass
+class ImportBinding:
+    module: str  # dotted module path without the leading dots
+    level: int  # number of leading dots of a relative import
+    name: Optional[str] = None  # imported name, None when the module itself is bound
+
+
+@dataclass
+class Binding:
+    line: int
+    definition: Optional[SymbolDefinition] = None
+    imported: Optional[ImportBinding] = None
+
+
+@dataclass
+class FileSymbols:
+    """Module-level names of one version of a Python file."""
+    file_path: str
+    version: Hashable
+    bindings: Dict[str, List[Binding]] = field(default_factory=dict)
+    class_members: Dict[str, Dict[str, SymbolDefinition]] = field(default_factory=dict)
+    star_imports: List[ImportBinding] = field(default_factory=list)
+    # (start line, end line, names bound in the function) of every function in the file
+    function_scopes: List[Tuple[int, int, frozenset]] = field(default_factory=list)
+    # Every definition in document order, like the flat textDocument/documentSymbol response
+    symbols: List[SymbolDefinition] = field(default_factory=list)
+    document_symbol_index: Optional[DocumentSymbolIndex] = field(default=None, repr=False)
+
+    def is_locally_bound(self, name: str, line: int) -> bool:
+        """Whether `name` is bound by a function that encloses `line`, and so shadows module-level names."""
+        return any(start <= line <= end and name in names for start, end, names in self.function_scopes)
+
+    def get_binding(self, name: str, line: Optional[int] = None) -> Optional[Binding]:
+        """The binding of `name` that is live at `line`, or the last one when `line` is not given."""
+        bindings = self.bindings.get(name)
+        if not bindings:
+            return None
+        if line is not None:
+            preceding = [binding for binding in bindings if binding.line <= line]
+            if preceding:
+                return preceding[-1]
+        return bindings[-1]
+
+
+class FileIndexer:
+    """Collects the `FileSymbols` of a parsed Python file."""
+
+    def __init__(self, file_path: str, version: Hashable, source: bytes):
+        self.file_symbols = FileSymbols(file_path=file_path, version=version)
+        self.source = source
+
+    def build(self, root_node) -> FileSymbols:
+        self._index_block(root_node)
+        self._collect_function_scopes(root_node)
+        return self.file_symbols
+
+    def _index_block(self, block, class_name: Optional[str] = None):
+        for child in block.named_children:
+            self._index_statement(child, class_name)
+
+    def _index_statement(self, node, class_name: Optional[str], decorators: Tuple[str, ...] = ()):
+        node_type = node.type
+        if node_type == "decorated_definition":
+            definition = node.child_by_field_name("definition")
+            if definition is not None:
+                decorators = tuple(self._text(child) for child in node.named_children if child.type == "decorator")
+                self._index_statement(definition, class_name, decorators)
+        elif node_type == "function_definition":
+            self._add_function(node, class_name)
+        elif node_type == "class_definition":
+            self._add_class(node, class_name, decorators)
+        elif node_type == "expression_statement":
+            self._add_assignment(node, class_name)
+        elif node_type == "import_statement" and class_name is None:
+            self._add_import(node)
+        elif node_type == "import_from_statement" and class_name is None:
+            self._add_import_from(node)
+        elif node_type in NESTED_STATEMENTS:
+            for child in node.named_children:
+                self._index_statement(child, class_name)
+
+    def _add_function(self, node, class_name: Optional[str]):
+        name_node = node.child_by_field_name("name")
+        if name_node is None:
+            return
+        parameters = node.child_by_field_name("parameters")
+        return_type = node.child_by_field_name("return_type")
+        signature = f"def {self._text(name_node)}{self._format_parameters(parameters)}"
+        if return_type is not None:
+            signature += f" -> {self._collapse(self._text(return_type))}"
+
+        kind = SYMBOL_KIND_FUNCTION if class_name is None else SYMBOL_KIND_METHOD
+        self._add_definition(self._definition(name_node, node, kind, signature), class_name)
+
+    def _add_class(self, node, class_name: Optional[str], decorators: Tuple[str, ...] = ()):
+        name_node = node.child_by_field_name("name")
+        if name_node is None:
+            return
+        name = self._text(name_node)
+        if class_name is not None:
+            # Nested classes are members, their own members are not indexed
+            self._add_definition(self._definition(name_node, node, SYMBOL_KIND_CLASS, f"class {name}()"), class_name)
+            return
+
+        definition = self._definition(name_node, node, SYMBOL_KIND_CLASS, f"class {name}()")
+        self._add_definition(definition, None)
+        self.file_symbols.class_members[name] = {}
+
+        body = node.child_by_field_name("body")
+        if body is not None:
+            self._index_block(body, name)
+
+        # Like Jedi, describe a class by the signature of its constructor
+        constructor = self._find_constructor(body)
+        if constructor is not None:
+            parameters = self._format_parameters(constructor.child_by_field_name("parameters"), skip_first=True)
+            definition.signature = f"class {name}{parameters}"
+        elif any("dataclass" in decorator for decorator in decorators):
+            definition.signature = f"class {name}{self._format_fields(body)}"
+
+    def _add_assignment(self, node, class_name: Optional[str]):
+        assignment = node.named_children[0] if node.named_child_count else None
+        if assignment is None or assignment.type != "assignment":
+            return
+        left = assignment.child_by_field_name("left")
+        if left is None:
+            return
+
+        signature = self._collapse(self._text(node).split("\n", 1)[0])
+        kind = SYMBOL_KIND_VARIABLE if class_name is None else SYMBOL_KIND_PROPERTY
+        for name_node in self._target_nodes(left):
+            self._add_definition(self._definition(name_node, node, kind, signature), class_name)
+
+    def _add_import(self, node):
+        for name_node in node.children_by_field_name("name"):
+            if name_node.type == "aliased_import":
+                module = self._text(name_node.child_by_field_name("name"))
+                bound_name = self._text(name_node.child_by_field_name("alias"))
+            else:
+                # `import a.b` binds `a`
+                module = self._text(name_node).split(".", 1)[0]
+                bound_name = module
+            self._add_import_binding(node, bound_name, ImportBinding(module=module, level=0))
+
+    def _add_import_from(self, node):
+        module_node = node.child_by_field_name("module_name")
+        if module_node is None:
+            return
+        if module_node.type == "relative_import":
+            prefix = module_node.named_children[0] if module_node.named_child_count else None
+            level = len(self._text(prefix)) if prefix is not None and prefix.type == "import_prefix" else 0
+            dotted_names = [child for child in module_node.named_children if child.type == "dotted_name"]
+            module = self._text(dotted_names[0]) if dotted_names else ""
+        else:
+            level = 0
+            module = self._text(module_node)
+
+        if any(child.type == "wildcard_import" for child in node.named_children):
+            self.file_symbols.star_imports.append(ImportBinding(module=module, level=level))
+            return
+
+        for name_node in node.children_by_field_name("name"):
+            if name_node.type == "aliased_import":
+                imported_name = self._text(name_node.child_by_field_name("name"))
+                bound_name = self._text(name_node.child_by_field_name("alias"))
+            else:
+                imported_name = self._text(name_node)
+                bound_name = imported_name
+            self._add_import_binding(node, bound_name, ImportBinding(module=module, level=level, name=imported_name))
+
+    def _add_import_binding(self, node, bound_name: str, imported: ImportBinding):
+        statement_range = self._range(node)
+        self.file_symbols.symbols.append(SymbolDefinition(
+            name=bound_name,
+            kind=SYMBOL_KIND_MODULE,
+            file_path=self.file_symbols.file_path,
+            name_range=statement_range,
+            range=statement_range,
+            signature=self._collapse(self._text(node)),
+        ))
+        binding = Binding(line=node.start_point[0], imported=imported)
+        self.file_symbols.bindings.setdefault(bound_name, []).append(binding)
+
+    def _add_definition(self, definition: SymbolDefinition, class_name: Optional[str]):
+        self.file_symbols.symbols.append(definition)
+        if class_name is None:
+            binding = Binding(line=definition.range.start.line, definition=definition)
+            self.file_symbols.bindings.setdefault(definition.name, []).append(binding)
+        else:
+            self.file_symbols.class_members[class_name][definition.name] = definition
+
+    def _definition(self, name_node, node, kind: int, signature: str) -> SymbolDefinition:
+        return SymbolDefinition(
+            name=self._text(name_node),
+            kind=kind,
+            file_path=self.file_symbols.file_path,
+            name_range=self._range(name_node),
+            range=self._range(node),
+            signature=signature,
+        )
+
+    def _find_constructor(self, body):
+        if body is None:
+            return None
+        for child in body.named_children:
+            if child.type == "decorated_definition":
+                child = child.child_by_field_name("definition")
+            if child is not None and child.type == "function_definition":
+                name_node = child.child_by_field_name("name")
+                if name_node is not None and self._text(name_node) == "__init__":
+                    return child
+        return None
+
+    def _format_parameters(self, parameters, skip_first: bool = False) -> str:
+        """Parameters formatted like Jedi does, e.g. `(x: int, y: str="a")`."""
+        if parameters is None:
+            return "()"
+        formatted = []
+        for parameter in parameters.named_children:
+            parameter_type = parameter.type
+            if parameter_type == "comment":
+                continue
+            name = parameter.child_by_field_name("name")
+            value = parameter.child_by_field_name("value")
+            if parameter_type == "default_parameter":
+                formatted.append(f"{self._text(name)}={self._collapse(self._text(value))}")
+            elif parameter_type == "typed_default_parameter":
+                annotation = parameter.child_by_field_name("type")
+                formatted.append(
+                    f"{self._text(name)}: {self._collapse(self._text(annotation))}={self._collapse(self._text(value))}"
+                )
+            else:
+                formatted.append(self._collapse(self._text(parameter)))
+        if skip_first:
+            formatted = formatted[1:]
+        return "(" + ", ".join(formatted) + ")"
+
+    def _format_fields(self, body) -> str:
+        """Constructor parameters generated by `@dataclass` from the annotated fields of a class body."""
+        if body is None:
+            return "()"
+        formatted = []
+        for child in body.named_children:
+            assignment = child.named_children[0] if child.type == "expression_statement" and child.named_child_count else None
+            if assignment is None or assignment.type != "assignment":
+                continue
+            left = assignment.child_by_field_name("left")
+            annotation = assignment.child_by_field_name("type")
+            if left is None or left.type != "identifier" or annotation is None:
+                continue
+            annotation_text = self._collapse(self._text(annotation))
+            if annotation_text.startswith("ClassVar"):
+                continue
+            field_text = f"{self._text(left)}: {annotation_text}"
+            value = assignment.child_by_field_name("right")
+            if value is not None:
+                field_text += f"={self._collapse(self._text(value))}"
+            formatted.append(field_text)
+        return "(" + ", ".join(formatted) + ")"
+
+    def _collect_function_scopes(self, root_node):
+        stack = [root_node]
+        while stack:
+            node = stack.pop()
+            if node.type == "function_definition":
+                self.file_symbols.function_scopes.append(
+                    (node.start_point[0], node.end_point[0], frozenset(self._function_names(node)))
+                )
+            stack.extend(node.named_children)
+
+    def _function_names(self, function_node) -> set:
+        """Names bound by the parameters and the body of a function, excluding nested scopes."""
+        names = set()
+        global_names = set()
+        parameters = function_node.child_by_field_name("parameters")
+        if parameters is not None:
+            for parameter in parameters.named_children:
+                # `x`, `x=1`, `x: int`, `*args` and `**kwargs` all lead with the identifier
+                name = parameter.child_by_field_name("name") or parameter
+                while name.type != "identifier" and name.named_child_count:
+                    name = name.named_children[0]
+                if name.type == "identifier":
+                    names.add(self._text(name))
+
+        body = function_node.child_by_field_name("body")
+        stack = [body] if body is not None else []
+        while stack:
+            node = stack.pop()
+            node_type = node.type
+            if node_type in ("function_definition", "class_definition"):
+                name_node = node.child_by_field_name("name")
+                if name_node is not None:
+                    names.add(self._text(name_node))
+                continue
+            if node_type == "lambda":
+                continue
+            if node_type in ("assignment", "augmented_assignment", "for_statement", "for_in_clause"):
+                left = node.child_by_field_name("left")
+                if left is not None:
+                    names.update(self._text(target) for target in self._target_nodes(left))
+            elif node_type == "named_expression":
+                name_node = node.child_by_field_name("name")
+                if name_node is not None:
+                    names.add(self._text(name_node))
+            elif node_type == "as_pattern_target":
+                names.update(self._text(target) for target in self._target_nodes(node))
+            elif node_type == "import_statement":
+                for name_node in node.children_by_field_name("name"):
+                    alias = name_node.child_by_field_name("alias") if name_node.type == "aliased_import" else None
+                    names.add(self._text(alias) if alias is not None else self._text(name_node).split(".", 1)[0])
+            elif node_type == "import_from_statement":
+                for name_node in node.children_by_field_name("name"):
+                    alias = name_node.child_by_field_name("alias") if name_node.type == "aliased_import" else None
+                    names.add(self._text(alias if alias is not None else name_node))
+            elif node_type in ("global_statement", "nonlocal_statement"):
+                global_names.update(self._text(child) for child in node.named_children)
+            stack.extend(node.named_children)
+        return names - global_names
+
+    def _target_nodes(self, node) -> list:
+        """Identifiers bound by an assignment target, attributes and subscripts bind nothing."""
+        if node.type == "identifier":
+            return [node]
+        if node.type in TARGET_PATTERNS or node.type == "as_pattern_target":
+            targets = []
+            for child in node.named_children:
+                targets.extend(self._target_nodes(child))
+            return targets
+        return []
+
+    def _text(self, node) -> str:
+        return self.source[node.start_byte:node.end_byte].decode("utf-8", errors="replace")
+
+    @staticmethod
+    def _collapse(text: str) -> str:
+        """Join a multi-line fragment into one line."""
+        return " ".join(line.strip() for line in text.splitlines() if line.strip())
+
+    def _range(self, node) -> Range:
+        return Range(
+            start=self._position(node.start_point, node.start_byte),
+            end=self._position(node.end_point, node.end_byte),
+        )
+
+    def _position(self, point: Tuple[int, int], byte: int) -> Position:
+        # Tree-sitter columns are bytes, LSP positions are characters
+        line, column = point
+        line_prefix = self.source[byte - column:byte]
+        if line_prefix.isascii():
+            return Position(line=line, character=column)
+        return Position(line=line, character=len(line_prefix.decode("utf-8", errors="replace")))
+
+
+class RepoSymbolTable:
+    """
+    Definitions, imports and class members of the Python files of one repository.
+
+    Files are indexed on first use and re-indexed when they change on disk. A file synced to a
+    language server buffer is indexed from the synced text, so positions match the live buffer.
+    Names are resolved through the import map of each file, so `from .a import b` leads to the
+    definition of `b` in `a.py` without asking a language server.
+    """
+
+    def __init__(self, workspace_root: str):
+        self.workspace_root = os.path.abspath(workspace_root)
+        self._files: Dict[str, FileSymbols] = {}
+        self._analyzer = TreeSitterAnalyzer(language_string="python")
+        self._lock = threading.Lock()
+
+    def get_file_symbols(self, file_path: str) -> Optional[FileSymbols]:
+        file_path = os.path.abspath(file_path)
+        snapshot = synced_buffers.get(file_path)
+        try:
+            if snapshot is None:
+                snapshot = vfs.get(file_path)
+                text = vfs.read_text(file_path)
+            else:
+                text = snapshot.text
+        except (OSError, UnicodeDecodeError):
+            return None
+
+        with self._lock:
+            file_symbols = self._files.get(file_path)
+            if file_symbols is not None and file_symbols.version == snapshot.version:
+                return file_symbols
+
+            source = text.encode("utf-8")
+            tree = self._analyzer.parser.parse(source)
+            file_symbols = FileIndexer(file_path, snapshot.version, source).build(tree.root_node)
+            self._files[file_path] = file_symbols
+            return file_symbols
+
+    def index_all(self) -> int:
+        """Index every Python file of the repository, returns the number of files indexed."""
+        indexed = 0
+        for directory, directory_names, file_names in os.walk(self.workspace_root):
+            directory_names[:] = [name for name in directory_names if name not in IGNORED_DIRECTORIES]
+            for file_name in file_names:
+                if file_name.endswith(".py") and self.get_file_symbols(os.path.join(directory, file_name)):
+                    indexed += 1
+        return indexed
+
+    def find_definitions(self, file_path: str, name: str, line: int) -> Optional[List[SymbolDefinition]]:
+        """
+        Definitions of the name `name` used at `line` of `file_path`.
+
+        Returns None when the table cannot resolve the name (local variables, external
+        modules, dynamic imports), and an empty list for builtins, which have no definition
+        inside the repository.
+        """
+        file_symbols = self.get_file_symbols(file_path)
+        if file_symbols is None or file_symbols.is_locally_bound(name, line):
+            return None
+
+        binding = file_symbols.get_binding(name, line)
+        if binding is not None:
+            definition = self._resolve_binding(file_symbols.file_path, binding, 0)
+            return [definition] if definition is not None else None
+
+        resolved_star_imports = True
+        for star_import in file_symbols.star_imports:
+            module_path = self.resolve_module(star_import.module, star_import.level, file_symbols.file_path)
+            if module_path is None:
+                resolved_star_imports = False
+                continue
+            definition = self._resolve_exported(module_path, name, 1)
+            if definition is not None:
+                return [definition]
+
+        if name in BUILTIN_NAMES and resolved_star_imports:
+            return []
+        return None
+
+    def get_document_symbols(self, file_path: str) -> List[DocumentSymbol]:
+        """Document symbols in the format of `lsp_command.get_document_symbol`."""
+        file_symbols = self.get_file_symbols(file_path)
+        if file_symbols is None:
+            return []
+        return [
+            DocumentSymbol(name=symbol.name, kind=symbol.kind, location=Location(uri=symbol.file_path, range=symbol.range))
+            for symbol in file_symbols.symbols
+        ]
+
+    def get_document_symbol_index(self, file_path: str) -> DocumentSymbolIndex:
+        """`get_document_symbols` indexed by name and start line, built once per file version."""
+        file_symbols = self.get_file_symbols(file_path)
+        if file_symbols is None:
+            return DocumentSymbolIndex([])
+        if file_symbols.document_symbol_index is None:
+            file_symbols.document_symbol_index = DocumentSymbolIndex(self.get_document_symbols(file_path))
+        return file_symbols.document_symbol_index
+
+    def resolve_module(self, module: str, level: int, from_file: str) -> Optional[str]:
+        """Path of the file that defines a module imported from `from_file`, None if it is not in the repository."""
+        parts = module.split(".") if module else []
+        if level:
+            base = os.path.dirname(from_file)
+            for _ in range(level - 1):
+                base = os.path.dirname(base)
+            bases = [base]
+        else:
+            bases = [os.path.join(self.workspace_root, root) for root in SOURCE_ROOTS]
+            bases.append(os.path.dirname(from_file))
+
+        for base in bases:
+            module_path = os.path.join(base, *parts)
+            if parts and os.path.isfile(module_path + ".py"):
+                return module_path + ".py"
+            package_path = os.path.join(module_path, "__init__.py")
+            if os.path.isfile(package_path):
+                return package_path
+        return None
+
+    def _resolve_binding(self, file_path: str, binding: Binding, depth: int) -> Optional[SymbolDefinition]:
+        if binding.definition is not None:
+            return binding.definition
+
+        imported = binding.imported
+        if imported is None or imported.name is None:
+            return None
+        module_path = self.resolve_module(imported.module, imported.level, file_path)
+        if module_path is None:
+            return None
+        return self._resolve_exported(module_path, imported.name, depth + 1)
+
+    def _resolve_exported(self, module_path: str, name: str, depth: int) -> Optional[SymbolDefinition]:
+        """Definition of the module-level name `name` of a module, following re-exports."""
+        if depth > MAX_IMPORT_DEPTH:
+            return None
+        file_symbols = self.get_file_symbols(module_path)
+        if file_symbols is None:
+            return None
+
+        binding = file_symbols.get_binding(name)
+        if binding is not None:
+            return self._resolve_binding(file_symbols.file_path, binding, depth)
+
+        for star_import in file_symbols.star_imports:
+            star_module_path = self.resolve_module(star_import.module, star_import.level, file_symbols.file_path)
+            if star_module_path is not None:
+                definition = self._resolve_exported(star_module_path, name, depth + 1)
+                if definition is not None:
+                    return definition
+        return None
+
+
+_symbol_tables: Dict[str, RepoSymbolTable] = {}
+_symbol_tables_lock = threading.Lock()
+
+
+def get_symbol_table(workspace_root: str) -> RepoSymbolTable:
+    """Process-wide symbol table of a repository."""
+    workspace_root = os.path.abspath(workspace_root)
+    with _symbol_tables_lock:
+        symbol_table = _symbol_tables.get(workspace_root)
+        if symbol_table is None:
+            symbol_table = _symbol_tables[workspace_root] = RepoSymbolTable(workspace_root)
+        return symbol_table
@@ -0,0 +1,50 @@
+import itertools
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from file_system.virtual_file_system import FileSnapshot, vfs
+
+
+class SyncedBuffers:
+    """
+    Snapshots of the texts synced to language server buffers, by file path.
+
+    A server answers with positions in the synced text, not in the file on disk, so snippets
+    at the locations it returns are sliced from these snapshots while a buffer is open.
+    """
+
+    def __init__(self):
+        # The snapshot of each path and the language server whose buffer holds it
+        self._snapshots: Dict[str, Tuple[FileSnapshot, Any]] = {}
+        self._lock = threading.Lock()
+        # Every synced text gets its own version, so caches keyed by version never mix up two texts
+        self._versions = itertools.count()
+
+    def put(self, file_path: str, text: str, owner: Any):
+        path = os.path.abspath(file_path)
+        snapshot = FileSnapshot(path, ("buffer", next(self._versions)), text=text)
+        with self._lock:
+            self._snapshots[path] = snapshot, owner
+
+    def discard(self, file_path: str, owner: Any):
+        """Drop the snapshot of `file_path` if it is the one of `owner`'s buffer."""
+        path = os.path.abspath(file_path)
+        with self._lock:
+            entry = self._snapshots.get(path)
+            if entry is not None and entry[1] is owner:
+                del self._snapshots[path]
+
+    def get(self, file_path: str) -> Optional[FileSnapshot]:
+        with self._lock:
+            entry = self._snapshots.get(os.path.abspath(file_path))
+            return entry[0] if entry is not None else None
+
+    def get_snapshot(self, file_path: str) -> FileSnapshot:
+        """Snapshot of the synced buffer of `file_path`, or of the file on disk when no buffer is open."""
+        snapshot = self.get(file_path)
+        return snapshot if snapshot is not None else vfs.get(file_path)
+
+
+# Process-wide registry written by `DocumentSync` and read when slicing snippets
+synced_buffers = SyncedBuffers()
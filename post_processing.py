@@ -1,10 +1,15 @@
 from schema.common import Document, Position
 import os
-import jsonlines
+import json
+from functools import partial
 from tqdm import tqdm
 import argparse
-from post_processing.main import parse_and_truncate_completion, process_completion
+from post_processing.post_process_candidates import post_process_candidates
 from context.handle_current_context import get_current_doc_context
+from tree_sitter_local.tree_sitter_local import tree_sitter_pool
+from file_system.chunked_map import map_chunks_in_order
+
+DEFAULT_CHUNK_SIZE = 64
 
 def process_single_data(base_dir, data):
 
@@ -22,61 +27,73 @@ def process_single_data(base_dir, data):
 
     doc_context = get_current_doc_context(document, language_id)
 
-    raw_completion = data["choices"][0]["text"]
-
-    completion = parse_and_truncate_completion(raw_completion, {
-        'document': document,
-        'doc_context': doc_context,
-    }, True)
-
-    if completion is None:
-        return {
-            **data,
-            'choices': [{"text":raw_completion}]
-        }
+    # Every sampled choice is post-processed against the same doc context and document tree
+    raw_completions = [choice["text"] for choice in data["choices"]]
 
-    completed_completion = process_completion(completion, {
+    completions = post_process_candidates(raw_completions, {
         'document': document,
         'doc_context': doc_context,
     }, True)
 
     return {
         **data,
-        'choices': [{"text":completed_completion['insert_text']}]
+        'choices': [{"text": completion} for completion in completions]
     }
 
 
  
-def process_jsonl_file(base_dir, input_file, output_file):
-    results = []
+def process_record_line(base_dir, line):
+    """Post-process one JSONL record, returns the output line without its newline."""
+    data = json.loads(line)
+    try:
+        result = process_single_data(base_dir, data)
+    except Exception as e:
+        print(f"Error processing data: {e}")
+        # Add the original data with error information
+        result = {"error": str(e), **data}
+    # Same encoding as the jsonlines writer
+    return json.dumps(result, ensure_ascii=False)
 
-    dataset = []
-    with jsonlines.open(input_file) as reader:
-        for data in reader:
-            dataset.append(data)
-    
-    # Read input JSONL file
-    with jsonlines.open(input_file) as reader:
-        # Wrap with tqdm for progress bar
-        for index, data in enumerate(tqdm(reader, desc="Processing data")):
-            try:
-                new_data = {
-                    **data,
-                    'prefix': dataset[index]['prefix'],
-                    'suffix': dataset[index]['suffix'],
-                }
-                result = process_single_data(base_dir, new_data)
-                results.append(result)
-            except Exception as e:
-                print(f"Error processing data: {e}")
-                # Add the original data with error information
-                results.append({"error": str(e), **data})
-    
-    # Write results to output JSONL file
-    with jsonlines.open(output_file, mode='w') as writer:
-        writer.write_all(results)
-    
-    print(f"Processed {len(results)} items. Results saved to {output_file}")
+
+def process_chunk(base_dir, lines):
+    return [process_record_line(base_dir, line) for line in lines]
+
+
+def warm_up_worker():
+    # Every worker process loads its parser once and reuses it for all of its records
+    tree_sitter_pool.get_analyzer("python")
+
+
+def read_chunks(input_file, chunk_size):
+    """Yield the raw lines of a JSONL file in lists of `chunk_size`."""
+    chunk = []
+    with open(input_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            chunk.append(line)
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def process_jsonl_file(base_dir, input_file, output_file, workers=1, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Stream the records of `input_file` into `output_file`, in input order.
+
+    Records are read and written in chunks, so memory only holds the chunks in flight.
+    """
+    count = 0
+    with open(output_file, 'w', encoding='utf-8') as writer, tqdm(desc="Processing data") as progress:
+        chunks = read_chunks(input_file, chunk_size)
+        for result_lines in map_chunks_in_order(partial(process_chunk, base_dir), chunks, workers, warm_up_worker):
+            writer.write(''.join(result_line + '\n' for result_line in result_lines))
+            count += len(result_lines)
+            progress.update(len(result_lines))
+
+    print(f"Processed {count} items. Results saved to {output_file}")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Post-process model completions with context')
@@ -86,9 +103,11 @@ if __name__ == "__main__":
                         help='Input JSONL file with model completions')
     parser.add_argument('--output', type=str, required=True,
                         help='Output JSONL file path for processed completions')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of worker processes, 1 processes records in this process')
+    parser.add_argument('--chunk_size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help='Number of records read, sent to a worker and written at once')
     
     args = parser.parse_args()
     
-    process_jsonl_file(args.base_dir, args.input, args.output)
-    
-    
\ No newline at end of file
+    process_jsonl_file(args.base_dir, args.input, args.output, args.workers, args.chunk_size)
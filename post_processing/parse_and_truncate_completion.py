@@ -1,5 +1,5 @@
 from schema.common import Position
-from .parse_completion import parse_completion
+from .parse_completion import CompletionParseContext
 from .truncate_parsed_completion import truncate_parsed_completion
 
 
@@ -9,11 +9,11 @@ def parse_and_truncate_completion(completion: str, params, multiline: bool):
 
     insert_text_before_truncation = completion.rstrip()
 
-    parsed = parse_completion({
-        'completion': {'insert_text': insert_text_before_truncation},
-        'document': document,
-        'doc_context': doc_context,
-    })
+    # Every completion variant of the request is parsed from the same document tree, which
+    # callers post-processing several candidates of a request share through `parse_context`
+    parse_context = params.get('parse_context') or CompletionParseContext(document, doc_context)
+
+    parsed = parse_context.parse({'insert_text': insert_text_before_truncation})
 
     if parsed['insert_text'] == '':
         return parsed
@@ -23,6 +23,7 @@ def parse_and_truncate_completion(completion: str, params, multiline: bool):
             'parsed': parsed,
             'document': document,
             'doc_context': doc_context,
+            'parse_context': parse_context,
         })
 
         parsed['insert_text'] = truncation_result['insert_text']
@@ -40,6 +41,7 @@ def truncate_multiline_block(params):
             'completion': parsed,
             'doc_context': doc_context,
             'document': document,
+            'parse_context': params.get('parse_context'),
         }),
     }
 
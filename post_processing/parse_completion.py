@@ -1,22 +1,23 @@
-from typing import Tuple
+from typing import Dict, Optional, Tuple
 
 from .process_inline_completion import get_matching_suffix_length
-from programing_language import NODE_LANGUAGE
-from tree_sitter_local.tree_sitter_local import TreeSitterAnalyzer
+from programing_language import get_language_profile
+from tree_sitter_local.tree_sitter_local import tree_sitter_pool
+from tree_sitter_local.tree_cache import tree_cache, TreeEdit, apply_edit, advance_point
+from file_system.line_index import get_line_index, advance_position
 
 
 def parse_origin_document(context):
     document = context['document']
     language_id = document['language_id']
 
-    parser =  TreeSitterAnalyzer(language_string=language_id)
+    parser = tree_sitter_pool.get_analyzer(language_id)
 
-    tree = parser.safe_parse(document['text'])
-    if not tree:
+    try:
+        return tree_cache.get_tree(parser, document['uri'], document['text'], document.get('version'))
+    except Exception:
         return None
 
-    return tree
-
 def get_nodes_for_line(tree, line_number):
     def traverse(node):
         if node.start_point[0] == line_number:
@@ -27,88 +28,150 @@ def get_nodes_for_line(tree, line_number):
     return list(traverse(tree.root_node))
 
 
-def parse_completion(context):
-    completion = context['completion']
-    document = context['document']
-    doc_context = context['doc_context']
-    position = doc_context['position']
-    multiline_trigger_position = doc_context.get('multiline_trigger_position', None)
-    language_id = document.language_id
-
-    parser = TreeSitterAnalyzer(language_string=language_id)
+class CompletionParseContext:
+    """
+    The parsed document of one completion request, shared by every parse of its completion variants.
+
+    The document tree comes from `tree_cache`. Variants are parsed as incremental edits of a
+    private copy of it: the edit is applied, the variant parsed, then the edit undone, so every
+    variant only re-parses the region around the completion. Parses are memoized by the text
+    inserted.
+    """
+
+    def __init__(self, document, doc_context):
+        self.document = document
+        self.doc_context = doc_context
+        self.parser = tree_sitter_pool.get_analyzer(document.language_id)
+        self.line_index = get_line_index(document.text)
+        self._source = None
+        self._working_tree = None
+        self._parsed: Dict[str, Optional[dict]] = {}
+
+    def parse(self, completion):
+        insert_text = completion['insert_text']
+        if insert_text not in self._parsed:
+            self._parsed[insert_text] = self._parse(insert_text)
+
+        parsed = self._parsed[insert_text]
+        if parsed is None:
+            return completion
+        # Callers update the parsed completion, they get their own copy
+        return {**parsed, 'points': dict(parsed['points'])}
+
+    def paste(self, insert_text: str):
+        """The tree of the document with `insert_text` inserted at the cursor, its end position and the edit."""
+        current_line_suffix = self.doc_context['current_line_suffix']
+        injected_completion_text = self.doc_context.get('injected_completion_text', '')
+
+        matching_suffix_length = get_matching_suffix_length(insert_text, current_line_suffix)
+
+        edit = get_splice_edit(self.line_index, {
+            'start_index': self.document.offset,
+            'length_removed': matching_suffix_length,
+            'insert_text': injected_completion_text + insert_text,
+        })
+
+        try:
+            tree_with_completion = self._parse_splice(
+                self.document.offset, self.document.offset + matching_suffix_length, injected_completion_text + insert_text)
+        except Exception:
+            tree_with_completion = None
+
+        return tree_with_completion, edit['new_end_point'], edit
+
+    def _parse(self, insert_text: str) -> Optional[dict]:
+        position = self.doc_context['position']
+        multiline_trigger_position = self.doc_context.get('multiline_trigger_position', None)
+
+        tree_with_completion, completion_end_position, edit = self.paste(insert_text)
+
+        if not tree_with_completion:
+            return None
+
+        points = {
+            'start': (position.line, position.character),
+            'end': completion_end_position
+        }
+
+        if multiline_trigger_position:
+            points['trigger'] = (multiline_trigger_position.line, multiline_trigger_position.character)
+
+        profile = get_language_profile(self.document.language_id)
+        node_language = profile.node_types if profile else None
+        if node_language:
+            new_point = (edit['insert_text_position'][0], points['start'][1])
+            node_start = tree_with_completion.root_node.descendant_for_point_range(new_point, new_point)
+            if node_start.type == node_language['comment']:
+                points['trigger'] = new_point
+
+            while node_start and node_start.parent and node_start.parent.start_point[0] == new_point[0]:
+                node_start = node_start.parent
+            if node_start.type == node_language['method']:
+                points['trigger'] = new_point
+
+        return {
+            'insert_text': insert_text,
+            'points': points,
+            'tree': tree_with_completion,
+            'parse_error_count': count_parse_errors(tree_with_completion.root_node),
+        }
+
+    def _parse_splice(self, start_index: int, old_end_index: int, insert_text: str):
+        if self._working_tree is None:
+            document = self.document
+            document_tree = tree_cache.get_tree(self.parser, document.uri, document.text, document.version)
+            self._source = bytes(document.text, "utf8")
+            # The cached tree is shared, edits go to a private copy that shares all of its nodes
+            self._working_tree = self.parser.parser.parse(self._source, document_tree)
+
+        start_byte = self.line_index.offset_to_byte(start_index)
+        old_end_byte = self.line_index.offset_to_byte(old_end_index)
+        inserted = bytes(insert_text, "utf8")
+        start_point = self.line_index.offset_to_point(start_index)
+        edit = TreeEdit(
+            start_byte=start_byte,
+            old_end_byte=old_end_byte,
+            new_end_byte=start_byte + len(inserted),
+            start_point=start_point,
+            old_end_point=self.line_index.offset_to_point(old_end_index),
+            new_end_point=advance_point(start_point, inserted, 0, len(inserted)),
+        )
+        source_with_completion = b"".join((self._source[:start_byte], inserted, self._source[old_end_byte:]))
+
+        apply_edit(self._working_tree, edit)
+        try:
+            return self.parser.parser.parse(source_with_completion, self._working_tree)
+        finally:
+            # Back to the document, the nodes around the edit stay marked as changed and are re-parsed next time
+            apply_edit(self._working_tree, edit.inverted())
+
+
+def count_parse_errors(node) -> int:
+    """Number of error and missing nodes under `node`, only descending into subtrees with errors."""
+    if not node.has_error:
+        return 0
+    if node.type == "ERROR" or node.is_missing:
+        return 1
+    return sum(count_parse_errors(child) for child in node.children)
 
 
-    tree_with_completion, completion_end_position, edit = paste_completion({
-        'completion': completion,
-        'document': document,
-        'parser': parser,
-        'doc_context': doc_context
-    })
-
-    if not tree_with_completion:
-        return completion
-
-    points = {
-        'start': (position.line, position.character),
-        'end': completion_end_position
-    }
-
-    if multiline_trigger_position:
-        points['trigger'] = (multiline_trigger_position.line, multiline_trigger_position.character)
-
-    node_language = NODE_LANGUAGE.get(document.language_id)
-    if node_language:
-        new_point = (edit['insert_text_position'][0], points['start'][1])
-        node_start = tree_with_completion.root_node.descendant_for_point_range(new_point, new_point)
-        if node_start.type == node_language['comment']:
-            points['trigger'] = new_point
-
-        while node_start and node_start.parent and node_start.parent.start_point[0] == new_point[0]:
-            node_start = node_start.parent
-        if node_start.type == node_language['method']:
-            points['trigger'] = new_point
-
-
-    return {
-        'insert_text': completion['insert_text'],
-        'points': points,
-        'tree': tree_with_completion,
-    }
-
-
-def paste_completion(params):
-    insert_text = params['completion']['insert_text']
-    parser = params['parser']
-    document = params['document']
-    doc_context = params['doc_context']
-    current_line_suffix = doc_context['current_line_suffix']
-
-    injected_completion_text = doc_context.get('injected_completion_text', '')
-
-    matching_suffix_length = get_matching_suffix_length(insert_text, current_line_suffix)
+def parse_completion(context):
+    parse_context = context.get('parse_context') or CompletionParseContext(context['document'], context['doc_context'])
+    return parse_context.parse(context['completion'])
 
-    text_with_completion, edit = splice_insert_text({
-        'current_text': document.text,
-        'start_index': document.offset,
-        'length_removed': matching_suffix_length,
-        'insert_text': injected_completion_text + insert_text,
-    })
 
-    tree = parser.safe_parse(document.text)
-    tree.edit(start_byte=edit['start_byte'],
-              old_end_byte=edit['old_end_byte'],
-              new_end_byte=edit['new_end_byte'],
-              start_point=edit['start_point'],
-              old_end_point=edit['start_point'],
-              new_end_point=edit['start_point'])
+def splice_insert_text(param):
+    current_text = param['current_text']
+    start_index = param['start_index']
+    old_end_index = start_index + param['length_removed']
 
-    tree_with_completion = parser.safe_parse(text_with_completion, tree)
+    text_with_completion = ''.join((current_text[:start_index], param['insert_text'], current_text[old_end_index:]))
 
-    return tree_with_completion, edit['new_end_point'], edit
+    return text_with_completion, get_splice_edit(get_line_index(current_text), param)
 
 
-def splice_insert_text(param):
-    current_text = param['current_text']
+def get_splice_edit(line_index, param):
+    """The edit of `splice_insert_text`, in characters, without building the new text."""
     insert_text = param['insert_text']
     start_index = param['start_index']
     length_removed = param['length_removed']
@@ -116,13 +179,12 @@ def splice_insert_text(param):
     old_end_index = start_index + length_removed
     new_end_index = start_index + len(insert_text)
 
-    start_position = get_extent(current_text[:start_index])
-    old_end_position = get_extent(current_text[:old_end_index])
-    text_with_completion = current_text[:start_index] + insert_text + current_text[old_end_index:]
-    new_end_position = get_extent(text_with_completion[:new_end_index])
+    start_position = line_index.offset_to_position(start_index)
+    old_end_position = line_index.offset_to_position(old_end_index)
+    new_end_position = advance_position(start_position, insert_text)
     insert_text_position = (start_position[0] + count_leading_newlines(insert_text), start_position[1])
 
-    return text_with_completion, {
+    return {
         'start_byte': start_index,
         'start_point': start_position,
         'old_end_byte': old_end_index,
@@ -134,14 +196,7 @@ def splice_insert_text(param):
 
 
 def get_extent(text: str) -> Tuple[int, int]:
-    row = 0
-    index = 0
-    while index != -1:
-        index = text.find('\n', index)
-        if index != -1:
-            index += 1
-            row += 1
-    return (row, len(text) - index)
+    return advance_position((0, 0), text)
 
 
 def count_leading_newlines(text: str) -> int:
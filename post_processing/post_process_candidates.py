@@ -0,0 +1,39 @@
+from typing import Dict, List
+
+from .parse_completion import CompletionParseContext
+from .parse_and_truncate_completion import parse_and_truncate_completion
+from .process_inline_completion import process_completion
+
+
+def post_process_candidates(raw_completions: List[str], params, multiline: bool) -> List[str]:
+    """
+    Post-process the sampled candidates of one request, returns their insert texts in order.
+
+    The doc context of `params` and one parse context, with its copy of the document tree,
+    are shared by every candidate, so the document is analyzed once however many candidates
+    there are. Identical candidates are only processed once. Candidates that cannot be
+    parsed are returned as they are.
+    """
+    document = params['document']
+    doc_context = params['doc_context']
+
+    context = {
+        'document': document,
+        'doc_context': doc_context,
+        'parse_context': CompletionParseContext(document, doc_context),
+    }
+
+    processed: Dict[str, str] = {}
+    for raw_completion in raw_completions:
+        if raw_completion in processed:
+            continue
+
+        completion = parse_and_truncate_completion(raw_completion, context, multiline)
+
+        if completion is None:
+            processed[raw_completion] = raw_completion
+            continue
+
+        processed[raw_completion] = process_completion(completion, context, multiline)['insert_text']
+
+    return [processed[raw_completion] for raw_completion in raw_completions]
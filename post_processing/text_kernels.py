@@ -0,0 +1,113 @@
+import re
+from typing import Iterator, Optional, Tuple
+
+BRACKET_PAIR = {
+    '(': ')',
+    '[': ']',
+    '{': '}',
+    '<': '>'
+}
+OPENING_BY_CLOSING_BRACKET = {closing: opening for opening, closing in BRACKET_PAIR.items()}
+BRACKET_REGEX = re.compile('[' + re.escape(''.join(BRACKET_PAIR) + ''.join(OPENING_BY_CLOSING_BRACKET)) + ']')
+# Characters looked at per step when scanning back over trailing whitespace
+TRAILING_WHITESPACE_CHUNK = 256
+
+
+def get_overlap_length(left: str, right: str) -> int:
+    """
+    Length of the longest suffix of `left` that is also a prefix of `right`.
+
+    Candidates are tried from the longest down and the first match is returned. Only the
+    offsets of the tail of `left` holding the first character of `right` can start an overlap,
+    `str.find` jumps between them and each check is one slice comparison at memcmp speed.
+
+    This is not linear: with n = min(len(left), len(right)), a tail that holds the first
+    character of `right` at every offset, like a run of spaces, costs O(n²) compared
+    characters. Code holds that character at few offsets, so few slices are compared.
+    """
+    if not left or not right:
+        return 0
+
+    first_char = right[0]
+    start = left.find(first_char, max(0, len(left) - len(right)))
+    while start != -1:
+        length = len(left) - start
+        if left.endswith(right[:length]):
+            return length
+        start = left.find(first_char, start + 1)
+    return 0
+
+
+def get_missing_closing_brackets(text: str) -> str:
+    """Closing brackets for the brackets of `text` left open, innermost first."""
+    opening_stack = []
+    # Only bracket characters matter, the regex skips everything else in C
+    for char in BRACKET_REGEX.findall(text):
+        opening = OPENING_BY_CLOSING_BRACKET.get(char)
+        if opening is not None:
+            if opening_stack and opening_stack[-1] == opening:
+                opening_stack.pop()
+        else:
+            opening_stack.append(char)
+    return ''.join(BRACKET_PAIR[opening] for opening in reversed(opening_stack))
+
+
+def iter_lines_reversed(text: str, end: Optional[int] = None) -> Iterator[Tuple[int, int]]:
+    """(start, end) offsets of the '\\n' separated lines of `text[:end]`, last line first, without splitting it."""
+    end = len(text) if end is None else end
+    while True:
+        start = text.rfind('\n', 0, end) + 1
+        yield start, end
+        if start == 0:
+            return
+        end = start - 1
+
+
+def get_first_non_empty_line_from(text: str, start: int) -> str:
+    """First line of `text[start:]` that is not only whitespace, scanning only up to it."""
+    while True:
+        end = text.find('\n', start)
+        line = text[start:] if end == -1 else text[start:end]
+        if line.strip():
+            return line
+        if end == -1:
+            return ""
+        start = end + 1
+
+
+def get_trimmed_end(text: str) -> int:
+    """Length of `text.rstrip()`, scanning back only over the trailing whitespace."""
+    end = len(text)
+    while end:
+        start = max(end - TRAILING_WHITESPACE_CHUNK, 0)
+        trimmed_length = len(text[start:end].rstrip())
+        if trimmed_length:
+            return start + trimmed_length
+        end = start
+    return 0
+
+
+def get_prev_non_empty_line_before(text: str, end: int) -> str:
+    """
+    Last line of `text[:end].splitlines()` that is not only whitespace, scanning back only to it.
+
+    Lines are split on '\\n' first and each one with str.splitlines, which gives the same
+    non-empty lines as splitting the whole text.
+    """
+    for line_start, line_end in iter_lines_reversed(text, end):
+        for line in reversed(text[line_start:line_end].splitlines()):
+            if line.strip():
+                return line
+    return ""
+
+
+def get_next_non_empty_line_from(text: str, start: int) -> str:
+    """First line of `text[start:].splitlines()` that is not only whitespace, scanning only up to it."""
+    while True:
+        end = text.find('\n', start)
+        for line in (text[start:] if end == -1 else text[start:end]).splitlines():
+            if line.strip():
+                return line
+        if end == -1:
+            return ""
+        start = end + 1
@@ -1,21 +1,10 @@
 from .parse_completion import parse_completion
-from .utils import BRACKET_PAIR, check_bracket_in_new_line
+from .utils import check_bracket_in_new_line
+from .text_kernels import get_missing_closing_brackets, get_overlap_length
 
 
 def insert_missing_brackets(text):
-    opening_stack = []
-    bracket_pairs = list(BRACKET_PAIR.items())
-
-    for char in text:
-        bracket_pair = next((bp for bp in bracket_pairs if bp[1] == char), None)
-
-        if bracket_pair:
-            if opening_stack and opening_stack[-1] == bracket_pair[0]:
-                opening_stack.pop()
-        elif char in BRACKET_PAIR:
-            opening_stack.append(char)
-
-    return text + ''.join(BRACKET_PAIR[open_bracket] for open_bracket in reversed(opening_stack))
+    return text + get_missing_closing_brackets(text)
 
 
 # Assuming these placeholder definitions for handling a parse tree and managing contexts
@@ -23,6 +12,7 @@ def truncate_parsed_completion(context):
     completion = context['completion']
     document = context['document']
     doc_context = context['doc_context']
+    parse_context = context.get('parse_context')
     language_id = document.language_id
 
     if not (completion.get('tree') and completion.get('points')):
@@ -40,6 +30,7 @@ def truncate_parsed_completion(context):
             'completion': {'insert_text': insert_text_with_missing_brackets},
             'document': document,
             'doc_context': doc_context,
+            'parse_context': parse_context,
         })
         if fixed_completion.get('tree'):
             fixed_completion = updated_completion
@@ -66,6 +57,7 @@ def truncate_parsed_completion(context):
         'completion': result,
         'document': document,
         'doc_context': doc_context,
+        'parse_context': parse_context,
     })
     error_count = check_final_completion.get('parse_error_count', 0)
     result['error_count'] = error_count
@@ -86,16 +78,9 @@ def find_last_ancestor_on_the_same_row(root, start_point, insert_text,language_i
 
 
 def find_largest_suffix_prefix_overlap(left: str, right: str) -> str:
-    overlap = ''
-
-    for i in range(1, min(len(left), len(right)) + 1):
-        suffix = left[-i:]
-        prefix = right[:i]
-
-        if suffix == prefix:
-            overlap = suffix
+    overlap_length = get_overlap_length(left, right)
 
-    if len(overlap) == 0:
+    if overlap_length == 0:
         return None
 
-    return overlap
\ No newline at end of file
+    return right[:overlap_length]
@@ -1,23 +1,14 @@
 import re
 
 from schema.common import Position
-from programing_language import get_language_config, ProgrammingLanguage
-BRACKET_PAIR = {
-    '(': ')',
-    '[': ']',
-    '{': '}',
-    '<': '>'
-}
+from programing_language import get_language_profile
+from .text_kernels import BRACKET_PAIR, iter_lines_reversed, get_first_non_empty_line_from, \
+    get_prev_non_empty_line_before, get_next_non_empty_line_from
 CLOSING_BRACKET = ['}', ']', ')']
 INDENTATION_REGEX = re.compile(r'^[\t ]*')
 OPENING_BRACKET_REGEX = re.compile(r'([([{])$')
 FUNCTION_OR_METHOD_INVOCATION_REGEX = re.compile(r'\b[^()]+\((.*)\)$')
 FUNCTION_KEYWORDS = re.compile(r'^(function|def|fn|fun)')
-LANGUAGE_BRACKET_IN_NEW_LINE = [
-    ProgrammingLanguage.C,
-    ProgrammingLanguage.CPP,
-    ProgrammingLanguage.C_SHARP
-]
 
 
 
@@ -32,25 +23,18 @@ def indentation(line, tab_size=None):
 
 
 def get_last_line(text: str) -> str:
-    last_lf = text.rfind("\n")
-    last_crlf = text.rfind("\r\n")
-
-    # There are no line breaks
-    if last_lf == -1 and last_crlf == -1:
-        return text
-
-    return text[(last_crlf + 2 if last_crlf >= 0 else last_lf + 1):]
+    # The '\r' of a '\r\n' line break comes before the '\n', so the last line starts after the last '\n' either way
+    return text[text.rfind("\n") + 1:]
 
 
 def get_first_line(text: str):
     first_lf = text.find('\n')
-    first_crlf = text.find('\r\n')
     # There are no line breaks
-    if first_lf == -1 and first_crlf == -1:
+    if first_lf == -1:
         return text
-    # Use the earlier line break index if both are found, otherwise use whichever is found
-    if first_crlf >= 0:
-        return text[:first_crlf]
+    # Drop the '\r' of a '\r\n' line break
+    if first_lf > 0 and text[first_lf - 1] == '\r':
+        return text[:first_lf - 1]
     return text[:first_lf]
 
 
@@ -70,22 +54,21 @@ def get_until_non_empty_line_dynamic(text: str, language_id):
     for idx, line in enumerate(lines):
         result += line + '\n'
         if line.strip():
-            if language_id in LANGUAGE_BRACKET_IN_NEW_LINE:
-                language_config = get_language_config(language_id)
-                if idx + 1 < len(lines) and language_config.get('block_start') == lines[idx + 1].strip():
+            profile = get_language_profile(language_id)
+            if profile and profile.bracket_in_new_line:
+                if idx + 1 < len(lines) and profile.block_start == lines[idx + 1].strip():
                     result += lines[idx + 1] + '\n'
             break
     return result.rstrip('\n')
 
 
 def check_bracket_in_new_line(text: str, language_id):
-    text = get_until_non_empty_line_dynamic(text, language_id)
-    if language_id not in LANGUAGE_BRACKET_IN_NEW_LINE:
+    profile = get_language_profile(language_id)
+    if not (profile and profile.bracket_in_new_line):
         return False
 
-    lines = text.splitlines()
-    language_config = get_language_config(language_id)
-    if lines[-1].strip() == language_config.get('block_start'):
+    lines = get_until_non_empty_line_dynamic(text, language_id).splitlines()
+    if lines[-1].strip() == profile.block_start:
         return True
 
     return False
@@ -117,50 +100,28 @@ def should_include_closing_line_based_on_brackets(prefix_indentation_with_first_
 
 def get_prev_non_empty_line(prefix: str) -> str:
     prev_lf = prefix.rfind("\n")
-    prev_crlf = prefix.rfind("\r\n")
 
     # There is no previous line
-    if prev_lf == -1 and prev_crlf == -1:
+    if prev_lf == -1:
         return ""
 
-    lines = prefix[:prev_crlf if prev_crlf >= 0 else prev_lf].splitlines()
-
-    for line in reversed(lines):
-        if line.strip():
-            return line
-    return ""
+    return get_prev_non_empty_line_before(prefix, prev_lf)
 
 
 def get_next_non_empty_line(suffix):
     next_lf = suffix.find('\n')
-    next_crlf = suffix.find('\r\n')
 
     # There is no next line
-    if next_lf == -1 and next_crlf == -1:
+    if next_lf == -1:
         return ''
 
-    # Determine which line ending to use, prioritize CRLF if found
-    next_line_index = next_crlf + 2 if next_crlf != -1 else next_lf + 1
-
-    # Get all subsequent lines
-    subsequent_lines = suffix[next_line_index:].splitlines()
-
-    # Find the first non-empty line
-    for line in subsequent_lines:
-        if line.strip():
-            return line
-
-    return ''
+    return get_next_non_empty_line_from(suffix, next_lf + 1)
 
 
 def get_first_non_empty_line(suffix: str):
-    next_line_suffix = suffix[suffix.find('\n'):]
-
-    for line in next_line_suffix.split('\n'):
-        if line.strip():
-            return line
-
-    return ""
+    # Without a line break the search starts at the last character, like slicing from -1
+    next_line_index = suffix.find('\n')
+    return get_first_non_empty_line_from(suffix, next_line_index if next_line_index != -1 else max(len(suffix) - 1, 0))
 
 
 def remove_trailing_whitespace(text: str):
@@ -168,7 +129,7 @@ def remove_trailing_whitespace(text: str):
 
 
 def trim_until_suffix(insertion: str, prefix: str, suffix: str, language_id: str):
-    config = get_language_config(language_id)
+    profile = get_language_profile(language_id)
 
     insertion = insertion.rstrip()
 
@@ -183,36 +144,37 @@ def trim_until_suffix(insertion: str, prefix: str, suffix: str, language_id: str
     start_indent = indentation(prefix_indentation_with_first_completion_line)
     has_empty_completion_line = prefix_indentation_with_first_completion_line.strip() == ''
 
-    insertion_lines = insertion.split('\n')
-    cut_off_index = len(insertion_lines)
+    is_single_line = '\n' not in insertion
+    cut_off = len(insertion)
 
-    for i in range(len(insertion_lines) - 1, -1, -1):
-        line = insertion_lines[i]
+    # Lines are visited from the last one without splitting the insertion, the cut is an offset
+    for line_start, line_end in iter_lines_reversed(insertion):
+        line = insertion[line_start:line_end]
 
         if len(line) == 0:
             continue
 
-        if i == 0:
+        if line_start == 0:
             line = prefix_indentation_with_first_completion_line + line
 
         line_indentation = indentation(line)
         is_same_indentation = line_indentation <= suffix_indent
 
         if (
-                has_empty_completion_line and config and
-                config.get('block_end') and
-                line.strip().startswith(config['block_end']) and
+                has_empty_completion_line and profile and
+                profile.block_end and
+                line.strip().startswith(profile.block_end) and
                 start_indent == line_indentation and
-                len(insertion_lines) == 1
+                is_single_line
         ):
-            cut_off_index = i
+            cut_off = max(line_start - 1, 0)
             break
 
         if is_same_indentation and first_non_empty_suffix_line.startswith(line):
-            cut_off_index = i
+            cut_off = max(line_start - 1, 0)
             break
 
-    return '\n'.join(insertion_lines[:cut_off_index])
+    return insertion[:cut_off]
 
 
 def collapse_duplicative_whitespace(prefix: str, completion: str) -> str:
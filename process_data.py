@@ -1,7 +1,12 @@
 import json
 from datetime import datetime
-from typing import Tuple, Union, List
+from functools import partial
+from itertools import accumulate
+from typing import Dict, Optional, Tuple, Union, List
 import datasets
+from file_system.chunked_map import map_chunks_in_order
+from file_system.text_cache import TextKeyedCache
+from file_system.virtual_file_system import vfs
 
 
 def get_all_repositories(folder_path, output_file):
@@ -16,36 +21,68 @@ def get_all_repositories(folder_path, output_file):
 
     print(f"Folder names written to {output_file}")
 
-def get_file_line_numbers(base_path: str, file_path: str, code_snippet: str) -> Tuple[int, int, int]:
+MAX_CACHED_SOURCE_FILE_INDEXES = 64
+DEFAULT_CHUNK_SIZE = 64
+
+
+class SourceFileIndex:
+    """
+    Lines of a source file as `str.splitlines(True)` splits them, located by their stripped text.
+
+    Holds the offset each line starts at and the number of the first line with each stripped
+    text, so finding where a snippet starts is one dictionary lookup instead of a scan.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        lines = text.splitlines(True)
+        self.line_offsets = [0, *accumulate(len(line) for line in lines)]
+        self.first_line_numbers: Dict[str, int] = {}
+        for line_number, line in enumerate(lines):
+            self.first_line_numbers.setdefault(line.strip(), line_number)
+
+    @property
+    def line_count(self) -> int:
+        return len(self.line_offsets) - 1
+
+    def find_line(self, stripped_line: str) -> int:
+        """Number of the first line whose stripped text is `stripped_line`, -1 if there is none."""
+        return self.first_line_numbers.get(stripped_line, -1)
+
+    def get_line(self, line_number: int) -> str:
+        return self.text[self.line_offsets[line_number]:self.line_offsets[line_number + 1]]
+
+
+# Source file indexes shared by every record converted in this process
+source_file_index_cache: TextKeyedCache[SourceFileIndex] = TextKeyedCache(SourceFileIndex, MAX_CACHED_SOURCE_FILE_INDEXES)
+
+
+def get_source_file_index(base_path: str, file_path: str) -> SourceFileIndex:
+    # Construct full path from repository root
+    return source_file_index_cache.get(vfs.read_text(f"{base_path}/{file_path}"))
+
+
+def get_file_line_numbers(base_path: str, file_path: str, code_snippet: str,
+                          file_index: Optional[SourceFileIndex] = None) -> Tuple[int, int, int]:
     """
     Get the start and end line numbers and character offset of the code snippet in the file.
     Returns (context_start_lineno, line_no, char_offset)
     where char_offset is the position at the start of the matching line.
+    `file_index` is the index of the file when the caller already has it.
     """
     try:
-        # Construct full path from repository root
-        full_path = f"{base_path}/{file_path}"
-        with open(full_path, 'r', encoding='utf-8') as f:
-            file_content = f.read()
-            
-        # Split both file and snippet into lines
-        file_lines = file_content.splitlines()
+        file_index = file_index or get_source_file_index(base_path, file_path)
+
         snippet_lines = code_snippet.splitlines()
-        
+
         if not snippet_lines:
             return 0, 0, 0
-            
-        # Get first line of snippet
-        first_line = snippet_lines[0].strip()
-        last_line = snippet_lines[-1]
-        
-        # Find the first line in file content
-        for i, file_line in enumerate(file_lines):
-            if file_line.strip() == first_line:
-
-                # Return 0 as the character offset for the start of the line
-                return i, i + len(snippet_lines) - 1, len(last_line)
-                
+
+        # Find the first line of the snippet in the file content
+        i = file_index.find_line(snippet_lines[0].strip())
+        if i != -1:
+            return i, i + len(snippet_lines) - 1, len(snippet_lines[-1])
+
         # If we can't find the match, return 0, 0, 0
         print(f"Could not find match for {file_path}")
         return 0, 0, 0
@@ -53,83 +90,104 @@ def get_file_line_numbers(base_path: str, file_path: str, code_snippet: str) ->
         print(f"Error processing {file_path}: {str(e)}")
         return 0, 0, 0
 
-def get_prefix_suffix(base_path: str, file_path: str, code_snippet: str, ground_truth: str) -> Tuple[str, str]:
+def get_prefix_suffix(base_path: str, file_path: str, code_snippet: str, ground_truth: str,
+                      file_index: Optional[SourceFileIndex] = None) -> Tuple[str, str]:
     """
     Get the prefix and suffix surrounding the code snippet in the file.
     Returns (prefix, suffix) where prefix is the content before the snippet
     and suffix is the content after the snippet.
+    `file_index` is the index of the file when the caller already has it.
     """
     try:
-        # Construct full path from repository root
-        full_path = f"{base_path}/{file_path}"
-        with open(full_path, 'r', encoding='utf-8') as f:
-            file_content = f.read()
-        
-        # Split both file and snippet into lines
-        file_lines = file_content.splitlines(True)  # Keep line endings
+        file_index = file_index or get_source_file_index(base_path, file_path)
+
         snippet_lines = code_snippet.splitlines()
-        
+
         if not snippet_lines:
             print(f"Empty snippet for {file_path}")
             return "", ""
-            
-        # Get first line of snippet
-        first_line = snippet_lines[0].strip()
-        
-        # Find the first line in file content
-        found = False
-        prefix_lines = []
-        suffix_lines = []
-        
-        for i, file_line in enumerate(file_lines):
-            if not found and file_line.strip() == first_line:
-                prefix_lines = file_lines[:i + len(snippet_lines) ]
-                #remove the ground truth from the last line of the prefix
-                prefix_lines[-1] = prefix_lines[-1].replace(ground_truth, "")
-                suffix_end = i + len(snippet_lines) 
-                suffix_lines = file_lines[suffix_end:] if suffix_end < len(file_lines) else []
-                break
-                
-        if True:
-            prefix = ''.join(prefix_lines)
-            suffix = ''.join(suffix_lines)
-            return prefix, suffix
-        else:
-            print(f"Could not find snippet in {file_path}")
+
+        # Find the first line of the snippet in the file content
+        i = file_index.find_line(snippet_lines[0].strip())
+        if i == -1:
             return "", ""
-        
+
+        # The prefix ends with the last line of the snippet, the suffix is every line after it
+        suffix_end = min(i + len(snippet_lines), file_index.line_count)
+        last_line_start = file_index.line_offsets[suffix_end - 1]
+        # Remove the ground truth from the last line of the prefix
+        prefix = file_index.text[:last_line_start] + file_index.get_line(suffix_end - 1).replace(ground_truth, "")
+        suffix = file_index.text[file_index.line_offsets[suffix_end]:]
+        return prefix, suffix
+
     except Exception as e:
         print(f"Error processing {file_path}: {str(e)}")
         return "", ""
 
 
-def convert_dataset_prefix_and_suffix(base_path: str, input_file, output_file):
-    with open(input_file, "r") as infile, open(output_file, "w") as outfile:
+def convert_record(base_path: str, idx: int, line: str) -> str:
+    """Convert one JSONL record, returns the output line without its newline."""
+    data = json.loads(line)
+
+    try:
+        # Both lookups share one read of the file
+        file_index = get_source_file_index(base_path, data["fpath"])
+    except Exception:
+        # Each lookup reports the error itself
+        file_index = None
+
+    prefix, suffix = get_prefix_suffix(base_path, data["fpath"], data["input"], data["gt"], file_index)
+    context_start, completion_line, char_offset = get_file_line_numbers(
+        base_path,
+        data["fpath"],
+        data["input"],
+        file_index
+    )
+
+    list_path = data["fpath"].split("/")
+
+    new_data = {
+        **data,
+        "prefix": prefix,
+        "suffix": suffix,
+        "metadata": {
+            "task_id": f'{list_path[0]}/{idx}',
+            "fpath_tuple": list_path,
+            "context_start_lineno": context_start,
+            "line_no": completion_line,
+            "context_start_characterno": char_offset
+        }
+    }
+    return json.dumps(new_data)
+
+
+def convert_chunk(base_path: str, records: List[Tuple[int, str]]) -> List[str]:
+    return [convert_record(base_path, idx, line) for idx, line in records]
+
+
+def read_record_chunks(input_file, chunk_size):
+    """Yield the (index, line) records of a JSONL file in lists of `chunk_size`."""
+    chunk = []
+    with open(input_file, "r") as infile:
         for idx, line in enumerate(infile):
-            data = json.loads(line)
-
-            prefix, suffix = get_prefix_suffix(base_path, data["fpath"], data["input"], data["gt"])
-            context_start, completion_line, char_offset = get_file_line_numbers(
-                base_path,
-                data["fpath"],
-                data["input"]
-            )
-
-            list_path = data["fpath"].split("/")
-
-            new_data = {
-                **data,
-                "prefix": prefix,
-                "suffix": suffix,
-                "metadata": {
-                    "task_id": f'{list_path[0]}/{idx}',
-                    "fpath_tuple": list_path,
-                    "context_start_lineno": context_start,
-                    "line_no": completion_line,
-                    "context_start_characterno": char_offset
-                }
-            }
-            outfile.write(json.dumps(new_data) + "\n")
+            chunk.append((idx, line))
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def convert_dataset_prefix_and_suffix(base_path: str, input_file, output_file, workers=1, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Stream the records of `input_file` into `output_file` with their prefix, suffix and metadata, in input order.
+
+    Records are converted in chunks, over `workers` processes when there is more than one.
+    Consecutive records of the same file share one index of it.
+    """
+    with open(output_file, "w") as outfile:
+        for output_lines in map_chunks_in_order(partial(convert_chunk, base_path), read_record_chunks(input_file, chunk_size), workers):
+            outfile.write(''.join(output_line + "\n" for output_line in output_lines))
 
 
 def load_dataset(task: Union[str, List[str]] = ["block", "control", "api"]):
@@ -163,6 +221,16 @@ def load_dataset(task: Union[str, List[str]] = ["block", "control", "api"]):
     else:
         raise TypeError("Task must be either a string or a list of strings")
 
+def iter_dataset_columns(task: List[str], columns: List[str]):
+    """
+    Yield the `columns` of the samples of every task, in the order of `load_dataset(task)`.
+
+    Only the requested columns are read, and the unit tests are not decoded.
+    """
+    for t in task:
+        ds = datasets.load_dataset("gonglinyuan/safim", t, split="test").select_columns(columns)
+        yield from ds
+
 if __name__ == '__main__':
     # get_all_repositories()
     base_path = "/Users/datht22/Desktop/codevista/jaccard_warp/ReccEval/Source_Code"
@@ -1,4 +1,7 @@
 import re
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import FrozenSet, Mapping, Optional, Pattern
 
 
 class ProgrammingLanguage:
@@ -111,29 +114,117 @@ NODE_LANGUAGE = {
 }
 
 
-def get_language_config(language_id):
-    common_languages = [
-        ProgrammingLanguage.ASTRO,
-        ProgrammingLanguage.C,
-        ProgrammingLanguage.CPP,
-        ProgrammingLanguage.C_SHARP,
-        ProgrammingLanguage.DART,
-        ProgrammingLanguage.GO,
-        ProgrammingLanguage.JAVA,
-        ProgrammingLanguage.JAVASCRIPT,
-        ProgrammingLanguage.JAVASCRIPTREACT,
-        ProgrammingLanguage.KOTLIN,
-        ProgrammingLanguage.PHP,
-        ProgrammingLanguage.RUST,
-        ProgrammingLanguage.SVELTE,
-        ProgrammingLanguage.TYPESCRIPT,
-        ProgrammingLanguage.TYPESCRIPTREACT,
-        ProgrammingLanguage.VUE,
-        ProgrammingLanguage.PYTHON,
-        ProgrammingLanguage.ELIXIR
-    ]
-
-    if not (language_id in common_languages):
+LANGUAGES_WITH_BLOCK_CONFIG = [
+    ProgrammingLanguage.ASTRO,
+    ProgrammingLanguage.C,
+    ProgrammingLanguage.CPP,
+    ProgrammingLanguage.C_SHARP,
+    ProgrammingLanguage.DART,
+    ProgrammingLanguage.GO,
+    ProgrammingLanguage.JAVA,
+    ProgrammingLanguage.JAVASCRIPT,
+    ProgrammingLanguage.JAVASCRIPTREACT,
+    ProgrammingLanguage.KOTLIN,
+    ProgrammingLanguage.PHP,
+    ProgrammingLanguage.RUST,
+    ProgrammingLanguage.SVELTE,
+    ProgrammingLanguage.TYPESCRIPT,
+    ProgrammingLanguage.TYPESCRIPTREACT,
+    ProgrammingLanguage.VUE,
+    ProgrammingLanguage.PYTHON,
+    ProgrammingLanguage.ELIXIR
+]
+
+LANGUAGES_WITH_MULTILINE_SUPPORT = [
+    ProgrammingLanguage.ASTRO,
+    ProgrammingLanguage.C,
+    ProgrammingLanguage.CPP,
+    ProgrammingLanguage.C_SHARP,
+    ProgrammingLanguage.CSS,
+    ProgrammingLanguage.DART,
+    ProgrammingLanguage.ELIXIR,
+    ProgrammingLanguage.GO,
+    ProgrammingLanguage.HTML,
+    ProgrammingLanguage.JAVA,
+    ProgrammingLanguage.JAVASCRIPT,
+    ProgrammingLanguage.JAVASCRIPTREACT,
+    ProgrammingLanguage.KOTLIN,
+    ProgrammingLanguage.PHP,
+    ProgrammingLanguage.PYTHON,
+    ProgrammingLanguage.RUST,
+    ProgrammingLanguage.SVELTE,
+    ProgrammingLanguage.TYPESCRIPT,
+    ProgrammingLanguage.TYPESCRIPTREACT,
+    ProgrammingLanguage.VUE
+]
+
+# Languages whose code style may put the opening bracket of a block on its own line
+LANGUAGE_BRACKET_IN_NEW_LINE = [
+    ProgrammingLanguage.C,
+    ProgrammingLanguage.CPP,
+    ProgrammingLanguage.C_SHARP
+]
+
+# Languages with a function call query file of their own, the others use the python query
+LANGUAGES_WITH_FUNCTION_CALL_QUERY = [
+    ProgrammingLanguage.C_SHARP,
+    ProgrammingLanguage.CPP,
+    ProgrammingLanguage.JAVA,
+    ProgrammingLanguage.PYTHON
+]
+
+# Keywords of a language, and for go a few common names, that symbol lookups do not follow
+LANGUAGE_KEYWORDS = {
+    ProgrammingLanguage.GO: frozenset({
+        "break", "case", "chan", "const", "continue", "default", "defer", "else", "fallthrough", "for",
+        "func", "go", "goto", "if", "import", "interface", "map", "package", "range", "return", "select",
+        "struct", "switch", "type", "var",
+        # Common variables, types we don't need to follow
+        "Context", "ctx", "err", "error", "ok"
+    }),
+    ProgrammingLanguage.TYPESCRIPT: frozenset({
+        "any", "as", "async", "boolean", "break", "case", "catch", "class", "const", "constructor", "continue",
+        "debugger", "declare", "default", "delete", "do", "else", "enum", "export", "extends", "false", "finally",
+        "for", "from", "function", "if", "implements", "import", "in", "instanceof", "interface", "let", "module",
+        "new", "null", "number", "of", "package", "private", "protected", "public", "require", "return", "static",
+        "string", "super", "switch", "symbol", "this", "throw", "true", "try", "type", "typeof", "var", "void",
+        "while", "with", "yield"
+    }),
+    ProgrammingLanguage.PYTHON: frozenset({
+        "and", "as", "assert", "async", "await", "break", "class", "continue", "def", "del", "elif", "else",
+        "except", "False", "finally", "for", "from", "global", "if", "import", "in", "is", "lambda", "None",
+        "nonlocal", "not", "or", "pass", "raise", "return", "True", "try", "while", "with", "yield"
+    }),
+}
+LANGUAGE_KEYWORDS[ProgrammingLanguage.TYPESCRIPTREACT] = LANGUAGE_KEYWORDS[ProgrammingLanguage.TYPESCRIPT]
+
+
+@dataclass(frozen=True)
+class LanguageProfile:
+    """
+    Everything post-processing and analysis look up about a language, computed once.
+
+    `config` is the block configuration of the language, None for languages without one;
+    its entries are also fields of the profile.
+    """
+    language_id: str
+    config: Optional[Mapping[str, object]]
+    block_start: Optional[str]
+    block_else_test: Optional[Pattern]
+    block_end: Optional[str]
+    comment_start: Optional[str]
+    # Node types of comments, methods and functions, as in NODE_LANGUAGE
+    node_types: Optional[Mapping[str, str]]
+    multiline_support: bool
+    bracket_in_new_line: bool
+    # Language whose function call query applies to this language
+    query_language: str
+    # Keywords symbol lookups do not follow, empty for languages without a keyword list
+    keywords: FrozenSet[str]
+
+
+def build_language_config(language_id):
+    if language_id not in LANGUAGES_WITH_BLOCK_CONFIG:
         return None
 
     if language_id == ProgrammingLanguage.PYTHON:
@@ -158,3 +249,31 @@ def get_language_config(language_id):
         'block_end': '}',
         'comment_start': '// '
     }
+
+
+def build_language_profile(language_id) -> LanguageProfile:
+    config = build_language_config(language_id)
+    node_types = NODE_LANGUAGE.get(language_id)
+    return LanguageProfile(
+        language_id=language_id,
+        config=MappingProxyType(config) if config else None,
+        block_start=config['block_start'] if config else None,
+        block_else_test=config['block_else_test'] if config else None,
+        block_end=config['block_end'] if config else None,
+        comment_start=config['comment_start'] if config else None,
+        node_types=MappingProxyType(node_types) if node_types else None,
+        multiline_support=language_id in LANGUAGES_WITH_MULTILINE_SUPPORT,
+        bracket_in_new_line=language_id in LANGUAGE_BRACKET_IN_NEW_LINE,
+        query_language=language_id if language_id in LANGUAGES_WITH_FUNCTION_CALL_QUERY else ProgrammingLanguage.PYTHON,
+        keywords=LANGUAGE_KEYWORDS.get(language_id, frozenset()),
+    )
+
+
+LANGUAGE_PROFILES = {
+    language_id: build_language_profile(language_id)
+    for name, language_id in vars(ProgrammingLanguage).items() if not name.startswith('_')
+}
+
+
+def get_language_profile(language_id) -> Optional[LanguageProfile]:
+    return LANGUAGE_PROFILES.get(language_id)
@@ -0,0 +1,264 @@
+import hashlib
+import json
+import os
+import re
+from bisect import bisect_left
+from typing import List, Optional, Set
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+RECORDS_FILE = "records.arrow"
+CONTENTS_FILE = "contents.arrow"
+# Contents in the order they are first used, sorted by id into `CONTENTS_FILE` when the writer is closed
+UNSORTED_CONTENTS_FILE = "contents.unsorted.arrow"
+# Rows written at once to each file
+BATCH_SIZE = 256
+# Stands in for the parts of a prompt while its template is rendered, private use characters do not occur in code
+PART_MARKER = "\ue000{}\ue001"
+PART_MARKER_REGEX = re.compile("\ue000(\\d+)\ue001")
+
+CONTENTS_SCHEMA = pa.schema([
+    ("id", pa.string()),
+    ("content", pa.large_string()),
+])
+CONTEXT_TYPE = pa.struct([
+    # The context as serialized by `to_dict`, with a null content
+    ("fields", pa.string()),
+    ("content_id", pa.string()),
+    ("has_content_field", pa.bool_()),
+])
+RECORDS_SCHEMA = pa.schema([
+    # The input record with a null prefix and suffix, or the error record of a failed input
+    ("record", pa.string()),
+    ("prefix_id", pa.string()),
+    ("suffix_id", pa.string()),
+    # The prompt is its literal segments with a part between each two of them
+    ("prompt_segments", pa.list_(pa.string())),
+    ("prompt_part_ids", pa.list_(pa.string())),
+    ("contexts", pa.list_(CONTEXT_TYPE)),
+])
+
+
+def get_content_id(content: str) -> str:
+    return hashlib.blake2b(content.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def get_prompt_contexts(contexts) -> list:
+    """The contexts that go into a prompt, a context without content adds nothing and is left out."""
+    return [context for context in contexts if context.content is not None]
+
+
+def build_jsonl_record(data, contexts, prompt_extractor) -> dict:
+    """The record `prompt_builder` writes to JSONL for `data` and its retrieved `contexts`."""
+    intro = ''
+    context_dict = []
+
+    for context in get_prompt_contexts(contexts):
+        context_dict.append(context.to_dict())
+        snippet = prompt_extractor.file_snippet_to_prompt_string({'uri': context.uri, 'content': context.content})
+        intro += f'{snippet}\n'
+
+    prompt = prompt_extractor.get_infilling_prompt(data["metadata"]["fpath_tuple"][-1], intro, data["prefix"], data["suffix"])
+
+    return {**data, 'prompt': prompt, 'contexts': context_dict}
+
+
+class PromptDatasetWriter:
+    """
+    Writes prompt builder results as a directory of two Arrow files.
+
+    Every text a prompt is made of, the prefix, the suffix and each context snippet, is stored
+    once in `contents.arrow` under the hash of its content, sorted by that id. Records in
+    `records.arrow` refer to those texts by id, and store their prompt as the literal segments
+    of the prompt template with the ids of the parts between them.
+    """
+
+    def __init__(self, directory: str, prompt_extractor):
+        self.directory = directory
+        self.prompt_extractor = prompt_extractor
+        os.makedirs(directory, exist_ok=True)
+        self._contents_sink = pa.OSFile(os.path.join(directory, UNSORTED_CONTENTS_FILE), "wb")
+        self._contents_writer = pa.ipc.new_file(self._contents_sink, CONTENTS_SCHEMA)
+        self._records_sink = pa.OSFile(os.path.join(directory, RECORDS_FILE), "wb")
+        self._records_writer = pa.ipc.new_file(self._records_sink, RECORDS_SCHEMA)
+        self._content_ids: Set[str] = set()
+        self._contents: List[dict] = []
+        self._records: List[dict] = []
+        self.count = 0
+
+    def add_content(self, content: str) -> str:
+        content_id = get_content_id(content)
+        if content_id not in self._content_ids:
+            self._content_ids.add(content_id)
+            self._contents.append({"id": content_id, "content": content})
+            if len(self._contents) == BATCH_SIZE:
+                self._flush_contents()
+        return content_id
+
+    def write(self, data, contexts):
+        """Write the record of `data` with its retrieved `contexts`, read back as `build_jsonl_record` builds it."""
+        filename = data["metadata"]["fpath_tuple"][-1]
+        contexts = get_prompt_contexts(contexts)
+        part_ids = [self.add_content(data["prefix"]), self.add_content(data["suffix"])]
+
+        context_rows = []
+        intro = ''
+        template_intro = ''
+        for context in contexts:
+            fields = context.to_dict()
+            has_content_field = 'content' in fields
+            if has_content_field:
+                # Keeps the position of the field, readers put the content back in it
+                fields['content'] = None
+            content_id = self.add_content(context.content)
+            context_rows.append({"fields": json.dumps(fields), "content_id": content_id, "has_content_field": has_content_field})
+
+            snippet = self.prompt_extractor.file_snippet_to_prompt_string({'uri': context.uri, 'content': context.content})
+            intro += f'{snippet}\n'
+            template_snippet = self.prompt_extractor.file_snippet_to_prompt_string(
+                {'uri': context.uri, 'content': PART_MARKER.format(len(part_ids))})
+            template_intro += f'{template_snippet}\n'
+            part_ids.append(content_id)
+
+        prompt = self.prompt_extractor.get_infilling_prompt(filename, intro, data["prefix"], data["suffix"])
+        template = self.prompt_extractor.get_infilling_prompt(filename, template_intro, PART_MARKER.format(0), PART_MARKER.format(1))
+
+        # Literal segments and the parts between them, in prompt order
+        pieces = PART_MARKER_REGEX.split(template)
+        segments = pieces[0::2]
+        prompt_part_ids = [part_ids[int(index)] for index in pieces[1::2]]
+        parts = {content_id: content for content_id, content in
+                 zip(part_ids, [data["prefix"], data["suffix"], *(context.content for context in contexts)])}
+        if build_prompt(segments, [parts[content_id] for content_id in prompt_part_ids]) != prompt:
+            # A literal of the template held a marker, the whole prompt is stored as a literal instead
+            segments, prompt_part_ids = [prompt], []
+
+        record = {**data, "prefix": None, "suffix": None}
+        self._add_record({
+            "record": json.dumps(record),
+            "prefix_id": part_ids[0],
+            "suffix_id": part_ids[1],
+            "prompt_segments": segments,
+            "prompt_part_ids": prompt_part_ids,
+            "contexts": context_rows,
+        })
+
+    def write_error(self, error_record):
+        self._add_record({"record": json.dumps(error_record), "prefix_id": None, "suffix_id": None,
+                          "prompt_segments": None, "prompt_part_ids": None, "contexts": None})
+
+    def close(self):
+        self._flush_contents()
+        self._flush_records()
+        self._contents_writer.close()
+        self._contents_sink.close()
+        self._records_writer.close()
+        self._records_sink.close()
+        self._sort_contents()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _add_record(self, row):
+        self._records.append(row)
+        self.count += 1
+        if len(self._records) == BATCH_SIZE:
+            self._flush_records()
+
+    def _flush_contents(self):
+        if self._contents:
+            self._contents_writer.write_batch(pa.RecordBatch.from_pylist(self._contents, schema=CONTENTS_SCHEMA))
+            self._contents = []
+
+    def _flush_records(self):
+        # Contents are written first, so every content a record refers to is in the file before it
+        self._flush_contents()
+        if self._records:
+            self._records_writer.write_batch(pa.RecordBatch.from_pylist(self._records, schema=RECORDS_SCHEMA))
+            self._records = []
+
+    def _sort_contents(self):
+        """Rewrite the contents sorted by id, a batch at a time, so readers find a content by binary search."""
+        unsorted_path = os.path.join(self.directory, UNSORTED_CONTENTS_FILE)
+        contents = pa.ipc.open_file(pa.memory_map(unsorted_path, "r")).read_all()
+        order = pc.sort_indices(contents.column("id"))
+        with pa.OSFile(os.path.join(self.directory, CONTENTS_FILE), "wb") as sink, \
+                pa.ipc.new_file(sink, CONTENTS_SCHEMA) as writer:
+            for start in range(0, len(order), BATCH_SIZE):
+                writer.write_table(contents.take(order[start:start + BATCH_SIZE]))
+        os.remove(unsorted_path)
+
+
+def build_prompt(segments: List[str], parts: List[str]) -> str:
+    pieces = [segments[0]]
+    for part, segment in zip(parts, segments[1:]):
+        pieces.append(part)
+        pieces.append(segment)
+    return ''.join(pieces)
+
+
+class PromptDataset:
+    """
+    Reader of a directory written by `PromptDatasetWriter`.
+
+    Both files are memory-mapped: opening the dataset only reads the last content id of each
+    batch, and records, prompts and contents are decoded when they are asked for. Contents are
+    sorted by id, a content is found by a binary search over the batches and then over the ids
+    of its batch, which are decoded the first time the batch is searched.
+    """
+
+    def __init__(self, directory: str):
+        self.records = pa.ipc.open_file(pa.memory_map(os.path.join(directory, RECORDS_FILE), "r")).read_all()
+        self.contents = pa.ipc.open_file(pa.memory_map(os.path.join(directory, CONTENTS_FILE), "r")).read_all()
+        self._id_batches = [batch for batch in self.contents.column("id").chunks if len(batch)]
+        self._content_batches = [batch for batch in self.contents.column("content").chunks if len(batch)]
+        self._last_ids = [batch[len(batch) - 1].as_py() for batch in self._id_batches]
+        self._decoded_ids: List[Optional[List[str]]] = [None] * len(self._id_batches)
+
+    def __len__(self) -> int:
+        return self.records.num_rows
+
+    def get_content(self, content_id: str) -> str:
+        batch_index = bisect_left(self._last_ids, content_id)
+        if batch_index < len(self._id_batches):
+            ids = self._decoded_ids[batch_index]
+            if ids is None:
+                ids = self._decoded_ids[batch_index] = self._id_batches[batch_index].to_pylist()
+            row = bisect_left(ids, content_id)
+            if row < len(ids) and ids[row] == content_id:
+                return self._content_batches[batch_index][row].as_py()
+        raise KeyError(content_id)
+
+    def get_prompt(self, index: int) -> Optional[str]:
+        """The prompt of record `index`, None for a failed record."""
+        segments = self.records.column("prompt_segments")[index].as_py()
+        if segments is None:
+            return None
+        part_ids = self.records.column("prompt_part_ids")[index].as_py()
+        return build_prompt(segments, [self.get_content(content_id) for content_id in part_ids])
+
+    def get_record(self, index: int) -> dict:
+        """Record `index` as `prompt_builder` writes it to JSONL."""
+        record = json.loads(self.records.column("record")[index].as_py())
+        prefix_id = self.records.column("prefix_id")[index].as_py()
+        if prefix_id is None:
+            return record
+
+        contexts = []
+        for context in self.records.column("contexts")[index].as_py():
+            fields = json.loads(context["fields"])
+            if context["has_content_field"]:
+                fields["content"] = self.get_content(context["content_id"])
+            contexts.append(fields)
+
+        record["prefix"] = self.get_content(prefix_id)
+        record["suffix"] = self.get_content(self.records.column("suffix_id")[index].as_py())
+        return {**record, "prompt": self.get_prompt(index), "contexts": contexts}
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self.get_record(index)
@@ -0,0 +1,55 @@
+import asyncio
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, Deque, Dict, Hashable, Iterable, Optional, Tuple, TypeVar
+
+Item = TypeVar("Item")
+Result = TypeVar("Result")
+
+DEFAULT_CONCURRENCY = 8
+# Items read ahead of the output, so calls of items further on can start while a run of items with one key is serialized
+DEFAULT_READ_AHEAD = 256
+
+
+async def map_in_order(
+    function: Callable[[Item], Awaitable[Result]],
+    items: Iterable[Item],
+    concurrency: int = DEFAULT_CONCURRENCY,
+    key: Optional[Callable[[Item], Hashable]] = None,
+    read_ahead: int = DEFAULT_READ_AHEAD,
+) -> AsyncIterator[Tuple[Item, "asyncio.Task[Result]"]]:
+    """
+    Call `function` on every item on the running loop, with at most `concurrency` calls in flight.
+
+    Yields each item with its done task in input order, the caller reads the result or the
+    exception of the call from the task. Calls of items with the same `key` run one after
+    another in input order, for items whose calls share state, like the language server
+    buffer of a document. At most `read_ahead` items are read ahead of the output.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    last_task_by_key: Dict[Hashable, asyncio.Task] = {}
+    pending: Deque[Tuple[Item, Hashable, asyncio.Task]] = deque()
+
+    async def run(previous: Optional[asyncio.Task], item: Item) -> Result:
+        if previous is not None:
+            # Waits for the call, not its result, a failed call does not fail the next one
+            await asyncio.wait([previous])
+        async with semaphore:
+            return await function(item)
+
+    async def pop_done() -> Tuple[Item, asyncio.Task]:
+        item, item_key, task = pending.popleft()
+        await asyncio.wait([task])
+        if last_task_by_key.get(item_key) is task:
+            del last_task_by_key[item_key]
+        return item, task
+
+    for item in items:
+        # Without a key every item has its own
+        item_key = key(item) if key is not None else object()
+        task = asyncio.ensure_future(run(last_task_by_key.get(item_key), item))
+        last_task_by_key[item_key] = task
+        pending.append((item, item_key, task))
+        if len(pending) >= max(1, read_ahead, concurrency):
+            yield await pop_done()
+    while pending:
+        yield await pop_done()
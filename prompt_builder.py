@@ -1,4 +1,6 @@
 from context_mixer import ContextMixer
+from graph_retrieval.lsp import LsptRetriever
+from graph_retrieval.static_resolver import StaticDefinitionResolver
 from schema.common import Document, Position
 import asyncio
 import os
@@ -7,13 +9,18 @@ import jsonlines
 from tqdm import tqdm
 import argparse
 from prompt.fim_utils import CodeQwen25PromptExtractor
+from prompt.prompt_dataset import PromptDatasetWriter, build_jsonl_record
+from prompt.request_window import map_in_order, DEFAULT_CONCURRENCY, DEFAULT_READ_AHEAD
 
-context_mixer = ContextMixer()
+# Context mixers per dataset source directory and static resolution setting, their retrievers find repositories under it
+context_mixers = {}
 prompt_extractor = CodeQwen25PromptExtractor()
+# Shared by the context mixers that resolve symbols statically before asking the language server
+static_resolver = StaticDefinitionResolver()
 
-def process_single_data(base_dir, data):
+def get_document(base_dir, data):
     language_id = "python"
-    document = Document(
+    return Document(
         uri=base_dir +  os.path.join(*data["metadata"]["fpath_tuple"]), 
         language_id=language_id, 
         text=data["prefix"] + data["suffix"], 
@@ -23,37 +30,87 @@ def process_single_data(base_dir, data):
         position=Position(line=data["metadata"]["line_no"], character=data["metadata"]["context_start_characterno"])
     )
 
+
+def get_context_mixer(base_dir, static_resolution=False):
+    key = (base_dir, static_resolution)
+    context_mixer = context_mixers.get(key)
+    if context_mixer is None:
+        context_mixer = context_mixers[key] = ContextMixer(
+            base_dir=base_dir, static_resolver=static_resolver if static_resolution else None
+        )
+    return context_mixer
+
+
+def check_workspace_root(context_mixer, base_dir, repo):
+    """Raise if the language server of `repo` would not be started in its directory under `base_dir`."""
+    expected_root = os.path.abspath(os.path.join(base_dir, repo))
+    for retriever in context_mixer.retrievers:
+        if isinstance(retriever, LsptRetriever):
+            workspace_root = retriever.get_workspace_root(repo)
+            if workspace_root is None or os.path.abspath(workspace_root) != expected_root:
+                raise ValueError(f"Repository {repo} has no directory {expected_root}, "
+                                 f"the language server would not index it")
+
+
+async def retrieve_contexts(base_dir, data, static_resolution=False):
+    document = get_document(base_dir, data)
     repo = data["metadata"]["fpath_tuple"][0]
-    contexts = asyncio.run(context_mixer.get_context(document, document.position, repo))
+    context_mixer = get_context_mixer(base_dir, static_resolution)
+    check_workspace_root(context_mixer, base_dir, repo)
+    return await context_mixer.get_context(document, document.position, repo)
+
 
-    intro = ''
-    context_dict = []
+def get_document_key(data):
+    # Records of one file sync their own text to the same language server buffer, so they are retrieved one at a time
+    return tuple(data["metadata"]["fpath_tuple"])
 
-    for context in contexts['context']:
-        context_dict.append(context.to_dict())
-        snippet = prompt_extractor.file_snippet_to_prompt_string({'uri': context.uri, 'content': context.content})
-        intro += f'{snippet}\n'
 
-    prompt = prompt_extractor.get_infilling_prompt(data["metadata"]["fpath_tuple"][-1], intro, data["prefix"], data["suffix"])
+def build_record(data, contexts):
+    return build_jsonl_record(data, contexts['context'], prompt_extractor)
 
-    return {**data, 'prompt': prompt, 'contexts': context_dict}
 
+def process_single_data(base_dir, data, static_resolution=False):
+    return build_record(data, asyncio.run(retrieve_contexts(base_dir, data, static_resolution)))
 
 
-def process_jsonl_file(base_dir, input_file, output_file):
+async def iter_record_contexts(base_dir, reader, concurrency, read_ahead, static_resolution=False):
+    """
+    Yield every record of `reader` with its done retrieval task, in input order.
+
+    All records are retrieved on the running loop with up to `concurrency` retrievals in
+    flight, so the language server round trips of different files overlap.
+    """
+    progress = tqdm(desc="Processing data")
+    async for data, task in map_in_order(lambda data: retrieve_contexts(base_dir, data, static_resolution), reader,
+                                         concurrency, get_document_key, read_ahead):
+        yield data, task
+        progress.update()
+    progress.close()
+    if static_resolution:
+        print(static_resolver.report())
+
+
+async def build_records(base_dir, input_file, concurrency, read_ahead, static_resolution=False):
     results = []
-    
-    # Read input JSONL file
     with jsonlines.open(input_file) as reader:
-        # Wrap with tqdm for progress bar
-        for data in tqdm(reader, desc="Processing data"):
+        async for data, task in iter_record_contexts(base_dir, reader, concurrency, read_ahead, static_resolution):
             try:
-                result = process_single_data(base_dir, data)
-                results.append(result)
+                results.append(build_record(data, task.result()))
             except Exception as e:
                 print(f"Error processing data: {e}")
                 # Add the original data with error information
                 results.append({"error": str(e), "original": data})
+    return results
+
+
+def process_jsonl_file(base_dir, input_file, output_file, output_format="jsonl",
+                       concurrency=DEFAULT_CONCURRENCY, read_ahead=DEFAULT_READ_AHEAD, static_resolution=False):
+    if output_format == "arrow":
+        return asyncio.run(process_jsonl_file_to_arrow(base_dir, input_file, output_file, concurrency, read_ahead,
+                                                       static_resolution))
+
+    # One event loop for the whole file
+    results = asyncio.run(build_records(base_dir, input_file, concurrency, read_ahead, static_resolution))
     
     # Write results to output JSONL file
     with jsonlines.open(output_file, mode='w') as writer:
@@ -61,6 +118,23 @@ def process_jsonl_file(base_dir, input_file, output_file):
     
     print(f"Processed {len(results)} items. Results saved to {output_file}")
 
+
+async def process_jsonl_file_to_arrow(base_dir, input_file, output_dir, concurrency=DEFAULT_CONCURRENCY,
+                                      read_ahead=DEFAULT_READ_AHEAD, static_resolution=False):
+    """Write the prompts of `input_file` as a prompt dataset directory, see `PromptDatasetWriter`."""
+    with jsonlines.open(input_file) as reader, PromptDatasetWriter(output_dir, prompt_extractor) as writer:
+        async for data, task in iter_record_contexts(base_dir, reader, concurrency, read_ahead, static_resolution):
+            try:
+                writer.write(data, task.result()['context'])
+            except Exception as e:
+                print(f"Error processing data: {e}")
+                # Add the original data with error information
+                writer.write_error({"error": str(e), "original": data})
+        count = writer.count
+
+    print(f"Processed {count} items. Results saved to {output_dir}")
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Process JSONL file to generate prompts with context')
     parser.add_argument('--base_dir', type=str, required=True, 
@@ -68,10 +142,19 @@ if __name__ == "__main__":
     parser.add_argument('--input', type=str, required=True,
                         help='Input JSONL file path')
     parser.add_argument('--output', type=str, required=True,
-                        help='Output JSONL file path')
+                        help='Output JSONL file path, or directory for the arrow format')
+    parser.add_argument('--output_format', type=str, choices=['jsonl', 'arrow'], default='jsonl',
+                        help='jsonl writes full records, arrow writes a deduplicated prompt dataset directory')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help='Maximum number of records whose contexts are retrieved at the same time')
+    parser.add_argument('--read_ahead', type=int, default=DEFAULT_READ_AHEAD,
+                        help='Maximum number of records read ahead of the output')
+    parser.add_argument('--static_resolution', action='store_true',
+                        help='Resolve the symbols the repository symbol table can answer without the language server')
     
     args = parser.parse_args()
     
-    process_jsonl_file(args.base_dir, args.input, args.output)
+    process_jsonl_file(args.base_dir, args.input, args.output, args.output_format, args.concurrency, args.read_ahead,
+                       args.static_resolution)
     
     
\ No newline at end of file
@@ -1,10 +1,27 @@
 from schema.common import Document, Position
 import os
+from typing import Optional
 import jsonlines
+import pyarrow as pa
 from tqdm import tqdm
 from post_processing.main import parse_and_truncate_completion, process_completion
 from context.handle_current_context import get_current_doc_context
-from process_data import load_dataset
+
+SAFIM_TASKS = ['api', 'control', 'block']
+SAFIM_INDEX_DIRECTORY = os.path.join(os.path.expanduser("~"), ".cache", "jaccard_warp", "safim")
+# Rows of the index written at once while converting the dataset
+INDEX_BATCH_SIZE = 1024
+# Bumped whenever the rows written for a sample change, so indexes written by older code are rebuilt
+SAFIM_INDEX_FORMAT_VERSION = 1
+SAFIM_INDEX_SCHEMA = pa.schema([
+    ("lang", pa.string()),
+    # Null when the prompt does not split into a prefix and a suffix
+    ("prefix", pa.large_string()),
+    ("suffix", pa.large_string()),
+    ("line_no", pa.int64()),
+    ("context_start_characterno", pa.int64()),
+], metadata={b"format_version": str(SAFIM_INDEX_FORMAT_VERSION).encode()})
+
 def process_single_data(data):
 
 
@@ -55,51 +72,101 @@ def get_infilling_parts(sample):
     assert len(parts) == 2
     return parts
 
-def process_jsonl_file(input_file, output_file):
-    results = []
+def get_index_row(sample):
+    """The prefix, suffix and cursor metadata of a SAFIM sample, as stored in the index."""
+    try:
+        prefix, suffix = get_infilling_parts(sample)
+    except (AssertionError, KeyError):
+        return {"lang": sample["lang"], "prefix": None, "suffix": None, "line_no": None, "context_start_characterno": None}
+
+    return {
+        "lang": sample["lang"],
+        "prefix": prefix,
+        "suffix": suffix,
+        "line_no": prefix.count("\n"),
+        "context_start_characterno": len(prefix) - (prefix.rfind("\n") + 1) - 1,
+    }
+
+
+def build_safim_index(samples, index_path):
+    """Write the index rows of `samples` to an Arrow file at `index_path`, a batch at a time."""
+    os.makedirs(os.path.dirname(index_path), exist_ok=True)
+    temporary_path = f"{index_path}.{os.getpid()}.tmp"
+    with pa.OSFile(temporary_path, "wb") as sink, pa.ipc.new_file(sink, SAFIM_INDEX_SCHEMA) as writer:
+        rows = []
+        for sample in samples:
+            rows.append(get_index_row(sample))
+            if len(rows) == INDEX_BATCH_SIZE:
+                writer.write_batch(pa.RecordBatch.from_pylist(rows, schema=SAFIM_INDEX_SCHEMA))
+                rows = []
+        if rows:
+            writer.write_batch(pa.RecordBatch.from_pylist(rows, schema=SAFIM_INDEX_SCHEMA))
+    # Concurrent runs converting the dataset each write their own file, readers never see a partial one
+    os.replace(temporary_path, index_path)
+
 
-    dataset = load_dataset(['api', 'control', 'block'])
-    # Read input JSONL file
-    with jsonlines.open(input_file) as reader:
+def load_safim_index(tasks=SAFIM_TASKS, index_dir=SAFIM_INDEX_DIRECTORY) -> pa.Table:
+    """
+    The index of the SAFIM samples of `tasks`, in `load_dataset(tasks)` order.
+
+    The dataset is converted once into an Arrow file under `index_dir`. Later runs memory-map
+    that file, so they start without loading the dataset, work offline and only page in the
+    rows they read.
+    """
+    index_path = os.path.join(index_dir, f"safim-{'-'.join(tasks)}.arrow")
+    index = open_safim_index(index_path)
+    if index is None:
+        # Loading the dataset library is slow, only the conversion needs it
+        from process_data import iter_dataset_columns
+        build_safim_index(iter_dataset_columns(tasks, ["lang", "eval_prompt"]), index_path)
+        index = open_safim_index(index_path)
+    return index
+
+
+def open_safim_index(index_path) -> Optional[pa.Table]:
+    """The index at `index_path`, None if there is none or it was written in another format."""
+    try:
+        index = pa.ipc.open_file(pa.memory_map(index_path, "r")).read_all()
+    except (OSError, pa.ArrowInvalid):
+        return None
+    # Schema equality ignores the metadata, the format version is compared on its own
+    if not index.schema.equals(SAFIM_INDEX_SCHEMA, check_metadata=True):
+        return None
+    return index
+
+
+def process_jsonl_file(input_file, output_file, index_dir=SAFIM_INDEX_DIRECTORY):
+    count = 0
+
+    index = load_safim_index(SAFIM_TASKS, index_dir)
+    columns = {name: index.column(name) for name in SAFIM_INDEX_SCHEMA.names}
+    # Read input JSONL file, results are written as they are processed
+    with jsonlines.open(input_file) as reader, jsonlines.open(output_file, mode='w') as writer:
         # Wrap with tqdm for progress bar
-        for index, data in enumerate(tqdm(reader, desc="Processing data")):
-            # prefix, suffix = get_infilling_parts(dataset[index])
-            # new_data = {
-            #     "language_id": dataset[index]["lang"],
-            #     "metadata": {
-            #         "line_no": len(prefix.split("\n")) - 1,
-            #         "context_start_characterno": len(prefix.split("\n")[-1]) -1
-            #     },
-            #     "prefix": prefix,
-            #     "suffix": suffix,
-            #     **data
-            # }
-            # result = process_single_data(new_data)
-            # results.append(result)
+        for index_row, data in enumerate(tqdm(reader, desc="Processing data")):
             try:
-                prefix, suffix = get_infilling_parts(dataset[index])
+                prefix = columns["prefix"][index_row].as_py()
+                if prefix is None:
+                    raise ValueError("eval_prompt does not split into a prefix and a suffix")
                 new_data = {
-                    "language_id": dataset[index]["lang"],
+                    "language_id": columns["lang"][index_row].as_py(),
                     "metadata": {
-                        "line_no": len(prefix.split("\n")) - 1,
-                        "context_start_characterno": len(prefix.split("\n")[-1]) -1
+                        "line_no": columns["line_no"][index_row].as_py(),
+                        "context_start_characterno": columns["context_start_characterno"][index_row].as_py()
                     },
                     "prefix": prefix,
-                    "suffix": suffix,
+                    "suffix": columns["suffix"][index_row].as_py(),
                     **data,
                 }
                 result = process_single_data(new_data)
-                results.append(result)
             except Exception as e:
-                print(f"Error processing data: {index}: {e}")
+                print(f"Error processing data: {index_row}: {e}")
                 # Add the original data with error information
-                results.append({"error": str(e), **data})
-        
-    # Write results to output JSONL file
-    with jsonlines.open(output_file, mode='w') as writer:
-        writer.write_all(results)
-    
-    print(f"Processed {len(results)} items. Results saved to {output_file}")
+                result = {"error": str(e), **data}
+            writer.write(result)
+            count += 1
+
+    print(f"Processed {count} items. Results saved to {output_file}")
 
 if __name__ == "__main__":
 
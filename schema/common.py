@@ -30,6 +30,8 @@ class Document:
     suffix: Optional[str] = None
     offset: Optional[int] = None
     position: Optional[Position] = None
+    # Version of the text, as sent with didOpen/didChange, None when the document is not versioned
+    version: Optional[int] = None
 
 @dataclass
 class AutocompleteSymbolContextSnippet:
@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+from typing import Optional
 from schema.common import Position
 @dataclass
 class SymbolRequest:
@@ -7,4 +8,5 @@ class SymbolRequest:
     uri: str
     node_type: str
     language_id: str
-    capture_name: str
\ No newline at end of file
+    capture_name: str
+    workspace: Optional[str] = None
@@ -0,0 +1,29 @@
+import random
+
+from benchmark.lsp_lookup_benchmark import PROJECT_ROOT
+from benchmark.tree_cache_benchmark import build_source
+from tree_sitter_local.tree_cache import tree_cache
+from tree_sitter_local.tree_sitter_local import tree_sitter_pool
+
+
+def unrestricted_call_nodes(analyzer, source: str, tree, start_pos, end_pos):
+    """What analyze_source used to do: run the query over the whole tree, then filter by byte range."""
+    start_byte = analyzer._pos_to_byte(source, *start_pos)
+    end_byte = analyzer._pos_to_byte(source, *end_pos)
+    return [node for node in analyzer.get_nodes_from_query(analyzer.FUNCTION_CALL_QUERY, tree.root_node)
+            if node.end_byte >= start_byte and node.start_byte <= end_byte]
+
+
+def test_range_restricted_query_matches_the_filtered_full_query():
+    analyzer = tree_sitter_pool.get_analyzer("python")
+    source = build_source(PROJECT_ROOT, 2000)
+    tree = tree_cache.get_tree(analyzer, "call_query_range.py", source)
+    lines = source.split('\n')
+    rng = random.Random(0)
+    for _ in range(50):
+        # The 100 lines before a random cursor, like identifier extraction
+        line = rng.randrange(len(lines))
+        start_pos, end_pos = (max(line - 100, 0), 0), (line, rng.randint(0, len(lines[line])) + 1)
+        restricted = [node.start_byte for node in analyzer.iter_call_nodes(source, start_pos, end_pos, tree)]
+        unrestricted = [node.start_byte for node in unrestricted_call_nodes(analyzer, source, tree, start_pos, end_pos)]
+        assert restricted == unrestricted, (start_pos, end_pos)
@@ -0,0 +1,25 @@
+from file_system.chunked_map import map_chunks_in_order
+from file_system.text_cache import TextKeyedCache
+
+
+def square_chunk(chunk):
+    return [value * value for value in chunk]
+
+
+def test_chunks_are_mapped_in_input_order():
+    chunks = [list(range(start, start + 3)) for start in range(0, 30, 3)]
+    expected = [square_chunk(chunk) for chunk in chunks]
+    assert list(map_chunks_in_order(square_chunk, iter(chunks), 1)) == expected
+    assert list(map_chunks_in_order(square_chunk, iter(chunks), 2)) == expected
+
+
+def test_text_keyed_cache_evicts_the_least_recently_used_text():
+    built = []
+    cache = TextKeyedCache(lambda text: built.append(text) or text.upper(), max_entries=2)
+    assert cache.get("a") == "A"
+    cache.get("b")
+    cache.get("a")
+    cache.get("c")
+    cache.get("a")
+    cache.get("b")
+    assert built == ["a", "b", "c", "b"]
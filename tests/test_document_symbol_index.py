@@ -0,0 +1,45 @@
+import random
+
+from graph_retrieval.document_symbol_index import DocumentSymbolIndex, CAPTURE_NAME_OBJECT_CREATE
+from schema.common import Location, Position, Range
+from schema.lsp import DocumentSymbol
+
+
+def scan_document_symbols(document_symbols, definition_location, symbol_name, capture_name):
+    """The linear scan `DocumentSymbolIndex.find` replaces, kept as the reference behavior."""
+    for s in document_symbols:
+        if capture_name != CAPTURE_NAME_OBJECT_CREATE and s.location.range.start.line == definition_location.range.start.line:
+            return s
+        if s.name == symbol_name or symbol_name in s.name:
+            return s
+    return None
+
+
+def random_symbols(rng: random.Random, count: int):
+    names = ["run", "runner", "Foo", "FooBar", "bar", "__init__", "a", "ab", "get", "get_text"]
+    return [
+        DocumentSymbol(
+            name=rng.choice(names) + rng.choice(["", "_x", "2"]),
+            kind=rng.choice([5, 6, 12, 13]),
+            location=Location(uri="file.py", range=Range(
+                start=Position(line=rng.randrange(count), character=0),
+                end=Position(line=rng.randrange(count), character=0),
+            )),
+        )
+        for _ in range(count)
+    ]
+
+
+def test_index_matches_the_linear_scan():
+    rng = random.Random(0)
+    for _ in range(500):
+        symbols = random_symbols(rng, rng.randrange(0, 40))
+        index = DocumentSymbolIndex(symbols)
+        for _ in range(10):
+            location = Location(uri="file.py", range=Range(
+                start=Position(line=rng.randrange(45), character=0), end=Position(line=0, character=0),
+            ))
+            symbol_name = rng.choice(["run", "Foo", "a", "b", "get_text", "x", "Bar", "_x"])
+            capture_name = rng.choice(["identifier", CAPTURE_NAME_OBJECT_CREATE])
+            expected = scan_document_symbols(symbols, location, symbol_name, capture_name)
+            assert index.find(location, symbol_name, capture_name) is expected, (symbols, location, symbol_name, capture_name)
@@ -0,0 +1,131 @@
+import asyncio
+import threading
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+from graph_retrieval import lsp_command
+from graph_retrieval.document_sync import DocumentSync
+from graph_retrieval.lsp_pool import LanguageServerPool
+from graph_retrieval.synced_buffers import synced_buffers
+from schema.common import Document, Location, Position, Range
+
+
+class Notifications:
+    def __init__(self):
+        self.sent = []
+
+    def did_open_text_document(self, params):
+        self.sent.append(("open", params["textDocument"]["uri"]))
+
+    def did_change_text_document(self, params):
+        self.sent.append(("change", params["textDocument"]["uri"]))
+
+    def did_close_text_document(self, params):
+        self.sent.append(("close", params["textDocument"]["uri"]))
+
+
+class FakeLanguageServer:
+    def __init__(self, workspace_root: str, notifications: Notifications):
+        self.open_file_buffers = {}
+        self.repository_root_path = workspace_root
+        self.language_id = "python"
+        self.server = SimpleNamespace(notify=notifications, process=SimpleNamespace(returncode=None))
+
+
+class FakeBufferServer:
+    """Stands in for `SyncLanguageServer` with multilspy's document buffers and its own loop thread."""
+
+    def __init__(self, workspace_root: str):
+        self.notifications = Notifications()
+        self.language_server = FakeLanguageServer(workspace_root, self.notifications)
+        self.loop = None
+
+    @contextmanager
+    def start_server(self):
+        self.loop = asyncio.new_event_loop()
+        loop_thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        loop_thread.start()
+        try:
+            yield self
+        finally:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            loop_thread.join()
+            self.loop.close()
+
+
+def use_fake_servers(monkeypatch):
+    pool = LanguageServerPool(server_factory=lambda language, root: FakeBufferServer(root))
+    monkeypatch.setattr(lsp_command, "server_pool", pool)
+    return pool
+
+
+def make_document(path, text: str) -> Document:
+    return Document(uri=str(path), language_id="python", text=text)
+
+
+def first_line(path) -> Location:
+    return Location(uri=str(path), range=Range(start=Position(line=0, character=0), end=Position(line=0, character=6)))
+
+
+def test_snippets_are_sliced_from_the_synced_text(tmp_path, monkeypatch):
+    pool = use_fake_servers(monkeypatch)
+    file_path = tmp_path / "module.py"
+    file_path.write_text("x = 1\n")
+    document_sync = DocumentSync(max_documents=0)
+
+    async def run():
+        async with document_sync.synced(make_document(file_path, "y = 22\nz = 3\n"), str(tmp_path)):
+            synced_text = await lsp_command.get_text_from_location(first_line(file_path))
+            synced_lines = await lsp_command.get_lines_from_location(first_line(file_path), 2)
+        return synced_text, synced_lines, await lsp_command.get_text_from_location(first_line(file_path))
+
+    try:
+        synced_text, synced_lines, disk_text = asyncio.run(run())
+    finally:
+        pool.close_all()
+    assert synced_text == "y = 22"
+    assert synced_lines == "y = 22\nz = 3\n"
+    # The buffer is closed once the block exits, snippets come from the file on disk again
+    assert disk_text == "x = 1\n"
+    assert synced_buffers.get(str(file_path)) is None
+
+
+def test_least_recently_synced_buffers_are_closed(tmp_path, monkeypatch):
+    pool = use_fake_servers(monkeypatch)
+    paths = [tmp_path / f"module_{index}.py" for index in range(3)]
+    document_sync = DocumentSync(max_documents=1)
+
+    async def run():
+        for path in paths:
+            async with document_sync.synced(make_document(path, f"{path.name} = 1\n"), str(tmp_path)):
+                pass
+        # Syncing the open document again only sends the edit
+        async with document_sync.synced(make_document(paths[-1], f"{paths[-1].name} = 2\n"), str(tmp_path)):
+            pass
+
+    try:
+        asyncio.run(run())
+        server = pool.get_started("python", str(tmp_path))
+        assert list(server.language_server.open_file_buffers) == [paths[-1].as_uri()]
+        assert [kind for kind, _ in server.notifications.sent] == ["open", "open", "close", "open", "close", "change"]
+    finally:
+        pool.close_all()
+
+
+def test_buffer_in_use_is_not_closed(tmp_path, monkeypatch):
+    pool = use_fake_servers(monkeypatch)
+    in_use, other = tmp_path / "in_use.py", tmp_path / "other.py"
+    document_sync = DocumentSync(max_documents=0)
+
+    async def run():
+        async with document_sync.synced(make_document(in_use, "a = 1\n"), str(tmp_path)):
+            async with document_sync.synced(make_document(other, "b = 1\n"), str(tmp_path)):
+                pass
+            return synced_buffers.get(str(in_use)).text
+
+    try:
+        assert asyncio.run(run()) == "a = 1\n"
+        server = pool.get_started("python", str(tmp_path))
+        assert server.language_server.open_file_buffers == {}
+    finally:
+        pool.close_all()
@@ -0,0 +1,13 @@
+from graph_retrieval.common_keyword import common_keywords
+from programing_language import LANGUAGE_KEYWORDS, ProgrammingLanguage, get_language_profile
+
+
+def test_profiles_carry_the_keywords_of_their_language():
+    assert "lambda" in get_language_profile(ProgrammingLanguage.PYTHON).keywords
+    assert "interface" in get_language_profile(ProgrammingLanguage.TYPESCRIPTREACT).keywords
+    assert get_language_profile(ProgrammingLanguage.RUST).keywords == frozenset()
+    assert isinstance(get_language_profile(ProgrammingLanguage.GO).keywords, frozenset)
+
+
+def test_common_keywords_are_the_union_of_the_language_keywords():
+    assert common_keywords == frozenset().union(*LANGUAGE_KEYWORDS.values())
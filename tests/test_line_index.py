@@ -0,0 +1,27 @@
+import random
+
+from file_system.line_index import get_line_index
+
+
+def scan_pos_to_byte(source: str, line: int, character: int) -> int:
+    """The line scan the index replaced: split the source and encode every line before `line`."""
+    lines = source.split('\n')
+    byte_offset = 0
+    for i in range(line):
+        byte_offset += len(lines[i].encode('utf-8')) + 1
+    if character > 0:
+        byte_offset += len(lines[line][:character].encode('utf-8'))
+    return byte_offset
+
+
+def test_position_to_byte_matches_the_line_scan():
+    rng = random.Random(0)
+    # ASCII texts take the fast path of the index, the others encode their lines
+    for alphabet in ["ab \n", "ab \nü中"]:
+        for _ in range(200):
+            source = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 60)))
+            lines = source.split('\n')
+            line_index = get_line_index(source)
+            for line, text in enumerate(lines):
+                for character in range(len(text) + 1):
+                    assert line_index.position_to_byte(line, character) == scan_pos_to_byte(source, line, character), (source, line, character)
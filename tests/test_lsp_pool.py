@@ -0,0 +1,119 @@
+import asyncio
+import threading
+import time
+from contextlib import contextmanager
+
+from graph_retrieval import lsp_command
+from graph_retrieval.lsp_pool import LanguageServerPool
+
+
+class FakeServer:
+    """Stands in for `SyncLanguageServer`: starting it waits for `release`, when it is given one."""
+
+    def __init__(self, release=None, starting=None):
+        self.release = release
+        self.starting = starting
+        self.running = False
+        self.started_at = None
+
+    @contextmanager
+    def start_server(self):
+        if self.starting is not None:
+            self.starting.set()
+        if self.release is not None:
+            self.release.wait(5)
+        self.running = True
+        self.started_at = time.monotonic()
+        yield self
+        self.running = False
+
+    def request_document_symbols(self, file_path):
+        return [], None
+
+
+def run_in_thread(function, *args):
+    thread = threading.Thread(target=function, args=args, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_restart_while_server_starts_does_not_deadlock():
+    starting = threading.Event()
+    release = threading.Event()
+    pool = LanguageServerPool(server_factory=lambda language, root: FakeServer(release, starting))
+
+    getter = run_in_thread(pool.get, "python", "/repo")
+    assert starting.wait(3)
+    restarter = run_in_thread(pool.restart, "python", "/repo")
+    release.set()
+
+    getter.join(3)
+    restarter.join(3)
+    assert not getter.is_alive() and not restarter.is_alive()
+    assert pool.is_alive("python", "/repo")
+    assert pool.stats["started"] == 2
+
+
+def test_get_reuses_started_server():
+    pool = LanguageServerPool(server_factory=lambda language, root: FakeServer())
+    server = pool.get("python", "/repo")
+    assert pool.get("python", "/repo") is server
+    assert pool.stats == {"started": 1, "reused": 1, "restarted": 0, "evicted": 0}
+
+
+def test_async_lookup_does_not_block_the_event_loop_while_the_server_starts(monkeypatch):
+    starting = threading.Event()
+    release = threading.Event()
+    pool = LanguageServerPool(server_factory=lambda language, root: FakeServer(release, starting))
+    monkeypatch.setattr(lsp_command, "server_pool", pool)
+
+    async def run():
+        lookup = asyncio.ensure_future(lsp_command.get_lsp_server_async("python", "/repo"))
+        while not starting.is_set():
+            await asyncio.sleep(0.01)
+        # The loop keeps running other coroutines while the server is starting
+        for _ in range(5):
+            await asyncio.sleep(0.01)
+        ticked_at = time.monotonic()
+        release.set()
+        return ticked_at, await lookup
+
+    ticked_at, server = asyncio.run(run())
+    assert ticked_at < server.started_at
+    assert pool.get_started("python", "/repo") is server
+
+
+def test_evicted_server_is_shut_down_after_its_last_lease():
+    pool = LanguageServerPool(max_size=1, server_factory=lambda language, root: FakeServer())
+    entry = pool.acquire("python", "/repo")
+    pool.get("python", "/other")
+
+    # Dropped from the pool while its request is in flight, but still running
+    assert not pool.is_alive("python", "/repo")
+    assert entry.server.running
+    pool.release(entry)
+    assert not entry.server.running
+
+
+def test_overflow_evicts_the_least_recently_used_idle_server():
+    pool = LanguageServerPool(max_size=2, server_factory=lambda language, root: FakeServer())
+    with pool.lease("python", "/busy") as busy:
+        idle = pool.get("python", "/idle")
+        pool.get("python", "/new")
+        assert busy.running and not idle.running
+        assert pool.is_alive("python", "/busy")
+
+
+def test_leased_lookup_keeps_a_restarted_server_running_until_the_request_is_done(monkeypatch):
+    pool = LanguageServerPool(server_factory=lambda language, root: FakeServer())
+    monkeypatch.setattr(lsp_command, "server_pool", pool)
+
+    async def run():
+        async with lsp_command.leased_lsp_server("python", "/repo") as server:
+            pool.restart("python", "/repo")
+            running_during_request = server.running
+        return server, running_during_request
+
+    server, running_during_request = asyncio.run(run())
+    assert running_during_request and not server.running
+    assert pool.get("python", "/repo") is not server
@@ -0,0 +1,27 @@
+from benchmark.lsp_lookup_benchmark import PROJECT_ROOT
+from benchmark.tree_cache_benchmark import build_source, make_requests
+from context.handle_current_context import get_current_doc_context
+from post_processing.parse_completion import CompletionParseContext
+from tree_sitter_local.tree_sitter_local import tree_sitter_pool
+
+
+def get_variants(completion: str):
+    """Completion variants like the ones post-processing parses: as is, with a closing bracket, first line only."""
+    return [completion, completion + ")", completion.split('\n')[0]]
+
+
+def test_variants_parsed_from_a_shared_context_match_full_parses():
+    analyzer = tree_sitter_pool.get_analyzer("python")
+    checked = 0
+    for document, completion in make_requests(build_source(PROJECT_ROOT, 1000), 10, 3, 0):
+        doc_context = get_current_doc_context(document, document.language_id)
+        if doc_context['current_line_suffix'] != '':
+            continue
+        parse_context = CompletionParseContext(document, doc_context)
+        # Twice, so memoized variants are checked as well
+        for insert_text in get_variants(completion) * 2:
+            parsed = parse_context.parse({'insert_text': insert_text})
+            text = document.text[:document.offset] + insert_text + document.text[document.offset:]
+            assert parsed['tree'].root_node.sexp() == analyzer.parser.parse(bytes(text, "utf8")).root_node.sexp()
+            checked += 1
+    assert checked > 0
@@ -0,0 +1,32 @@
+import os
+
+import pytest
+
+nltk = pytest.importorskip("nltk")
+try:
+    # Importing the Jaccard retriever needs the nltk data
+    nltk.data.find("corpora/stopwords")
+    nltk.data.find("tokenizers/punkt_tab")
+except LookupError:
+    pytest.skip("nltk stopwords and punkt_tab data are not installed", allow_module_level=True)
+
+import prompt_builder
+from graph_retrieval.lsp import LsptRetriever
+from text_retrieval.jaccard_retriever import JaccardSimilarityRetriever
+
+
+def test_retrievers_resolve_repositories_under_base_dir(tmp_path):
+    (tmp_path / "repo_a").mkdir()
+    base_dir = f"{tmp_path}/"
+
+    context_mixer = prompt_builder.get_context_mixer(base_dir)
+    assert prompt_builder.get_context_mixer(base_dir) is context_mixer
+    for retriever in context_mixer.retrievers:
+        assert retriever.base_dir == base_dir
+        if isinstance(retriever, LsptRetriever):
+            assert retriever.get_workspace_root("repo_a") == os.path.join(base_dir, "repo_a")
+    assert any(isinstance(retriever, JaccardSimilarityRetriever) for retriever in context_mixer.retrievers)
+
+    prompt_builder.check_workspace_root(context_mixer, base_dir, "repo_a")
+    with pytest.raises(ValueError):
+        prompt_builder.check_workspace_root(context_mixer, base_dir, "missing_repo")
@@ -0,0 +1,46 @@
+import json
+import os
+
+import pytest
+
+from prompt.fim_utils import CodeQwen25PromptExtractor
+from prompt.prompt_dataset import BATCH_SIZE, PromptDataset, PromptDatasetWriter, build_jsonl_record, get_content_id
+from schema.jaccard import JaccardMatchWithFilename
+from schema.lsp import LSPSymbolContextSnippet
+
+
+def test_contents_are_found_across_batches(tmp_path):
+    contents = [f"def function_{index}():\n    return {index}\n" for index in range(BATCH_SIZE * 3 + 7)]
+    with PromptDatasetWriter(str(tmp_path), prompt_extractor=None) as writer:
+        for content in contents:
+            writer.add_content(content)
+        # Stored once however often it is used
+        writer.add_content(contents[0])
+
+    assert sorted(os.listdir(tmp_path)) == ["contents.arrow", "records.arrow"]
+    dataset = PromptDataset(str(tmp_path))
+    assert dataset.contents.num_rows == len(contents)
+    assert dataset.contents.column("id").to_pylist() == sorted(map(get_content_id, contents))
+    for content in contents:
+        assert dataset.get_content(get_content_id(content)) == content
+    with pytest.raises(KeyError):
+        dataset.get_content(get_content_id("missing"))
+    with pytest.raises(KeyError):
+        dataset.get_content("f" * 32)
+
+
+def test_records_round_trip_like_jsonl(tmp_path):
+    data = {"prefix": "def f():\n    ", "suffix": "\n", "metadata": {"fpath_tuple": ["repo", "main.py"], "line_no": 1}}
+    contexts = [
+        JaccardMatchWithFilename(score=0.5, content="x = 1\n", start_line=0, end_line=1, uri="repo/a.py"),
+        # An unhelpful symbol, retrieved without content
+        LSPSymbolContextSnippet(identifier="LSPRetriever", content=None, symbol="g", uri="repo/b.py", start_line=2, end_line=2),
+        LSPSymbolContextSnippet(identifier="LSPRetriever", content="def h()", symbol="h", uri="repo/b.py", start_line=4, end_line=4),
+    ]
+    with PromptDatasetWriter(str(tmp_path), CodeQwen25PromptExtractor()) as writer:
+        writer.write(data, contexts)
+
+    expected = json.loads(json.dumps(build_jsonl_record(data, contexts, CodeQwen25PromptExtractor())))
+    assert [context["uri"] for context in expected["contexts"]] == ["repo/a.py", "repo/b.py"]
+    assert "None" not in expected["prompt"]
+    assert list(PromptDataset(str(tmp_path))) == [expected]
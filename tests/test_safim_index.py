@@ -0,0 +1,45 @@
+import os
+
+import pyarrow as pa
+
+import process_data
+from safim_post_processing import SAFIM_INDEX_SCHEMA, load_safim_index
+
+SAMPLES = [
+    {"lang": "python", "eval_prompt": "def f():\n    {{completion}}\n"},
+    {"lang": "java", "eval_prompt": "no placeholder"},
+]
+
+
+def use_fake_dataset(monkeypatch):
+    loads = []
+
+    def iter_dataset_columns(tasks, columns):
+        loads.append(tasks)
+        yield from SAMPLES
+
+    monkeypatch.setattr(process_data, "iter_dataset_columns", iter_dataset_columns)
+    return loads
+
+
+def test_index_is_built_once(tmp_path, monkeypatch):
+    loads = use_fake_dataset(monkeypatch)
+    first = load_safim_index(["api"], str(tmp_path))
+    second = load_safim_index(["api"], str(tmp_path))
+    assert loads == [["api"]]
+    assert first.equals(second)
+    assert first.column("prefix").to_pylist() == ["def f():\n    ", None]
+    assert first.column("line_no").to_pylist() == [1, None]
+
+
+def test_index_of_another_format_is_rebuilt(tmp_path, monkeypatch):
+    loads = use_fake_dataset(monkeypatch)
+    # Same columns, written before the format was versioned
+    stale_schema = SAFIM_INDEX_SCHEMA.remove_metadata()
+    with pa.OSFile(os.path.join(tmp_path, "safim-api.arrow"), "wb") as sink, pa.ipc.new_file(sink, stale_schema) as writer:
+        writer.write_batch(pa.RecordBatch.from_pylist([], schema=stale_schema))
+
+    index = load_safim_index(["api"], str(tmp_path))
+    assert loads == [["api"]]
+    assert index.num_rows == len(SAMPLES)
+    assert index.schema.metadata == SAFIM_INDEX_SCHEMA.metadata
@@ -0,0 +1,106 @@
+import asyncio
+
+from graph_retrieval import symbol_context_snippets
+from graph_retrieval.static_resolver import StaticDefinitionResolver
+from graph_retrieval.symbol_table import RepoSymbolTable
+from graph_retrieval.synced_buffers import synced_buffers
+from schema.common import Position
+from schema.tree_sitter import SymbolRequest
+
+HELPERS = '''def helper(a, b=1):
+    return a + b
+
+
+class Widget:
+    def __init__(self, name: str):
+        self.name = name
+
+    def render(self):
+        return self.name
+'''
+
+
+def make_repository(tmp_path):
+    package = tmp_path / "pkg"
+    package.mkdir()
+    (package / "__init__.py").write_text("")
+    (package / "helpers.py").write_text(HELPERS)
+    (package / "star.py").write_text("from .helpers import *\n")
+    (tmp_path / "direct.py").write_text("def local():\n    return 1\n\n\nlocal()\n")
+    (tmp_path / "imported.py").write_text("from pkg.helpers import helper as add\n\nadd(1)\n")
+    (tmp_path / "starred.py").write_text("from pkg.star import *\n\nhelper(1)\n")
+    (tmp_path / "member.py").write_text("from pkg.helpers import Widget\n\nWidget('a').render()\n")
+    return tmp_path
+
+
+def make_request(workspace, file_name: str, symbol_name: str, line: int, character: int = 0) -> SymbolRequest:
+    return SymbolRequest(symbol_name=symbol_name, position=Position(line=line, character=character),
+                         uri=str(workspace / file_name), node_type="call", language_id="python",
+                         capture_name="identifier", workspace=str(workspace))
+
+
+def test_direct_definition(tmp_path):
+    workspace = make_repository(tmp_path)
+    found, (snippet, _) = StaticDefinitionResolver().resolve(make_request(workspace, "direct.py", "local", 4))
+    assert found
+    assert (snippet["uri"], snippet["start_line"], snippet["content"]) == (str(workspace / "direct.py"), 0, "def local()")
+
+
+def test_imported_definition_under_an_alias(tmp_path):
+    workspace = make_repository(tmp_path)
+    definitions = RepoSymbolTable(str(workspace)).find_definitions(str(workspace / "imported.py"), "add", 2)
+    assert [(definition.file_path, definition.signature) for definition in definitions] == \
+        [(str(workspace / "pkg" / "helpers.py"), "def helper(a, b=1)")]
+
+
+def test_star_imported_definition(tmp_path):
+    workspace = make_repository(tmp_path)
+    found, (snippet, _) = StaticDefinitionResolver().resolve(make_request(workspace, "starred.py", "helper", 2))
+    assert found
+    assert (snippet["uri"], snippet["start_line"]) == (str(workspace / "pkg" / "helpers.py"), 0)
+
+
+def test_class_definition_with_its_members(tmp_path):
+    workspace = make_repository(tmp_path)
+    file_symbols = RepoSymbolTable(str(workspace)).get_file_symbols(str(workspace / "pkg" / "helpers.py"))
+    assert {name: member.signature for name, member in file_symbols.class_members["Widget"].items()} == \
+        {"__init__": "def __init__(self, name: str)", "render": "def render(self)"}
+
+    resolver = StaticDefinitionResolver()
+    found, (snippet, _) = resolver.resolve(make_request(workspace, "member.py", "Widget", 2))
+    assert found
+    # Like a hover, the constructor signature describes the class, followed by its source
+    assert snippet["content"].startswith("class Widget(name: str)\nclass Widget:")
+    assert "def render(self):" in snippet["content"]
+
+    # Members are reached through instances, which only the language server can type
+    assert resolver.resolve(make_request(workspace, "member.py", "render", 2, 12)) == (False, None)
+    assert resolver.report() == "resolved statically: 1/2 (50.0%)"
+
+
+def test_synced_buffer_is_resolved_instead_of_the_file_on_disk(tmp_path):
+    workspace = make_repository(tmp_path)
+    file_path = str(workspace / "direct.py")
+    owner = object()
+    synced_buffers.put(file_path, "import os\n\n\ndef local():\n    return 2\n\n\nlocal()\n", owner)
+    try:
+        found, (snippet, _) = StaticDefinitionResolver().resolve(make_request(workspace, "direct.py", "local", 7))
+    finally:
+        synced_buffers.discard(file_path, owner)
+    assert found
+    assert (snippet["start_line"], snippet["content"]) == (3, "def local()")
+
+
+def test_resolved_requests_skip_the_language_server(tmp_path, monkeypatch):
+    workspace = make_repository(tmp_path)
+    resolved_by_server = []
+
+    async def resolve(location_getter, request):
+        resolved_by_server.append(request.symbol_name)
+        return None
+
+    monkeypatch.setattr(symbol_context_snippets, "resolve_symbol_context_snippet", resolve)
+    requests = [make_request(workspace, "member.py", "Widget", 2), make_request(workspace, "member.py", "render", 2, 12)]
+    snippets = asyncio.run(symbol_context_snippets.get_symbol_context_snippets(requests, 2, static_resolver=StaticDefinitionResolver()))
+    assert [snippet.symbol for snippet in snippets] == ["Widget"]
+    assert resolved_by_server == ["render"]
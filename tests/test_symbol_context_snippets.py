@@ -0,0 +1,65 @@
+import asyncio
+
+from graph_retrieval import symbol_context_snippets
+from graph_retrieval.symbol_context_snippets import get_symbol_context_snippets
+from schema.common import Position
+from schema.tree_sitter import SymbolRequest
+
+
+def make_request(symbol_name: str, uri: str, line: int, character: int = 4) -> SymbolRequest:
+    return SymbolRequest(symbol_name=symbol_name, position=Position(line=line, character=character), uri=uri,
+                         node_type="call", language_id="python", capture_name="identifier", workspace="/repo")
+
+
+def make_snippet(symbol_name: str):
+    return {"identifier": "LSPRetriever", "uri": f"/repo/{symbol_name}.py", "start_line": 0, "end_line": 1,
+            "symbol": symbol_name, "content": f"def {symbol_name}(): pass"}
+
+
+def use_fake_resolution(monkeypatch, nested_requests):
+    """
+    Resolve every request without a server, 'broken' fails like a dropped language server request
+    and 'unhelpful' has a definition without helpful hover or text.
+    """
+    resolved = []
+
+    async def resolve(location_getter, request):
+        resolved.append(request.symbol_name)
+        if request.symbol_name == "broken":
+            raise ConnectionError("language server request failed")
+        snippet = make_snippet(request.symbol_name)
+        if request.symbol_name == "unhelpful":
+            snippet["content"] = None
+        return snippet, nested_requests.get(request.symbol_name, [])
+
+    monkeypatch.setattr(symbol_context_snippets, "resolve_symbol_context_snippet", resolve)
+    return resolved
+
+
+def test_failed_sibling_keeps_the_other_snippets(monkeypatch):
+    use_fake_resolution(monkeypatch, {})
+    requests = [make_request(name, "file:///repo/main.py", line) for line, name in enumerate(["first", "broken", "last"])]
+
+    snippets = asyncio.run(get_symbol_context_snippets(requests, 2))
+    assert [snippet.symbol for snippet in snippets] == ["first", "last"]
+
+
+def test_nested_request_for_a_claimed_symbol_is_not_resolved_again(monkeypatch):
+    # The definition of `first` uses `second` at the position a top-level request already names,
+    # by its bare path instead of its file uri
+    resolved = use_fake_resolution(monkeypatch, {"first": [make_request("second", "/repo/main.py", 1)]})
+    requests = [make_request("first", "file:///repo/main.py", 0), make_request("second", "file:///repo/main.py", 1)]
+
+    snippets = asyncio.run(get_symbol_context_snippets(requests, 3))
+    assert sorted(resolved) == ["first", "second"]
+    assert [snippet.symbol for snippet in snippets] == ["first", "second"]
+
+
+def test_snippet_without_content_is_dropped(monkeypatch):
+    # The nested requests found in the definition are still resolved
+    use_fake_resolution(monkeypatch, {"unhelpful": [make_request("nested", "/repo/unhelpful.py", 0)]})
+    requests = [make_request(name, "file:///repo/main.py", line) for line, name in enumerate(["first", "unhelpful", "last"])]
+
+    snippets = asyncio.run(get_symbol_context_snippets(requests, 3))
+    assert [snippet.symbol for snippet in snippets] == ["first", "nested", "last"]
+    assert all(snippet.content for snippet in snippets)
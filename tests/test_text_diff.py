@@ -0,0 +1,65 @@
+import random
+
+from file_system.line_index import get_line_index
+from file_system.text_diff import get_changed_span
+from graph_retrieval.document_sync import get_incremental_change
+from tree_sitter_local.tree_cache import get_tree_edit
+
+
+def naive_changed_span(old, new):
+    if old == new:
+        return None
+    max_common = min(len(old), len(new))
+    start = 0
+    while start < max_common and old[start] == new[start]:
+        start += 1
+    suffix_length = 0
+    while suffix_length < max_common - start and old[-1 - suffix_length] == new[-1 - suffix_length]:
+        suffix_length += 1
+    return start, len(old) - suffix_length, len(new) - suffix_length
+
+
+def utf16_position_to_offset(text: str, line: int, character: int) -> int:
+    offset = get_line_index(text).line_offsets[line]
+    units = 0
+    while units < character:
+        units += 2 if ord(text[offset]) > 0xFFFF else 1
+        offset += 1
+    return offset
+
+
+def make_edits(rng: random.Random, count: int):
+    alphabet = "ab\né\U0001f600 "
+    for _ in range(count):
+        old = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 40)))
+        start = rng.randint(0, len(old))
+        end = rng.randint(start, len(old))
+        inserted = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 5)))
+        yield old, old[:start] + inserted + old[end:]
+
+
+def test_changed_span_matches_the_character_scan():
+    for old, new in make_edits(random.Random(0), 2000):
+        assert get_changed_span(old, new) == naive_changed_span(old, new)
+        assert get_changed_span(old.encode(), new.encode()) == naive_changed_span(old.encode(), new.encode())
+
+
+def test_incremental_change_turns_the_old_text_into_the_new_one():
+    for old, new in make_edits(random.Random(1), 500):
+        change = get_incremental_change(old, new)
+        if change is None:
+            assert old == new
+            continue
+        start = utf16_position_to_offset(old, change["range"]["start"]["line"], change["range"]["start"]["character"])
+        end = utf16_position_to_offset(old, change["range"]["end"]["line"], change["range"]["end"]["character"])
+        assert old[:start] + change["text"] + old[end:] == new
+
+
+def test_tree_edit_spans_the_changed_bytes():
+    for old, new in make_edits(random.Random(2), 500):
+        edit = get_tree_edit(old.encode(), new.encode())
+        span = get_changed_span(old.encode(), new.encode())
+        if span is None:
+            assert edit is None
+        else:
+            assert (edit.start_byte, edit.old_end_byte, edit.new_end_byte) == span
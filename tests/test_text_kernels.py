@@ -0,0 +1,147 @@
+import random
+
+from post_processing.text_kernels import get_overlap_length
+from post_processing.truncate_parsed_completion import find_largest_suffix_prefix_overlap, insert_missing_brackets
+from post_processing.utils import BRACKET_PAIR, get_first_non_empty_line, indentation, trim_until_suffix
+from programing_language import get_language_profile
+
+# Characters of the fuzz corpus: brackets, whitespace including '\r' and a non-breaking space, and a few letters
+FUZZ_ALPHABET = "ab(){}[]<>  \t\n\r\u00a0:"
+
+
+# The implementations the kernels replaced, as references
+def reference_insert_missing_brackets(text):
+    opening_stack = []
+    bracket_pairs = list(BRACKET_PAIR.items())
+
+    for char in text:
+        bracket_pair = next((bp for bp in bracket_pairs if bp[1] == char), None)
+
+        if bracket_pair:
+            if opening_stack and opening_stack[-1] == bracket_pair[0]:
+                opening_stack.pop()
+        elif char in BRACKET_PAIR:
+            opening_stack.append(char)
+
+    return text + ''.join(BRACKET_PAIR[open_bracket] for open_bracket in reversed(opening_stack))
+
+
+
+
+def reference_find_largest_suffix_prefix_overlap(left, right):
+    overlap = ''
+
+    for i in range(1, min(len(left), len(right)) + 1):
+        suffix = left[-i:]
+        prefix = right[:i]
+
+        if suffix == prefix:
+            overlap = suffix
+
+    if len(overlap) == 0:
+        return None
+
+    return overlap
+
+
+def reference_get_first_non_empty_line(suffix):
+    next_line_suffix = suffix[suffix.find('\n'):]
+
+    for line in next_line_suffix.split('\n'):
+        if line.strip():
+            return line
+
+    return ""
+
+
+def reference_trim_until_suffix(insertion, prefix, suffix, language_id):
+    config = get_language_profile(language_id).config
+
+    insertion = insertion.rstrip()
+
+    first_non_empty_suffix_line = reference_get_first_non_empty_line(suffix)
+
+    if len(first_non_empty_suffix_line) == 0:
+        return insertion
+
+    prefix_last_new_line = prefix.rfind('\n')
+    prefix_indentation_with_first_completion_line = prefix[prefix_last_new_line + 1:]
+    suffix_indent = indentation(first_non_empty_suffix_line)
+    start_indent = indentation(prefix_indentation_with_first_completion_line)
+    has_empty_completion_line = prefix_indentation_with_first_completion_line.strip() == ''
+
+    insertion_lines = insertion.split('\n')
+    cut_off_index = len(insertion_lines)
+
+    for i in range(len(insertion_lines) - 1, -1, -1):
+        line = insertion_lines[i]
+
+        if len(line) == 0:
+            continue
+
+        if i == 0:
+            line = prefix_indentation_with_first_completion_line + line
+
+        line_indentation = indentation(line)
+        is_same_indentation = line_indentation <= suffix_indent
+
+        if (
+                has_empty_completion_line and config and
+                config.get('block_end') and
+                line.strip().startswith(config['block_end']) and
+                start_indent == line_indentation and
+                len(insertion_lines) == 1
+        ):
+            cut_off_index = i
+            break
+
+        if is_same_indentation and first_non_empty_suffix_line.startswith(line):
+            cut_off_index = i
+            break
+
+    return '\n'.join(insertion_lines[:cut_off_index])
+
+
+def random_text(rng: random.Random, max_length: int) -> str:
+    return ''.join(rng.choice(FUZZ_ALPHABET) for _ in range(rng.randint(0, max_length)))
+
+
+def random_lines(rng: random.Random, max_lines: int) -> str:
+    """Text made of indented lines, some repeated, so trimming and overlaps find matches."""
+    pool = [rng.choice(["", " ", "    ", "\t", "        "]) + rng.choice(["a", "b(", ")", "}", "{", "a b", "end"]) for _ in range(6)]
+    return '\n'.join(rng.choice(pool + [""]) for _ in range(rng.randint(0, max_lines)))
+
+
+def test_overlap_matches_the_reference():
+    rng = random.Random(0)
+    for _ in range(5000):
+        left = "".join(rng.choice("ab(\n") for _ in range(rng.randint(0, 12)))
+        right = "".join(rng.choice("ab(\n") for _ in range(rng.randint(0, 12)))
+        if rng.random() < 0.5:
+            # Force an overlap, possibly with a repeated period
+            right = left[rng.randint(0, len(left)):] + right
+        assert find_largest_suffix_prefix_overlap(left, right) == reference_find_largest_suffix_prefix_overlap(left, right), (left, right)
+
+
+def test_overlap_of_periodic_texts():
+    assert get_overlap_length("abab", "ababab") == 4
+    assert get_overlap_length("aaaa", "aab") == 2
+    assert get_overlap_length("abc", "xyz") == 0
+    assert get_overlap_length("", "a") == 0
+
+
+def test_brackets_and_first_line_match_the_reference():
+    rng = random.Random(1)
+    for _ in range(5000):
+        text = random_text(rng, 40)
+        assert insert_missing_brackets(text) == reference_insert_missing_brackets(text), text
+        assert get_first_non_empty_line(text) == reference_get_first_non_empty_line(text), text
+
+
+def test_trim_until_suffix_matches_the_reference():
+    rng = random.Random(2)
+    for _ in range(2000):
+        insertion, prefix, suffix = random_lines(rng, 6), random_lines(rng, 3), random_lines(rng, 6)
+        for language_id in ["python", "java", "cpp"]:
+            assert trim_until_suffix(insertion, prefix, suffix, language_id) == \
+                reference_trim_until_suffix(insertion, prefix, suffix, language_id), (insertion, prefix, suffix, language_id)
@@ -0,0 +1,37 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from tree_sitter import Parser
+from tree_sitter_languages import get_language
+
+from tree_sitter_local.tree_sitter_local import tree_sitter_pool
+
+SOURCE = b"def area(width, height):\n    return round(width * height)\n\nprint(area(2, 3))\n"
+
+
+def test_every_thread_gets_its_own_parser_sharing_one_query():
+    threads = 4
+    barrier = threading.Barrier(threads)
+
+    def acquire(_):
+        # Hold every worker until all of them run, so each request comes from its own thread
+        barrier.wait()
+        return tree_sitter_pool.get_analyzer("python")
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        analyzers = list(executor.map(acquire, range(threads)))
+    assert len({id(analyzer.parser) for analyzer in analyzers}) == threads
+    assert len({id(analyzer.FUNCTION_CALL_QUERY) for analyzer in analyzers}) == 1
+
+
+def test_pooled_analyzer_is_reused_and_parses_like_a_fresh_parser():
+    analyzer = tree_sitter_pool.get_analyzer("python")
+    assert tree_sitter_pool.get_analyzer("python") is analyzer
+
+    parser = Parser()
+    parser.set_language(get_language("python"))
+    assert analyzer.parser.parse(SOURCE).root_node.sexp() == parser.parse(SOURCE).root_node.sexp()
+    calls = [node.text for node in analyzer.get_nodes_from_query(analyzer.FUNCTION_CALL_QUERY, analyzer.parser.parse(SOURCE).root_node)]
+    fresh_query = get_language("python").query(tree_sitter_pool.get_query_source("python"))
+    fresh_calls = [node.text for node, _ in fresh_query.captures(parser.parse(SOURCE).root_node)]
+    assert calls and calls == fresh_calls
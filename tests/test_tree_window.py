@@ -0,0 +1,34 @@
+from benchmark.lsp_lookup_benchmark import PROJECT_ROOT
+from benchmark.tree_cache_benchmark import build_source, make_requests
+from graph_retrieval.identifiers import get_last_n_graph_context_identifiers_from_document
+from tree_sitter_local.tree_sitter_local import tree_sitter_pool
+from tree_sitter_local.tree_window import get_first_error_point, parse_window
+
+# Compare every identifier of the analyzed lines, not only the ones resolved by the pipeline
+COMPARED_IDENTIFIERS = 10000
+
+
+def extract(document, windowed: bool):
+    requests = get_last_n_graph_context_identifiers_from_document(
+        document=document, position=document.position, n=COMPARED_IDENTIFIERS, windowed=windowed)
+    return [(request.symbol_name, request.position.line, request.position.character) for request in requests]
+
+
+def parses_cleanly(document) -> bool:
+    window = parse_window(tree_sitter_pool.get_analyzer("python"), document.text,
+                          max(document.position.line - 100, 0), document.position.line)
+    return window is None or get_first_error_point(window.tree.root_node) is None
+
+
+def test_windowed_parse_finds_the_identifiers_of_a_full_parse():
+    source = build_source(PROJECT_ROOT, 5000)
+    compared = 0
+    for document, _ in make_requests(source, 50, 3, 0):
+        # A window with a syntax error, from an unfinished construct at the cursor or a start inside a
+        # multi-line string, is recovered from differently than the whole document
+        if not parses_cleanly(document):
+            continue
+        assert extract(document, True) == extract(document, False), document.position
+        compared += 1
+    assert compared >= 25
+
@@ -0,0 +1,42 @@
+import random
+
+from file_system.virtual_file_system import VirtualFileSystem
+
+
+def write_mixed_newlines(path, seed: int):
+    rng = random.Random(seed)
+    pieces = [rng.choice(["ab", "é", "\U0001f600", "x = 1", "\n", "\r\n", "\r", " "]) for _ in range(400)]
+    path.write_bytes("".join(pieces).encode("utf-8"))
+
+
+def test_mapped_and_decoded_files_read_alike(tmp_path):
+    decoded_vfs = VirtualFileSystem(mmap_threshold=2 ** 30)
+    mapped_vfs = VirtualFileSystem(mmap_threshold=1)
+    for seed in range(20):
+        path = tmp_path / f"module_{seed}.py"
+        write_mixed_newlines(path, seed)
+        with open(path, "r", encoding="utf-8") as f:
+            lines = f.readlines()
+
+        decoded, mapped = decoded_vfs.get(str(path)), mapped_vfs.get(str(path))
+        assert mapped.is_mapped and not decoded.is_mapped
+        for snapshot in (decoded, mapped):
+            assert snapshot.text == "".join(lines)
+            assert snapshot.line_count == len(lines)
+            assert [snapshot.get_line(line) for line in range(len(lines))] == lines
+            assert snapshot.get_lines(2, 5) == "".join(lines[2:7])
+            assert snapshot.get_range(1, 1, 3, 2) == lines[1][1:] + lines[2] + lines[3][:2]
+
+
+def test_text_of_a_mapped_file_is_decoded_once_and_counted(tmp_path):
+    path = tmp_path / "large.py"
+    path.write_text("value = 1\n" * 1000)
+    vfs = VirtualFileSystem(mmap_threshold=1)
+
+    offsets_size = vfs.get(str(path)).memory_size
+    assert vfs._cached_bytes == offsets_size
+    text = vfs.read_text(str(path))
+    assert vfs.read_text(str(path)) is text
+    assert vfs._cached_bytes == offsets_size + len(text)
+    vfs.clear()
+    assert vfs._cached_bytes == 0
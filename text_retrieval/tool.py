@@ -1,6 +1,7 @@
 import os
 import glob
 from schema.common import Document
+from file_system.virtual_file_system import vfs
 
 def last_n_lines(text: str, n: int) -> str:
     """Return the last n lines of the text"""
@@ -8,8 +9,7 @@ def last_n_lines(text: str, n: int) -> str:
     return '\n'.join(lines[-n:]) if lines else ''
 
 def read_code(fname):
-    with open(fname, 'r', encoding='utf8') as f:
-        return f.read()
+    return vfs.read_text(fname)
 
 def iterate_repository(base_dir = '', repo = 'test', target_file = None):
     pattern = os.path.join(f'{base_dir}/{repo}', "**", "*.py")
@@ -0,0 +1 @@
+(call function: (identifier) @identifier)
@@ -0,0 +1,5 @@
+(method_invocation name:(identifier) @identifier)
+(object_creation_expression (type_identifier) @identifier_object_creation)
+(formal_parameter (type_identifier) @identifier)
+(local_variable_declaration (type_identifier) @identifier)
+(field_access field:(identifier) @identifier)
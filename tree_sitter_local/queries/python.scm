@@ -0,0 +1 @@
+(call (identifier) @identifier)
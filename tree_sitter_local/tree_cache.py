@@ -0,0 +1,155 @@
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Hashable, Optional, Tuple
+
+from tree_sitter import Tree
+
+from file_system.text_diff import get_changed_span
+
+MAX_CACHED_TREES = 64
+
+TreeKey = Tuple[str, str, Hashable]
+
+
+@dataclass
+class TreeEdit:
+    """A `Tree.edit` in bytes and (row, byte column) points, like tree-sitter expects them."""
+    start_byte: int
+    old_end_byte: int
+    new_end_byte: int
+    start_point: Tuple[int, int]
+    old_end_point: Tuple[int, int]
+    new_end_point: Tuple[int, int]
+
+    def inverted(self) -> "TreeEdit":
+        """The edit undoing this one."""
+        return TreeEdit(
+            start_byte=self.start_byte,
+            old_end_byte=self.new_end_byte,
+            new_end_byte=self.old_end_byte,
+            start_point=self.start_point,
+            old_end_point=self.new_end_point,
+            new_end_point=self.old_end_point,
+        )
+
+
+def apply_edit(tree: Tree, edit: TreeEdit):
+    tree.edit(
+        start_byte=edit.start_byte,
+        old_end_byte=edit.old_end_byte,
+        new_end_byte=edit.new_end_byte,
+        start_point=edit.start_point,
+        old_end_point=edit.old_end_point,
+        new_end_point=edit.new_end_point,
+    )
+
+
+def get_point(source: bytes, byte_offset: int) -> Tuple[int, int]:
+    """Tree-sitter point of a byte offset."""
+    row = source.count(b"\n", 0, byte_offset)
+    return row, byte_offset - (source.rfind(b"\n", 0, byte_offset) + 1)
+
+
+def advance_point(point: Tuple[int, int], source: bytes, start_byte: int, end_byte: int) -> Tuple[int, int]:
+    """Tree-sitter point of `end_byte`, from the point of `start_byte`, scanning only the bytes between them."""
+    newline_count = source.count(b"\n", start_byte, end_byte)
+    if newline_count == 0:
+        return point[0], point[1] + end_byte - start_byte
+    return point[0] + newline_count, end_byte - (source.rfind(b"\n", start_byte, end_byte) + 1)
+
+
+def get_tree_edit(old_source: bytes, new_source: bytes) -> Optional[TreeEdit]:
+    """The edit replacing the span between the common prefix and suffix of both sources, None if they are equal."""
+    span = get_changed_span(old_source, new_source)
+    if span is None:
+        return None
+    prefix_length, old_end_byte, new_end_byte = span
+    start_point = get_point(old_source, prefix_length)
+    return TreeEdit(
+        start_byte=prefix_length,
+        old_end_byte=old_end_byte,
+        new_end_byte=new_end_byte,
+        start_point=start_point,
+        old_end_point=advance_point(start_point, old_source, prefix_length, old_end_byte),
+        new_end_point=advance_point(start_point, new_source, prefix_length, new_end_byte),
+    )
+
+
+def parse_edited(analyzer, tree: Tree, old_source: bytes, new_source: bytes) -> Tree:
+    """
+    Parse `new_source` incrementally from `tree`, the tree of `old_source`.
+
+    Only the edited region is re-parsed. `tree` itself is left untouched: the edit is applied
+    to a fresh tree re-parsed from it, which shares all of its nodes and costs next to nothing.
+    """
+    edit = get_tree_edit(old_source, new_source)
+    edited_tree = analyzer.parser.parse(old_source, tree)
+    if edit is None:
+        return edited_tree
+    apply_edit(edited_tree, edit)
+    return analyzer.parser.parse(new_source, edited_tree)
+
+
+class TreeCache:
+    """
+    LRU cache of parsed documents keyed by (language, uri, version).
+
+    A new version of a cached document is parsed incrementally from the latest tree of the
+    same document, so only the region that changed between the versions is re-parsed.
+    Entries also keep the text they were parsed from: a document whose text differs from the
+    cached one is never served the cached tree, even when its version is unknown.
+    """
+
+    def __init__(self, max_entries: int = MAX_CACHED_TREES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[TreeKey, Tuple[str, bytes, Tree]]" = OrderedDict()
+        self._latest: Dict[Tuple[str, str], TreeKey] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.incremental_parses = 0
+        self.full_parses = 0
+
+    def get_tree(self, analyzer, uri: str, text: str, version: Hashable = None) -> Tree:
+        """The tree of `text`, the content of document `uri` at `version`, parsed with `analyzer`."""
+        key = (analyzer.language_string, uri, version)
+        with self._lock:
+            entry = self._entries.get(key)
+            # Requests for the same document usually share its text object, which compares by identity
+            if entry is not None and (entry[0] is text or entry[0] == text):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            latest_key = self._latest.get(key[:2])
+            base = self._entries.get(latest_key) if latest_key is not None else None
+
+        # Parse outside the lock, every thread parses with its own analyzer
+        source = bytes(text, "utf8")
+        if base is not None:
+            tree = parse_edited(analyzer, base[2], base[1], source)
+        else:
+            tree = analyzer.parser.parse(source)
+
+        with self._lock:
+            if base is not None:
+                self.incremental_parses += 1
+            else:
+                self.full_parses += 1
+            self._entries[key] = (text, source, tree)
+            self._entries.move_to_end(key)
+            self._latest[key[:2]] = key
+            while len(self._entries) > self.max_entries:
+                evicted_key, _ = self._entries.popitem(last=False)
+                if self._latest.get(evicted_key[:2]) == evicted_key:
+                    del self._latest[evicted_key[:2]]
+        return tree
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._latest.clear()
+            self.hits = self.incremental_parses = self.full_parses = 0
+
+
+# Process-wide cache shared by post-processing and identifier extraction
+tree_cache = TreeCache()
@@ -1,11 +1,18 @@
-from tree_sitter import Language, Parser
-from typing import List, Tuple, Optional
+from tree_sitter import Language, Node, Parser
+from typing import Dict, Iterator, List, Tuple, Optional
 from dataclasses import dataclass
 import os
+import threading
 # from tree_sitter_languages import get_language
 import tree_sitter_python as tspython
 from tree_sitter_languages import get_language
-from programing_language import ProgrammingLanguage
+from programing_language import ProgrammingLanguage, get_language_profile
+from file_system.virtual_file_system import vfs
+from file_system.line_index import get_line_index
+
+QUERY_DIRECTORY = os.path.join(os.path.dirname(__file__), "queries")
+# Languages without a query file of their own use the query of this language
+DEFAULT_QUERY_LANGUAGE = "python"
 
 @dataclass
 class FunctionCall:
@@ -18,95 +25,49 @@ class FunctionCall:
 
 class TreeSitterAnalyzer:
     def __init__(self, language_string: str):
-        # Initialize parser with Python grammar
+        # Languages and queries are shared through `tree_sitter_pool`, only the parser is our own
         self.language_string = language_string
-        self.language = get_language(language=self.language_string)
+        self.language = tree_sitter_pool.get_language(self.language_string)
         self.parser = Parser()
         self.parser.set_language(self.language)
-        self.FUNCTION_CALL_QUERY = self.language.query("""(call (identifier) @identifier)""")
         self.initialize_language()
 
     def initialize_language(self):
-        if self.language_string == "python":
-            self.FUNCTION_CALL_QUERY = self.language.query("""(call (identifier) @identifier)""")
-        if self.language_string == "java":
-            self.FUNCTION_CALL_QUERY = self.language.query("""            
-            (method_invocation name:(identifier) @identifier)
-            (object_creation_expression (type_identifier) @identifier_object_creation)
-            (formal_parameter (type_identifier) @identifier)
-            (local_variable_declaration (type_identifier) @identifier)
-            (field_access field:(identifier) @identifier)""")
-        if self.language_string == "cpp":
-            self.FUNCTION_CALL_QUERY = self.language.query("""(call function: (identifier) @identifier)""")
-        if self.language_string == "c_sharp":
-            self.FUNCTION_CALL_QUERY = self.language.query(""" (call function: (identifier) @identifier)""")
+        self.FUNCTION_CALL_QUERY = tree_sitter_pool.get_query(self.language_string)
     
     def safe_parse(self, raw_code, old_tree=None):
+        """Parse `raw_code`, incrementally when `old_tree` has been edited to match it."""
         try:
             if old_tree:
-                self.parser.parse(bytes(raw_code, "utf8"), old_tree)
+                return self.parser.parse(bytes(raw_code, "utf8"), old_tree)
             return self.parser.parse(bytes(raw_code, "utf8"))
         except Exception as e:
             return None
 
     def analyze_file(self, file_path: str) -> List[FunctionCall]:
         """Analyze a Python file for function calls"""
-        with open(file_path, 'r', encoding='utf-8') as f:
-            source_code = f.read()
+        source_code = vfs.read_text(file_path)
         return self.analyze_source(source_code)
 
-    def analyze_source(self, source_code: str, start_pos: Tuple[int, int] = None, end_pos: Tuple[int, int] = None) -> List[FunctionCall]:
+    def analyze_source(self, source_code: str, start_pos: Tuple[int, int] = None, end_pos: Tuple[int, int] = None, tree=None) -> List[FunctionCall]:
         """Analyze Python source code for function calls within specified range
         
         Args:
             source_code (str): The source code to analyze
             start_pos (Tuple[int, int]): Start position as (line, character), optional
             end_pos (Tuple[int, int]): End position as (line, character), optional
+            tree: Already parsed tree of `source_code`, optional
         """
-        tree = self.parser.parse(bytes(source_code, "utf8"))
         calls = []
-
-        # Get all lines for content extraction
-        lines = source_code.split('\n')
-
-        # Convert positions to byte offsets if provided
-        start_byte = None if start_pos is None else self._pos_to_byte(source_code, start_pos[0], start_pos[1])
-        end_byte = None if end_pos is None else self._pos_to_byte(source_code, end_pos[0], end_pos[1])
-
-        # Get all nodes from the query
-        nodes = self.get_nodes_from_query(self.FUNCTION_CALL_QUERY, tree.root_node)
-        
-        for node in nodes:
-            # Manually filter nodes based on position if range is specified
-            if start_byte is not None or end_byte is not None:
-                node_start_byte = node.start_byte
-                node_end_byte = node.end_byte
-                
-                # Skip nodes that are outside our range
-                if (start_byte is not None and node_end_byte < start_byte) or \
-                   (end_byte is not None and node_start_byte > end_byte):
-                    continue
-            
+        for node in self.iter_call_nodes(source_code, start_pos, end_pos, tree):
             start_point = node.start_point
             end_point = node.end_point
             
-            # Extract the actual content
-            if start_point[0] == end_point[0]:  # Same line
-                content = lines[start_point[0]][start_point[1]:end_point[1]]
-            else:
-                # Multi-line call
-                content = []
-                for i in range(start_point[0], end_point[0] + 1):
-                    if i == start_point[0]:
-                        content.append(lines[i][start_point[1]:])
-                    elif i == end_point[0]:
-                        content.append(lines[i][:end_point[1]])
-                    else:
-                        content.append(lines[i])
-                content = '\n'.join(content)
+            # The captured node spans the whole call content
+            content = node.text.decode('utf8')
 
             calls.append(FunctionCall(
-                name=node.text.decode('utf8'),
+                name=content,
                 start_line=start_point[0],
                 end_line=end_point[0],
                 start_char=start_point[1],
@@ -116,20 +77,39 @@ class TreeSitterAnalyzer:
 
         return calls
 
+    def iter_call_nodes(self, source_code: str, start_pos: Tuple[int, int] = None, end_pos: Tuple[int, int] = None, tree=None) -> Iterator[Node]:
+        """Yield the nodes captured by the function call query within specified range
+
+        The query only runs over the byte range of the positions, so the cost follows the size
+        of the range instead of the size of the file.
+
+        Args:
+            source_code (str): The source code to analyze
+            start_pos (Tuple[int, int]): Start position as (line, character), optional
+            end_pos (Tuple[int, int]): End position as (line, character), optional
+            tree: Already parsed tree of `source_code`, optional
+        """
+        if tree is None:
+            tree = self.parser.parse(bytes(source_code, "utf8"))
+
+        # Convert positions to byte offsets if provided
+        start_byte = None if start_pos is None else self._pos_to_byte(source_code, start_pos[0], start_pos[1])
+        end_byte = None if end_pos is None else self._pos_to_byte(source_code, end_pos[0], end_pos[1])
+
+        # Get the nodes of the range from the query
+        nodes = self.get_nodes_from_query(self.FUNCTION_CALL_QUERY, tree.root_node, start_byte, end_byte)
+
+        for node in nodes:
+            # The query returns every match touching the range, but a captured node of a
+            # match can still lie outside of it
+            if (start_byte is not None and node.end_byte < start_byte) or \
+               (end_byte is not None and node.start_byte > end_byte):
+                continue
+            yield node
+
     def _pos_to_byte(self, source: str, line: int, character: int) -> int:
         """Convert line and character position to byte offset"""
-        lines = source.split('\n')
-        byte_offset = 0
-        
-        # Add bytes for complete lines
-        for i in range(line):
-            byte_offset += len(lines[i].encode('utf-8')) + 1  # +1 for newline
-
-        # Add bytes for characters in current line
-        if character > 0:
-            byte_offset += len(lines[line][:character].encode('utf-8'))
-            
-        return byte_offset
+        return get_line_index(source).position_to_byte(line, character)
 
     def get_nodes_from_query(self, query, root_node, start_byte=None, end_byte=None):
         """Extract only the Node objects from query captures
@@ -137,16 +117,22 @@ class TreeSitterAnalyzer:
         Args:
             query: The compiled tree-sitter query
             root_node: The root node to search in
-            start_byte: Not used, kept for API compatibility
-            end_byte: Not used, kept for API compatibility
+            start_byte: Only run the query over nodes ending at or after this byte, optional
+            end_byte: Only run the query over nodes starting at or before this byte, optional
             
         Returns:
             List of Node objects matching the query
         """
-        # The captures method returns a structure with nodes
-        captures = query.captures(root_node)
-        
-        # Print for debugging
+        if start_byte is None and end_byte is None:
+            captures = query.captures(root_node)
+        else:
+            # Tree-sitter ranges exclude nodes that only touch their bounds, widen them by a byte
+            # to keep the inclusive bounds
+            captures = query.captures(
+                root_node,
+                start_byte=max((start_byte or 0) - 1, 0),
+                end_byte=root_node.end_byte if end_byte is None else end_byte + 1,
+            )
         
         # Check if it's a tuple/list structure
         if isinstance(captures, list):
@@ -182,6 +168,59 @@ class TreeSitterAnalyzer:
                 return call
         return None
 
+
+class TreeSitterPool:
+    """
+    Process-wide tree-sitter languages, compiled queries and analyzers, per language.
+
+    Languages and compiled queries are immutable and shared by every thread. A parser can
+    only parse one document at a time, so `get_analyzer` hands out one analyzer per thread
+    and language, which is created on first use and reused by every later request.
+    """
+
+    def __init__(self, query_directory: str = QUERY_DIRECTORY):
+        self.query_directory = query_directory
+        self._languages: Dict[str, Language] = {}
+        self._queries: Dict[str, object] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def get_language(self, language_string: str) -> Language:
+        with self._lock:
+            if language_string not in self._languages:
+                self._languages[language_string] = get_language(language=language_string)
+            return self._languages[language_string]
+
+    def get_query(self, language_string: str):
+        """The compiled function call query of a language."""
+        language = self.get_language(language_string)
+        with self._lock:
+            if language_string not in self._queries:
+                self._queries[language_string] = language.query(self.get_query_source(language_string))
+            return self._queries[language_string]
+
+    def get_query_source(self, language_string: str) -> str:
+        profile = get_language_profile(language_string)
+        query_path = os.path.join(self.query_directory, f"{profile.query_language if profile else language_string}.scm")
+        if not os.path.exists(query_path):
+            query_path = os.path.join(self.query_directory, f"{DEFAULT_QUERY_LANGUAGE}.scm")
+        with open(query_path, "r", encoding="utf-8") as f:
+            return f.read()
+
+    def get_analyzer(self, language_string: str) -> "TreeSitterAnalyzer":
+        """The analyzer of a language for the calling thread."""
+        analyzers = getattr(self._local, "analyzers", None)
+        if analyzers is None:
+            analyzers = self._local.analyzers = {}
+        if language_string not in analyzers:
+            analyzers[language_string] = TreeSitterAnalyzer(language_string)
+        return analyzers[language_string]
+
+
+# Process-wide pool shared by every analyzer
+tree_sitter_pool = TreeSitterPool()
+
+
 if __name__ == "__main__":
     # Example usage
     analyzer = TreeSitterAnalyzer(language_string='python')
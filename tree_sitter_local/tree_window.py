@@ -0,0 +1,102 @@
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from tree_sitter import Node, Tree
+
+from file_system.line_index import get_line_index
+
+# Windows growing past this many lines are not worth it, the whole document is parsed instead
+MAX_WINDOW_LINES = 2000
+
+# Lines starting with these characters close a construct opened above, they do not start one
+CLOSING_CHARACTERS = ")]}"
+
+
+@dataclass
+class SourceWindow:
+    """Whole lines `start_line` to `end_line` (exclusive) of a document, parsed on their own."""
+    text: str
+    start_line: int
+    end_line: int
+    tree: Optional[Tree] = None
+
+    def to_window_position(self, position: Tuple[int, int]) -> Tuple[int, int]:
+        return position[0] - self.start_line, position[1]
+
+    def to_document_point(self, point: Tuple[int, int]) -> Tuple[int, int]:
+        # The window starts at a line start, so only rows move
+        return point[0] + self.start_line, point[1]
+
+
+def is_top_level_line(line: str) -> bool:
+    """A line starting a top-level statement or definition: not blank, not indented, not closing a bracket."""
+    return bool(line.strip()) and not line[0].isspace() and line[0] not in CLOSING_CHARACTERS
+
+
+def get_top_level_window(text: str, start_line: int, end_line: int, max_lines: int = MAX_WINDOW_LINES) -> Optional[SourceWindow]:
+    """
+    The smallest run of top-level statements covering lines `start_line` to `end_line`.
+
+    The window starts at the closest top-level line at or above `start_line` and stops before
+    the first top-level line after `end_line`, so it holds whole definitions. Returns None when
+    the window would span more than `max_lines` lines, as for languages whose definitions are
+    all nested in one top-level class.
+    """
+    line_index = get_line_index(text)
+    line_count = line_index.line_count
+    start_line = min(max(start_line, 0), line_count - 1)
+    end_line = min(max(end_line, start_line), line_count - 1)
+
+    def get_line(line: int) -> str:
+        return text[line_index.line_offsets[line]:line_index.get_line_end(line)]
+
+    window_start = start_line
+    while window_start > 0 and not is_top_level_line(get_line(window_start)):
+        if end_line - window_start >= max_lines:
+            return None
+        window_start -= 1
+
+    window_end = end_line + 1
+    while window_end < line_count and not is_top_level_line(get_line(window_end)):
+        if window_end - window_start >= max_lines:
+            return None
+        window_end += 1
+
+    end_offset = line_index.line_offsets[window_end] if window_end < line_count else len(text)
+    return SourceWindow(
+        text=text[line_index.line_offsets[window_start]:end_offset],
+        start_line=window_start,
+        end_line=window_end,
+    )
+
+
+def get_first_error_point(node: Node) -> Optional[Tuple[int, int]]:
+    """Start point of the first syntax error under `node`, None if it parsed cleanly."""
+    if not node.has_error:
+        return None
+    if node.type == "ERROR" or node.is_missing:
+        return node.start_point
+    for child in node.children:
+        point = get_first_error_point(child)
+        if point is not None:
+            return point
+    return node.start_point
+
+
+def parse_window(analyzer, text: str, start_line: int, end_line: int, max_lines: int = MAX_WINDOW_LINES) -> Optional[SourceWindow]:
+    """
+    Parse the top-level window covering lines `start_line` to `end_line` with `analyzer`.
+
+    Returns None when no small enough window exists, or when the window has a syntax error
+    before `start_line`: its start then probably cut a construct, such as a multi-line string,
+    and the whole document has to be parsed. Errors from `start_line` on are left alone, the
+    text around the cursor is usually incomplete.
+    """
+    window = get_top_level_window(text, start_line, end_line, max_lines)
+    if window is None:
+        return None
+    window.tree = analyzer.parser.parse(bytes(window.text, "utf8"))
+    error_point = get_first_error_point(window.tree.root_node)
+    if error_point is not None and window.to_document_point(error_point)[0] < start_line:
+        return None
+    return window